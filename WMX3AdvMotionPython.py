@@ -0,0 +1,616 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+from WMX3UtilPython import check_errorcode
+
+# Import Python libraries
+import numpy as np
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import monotonic, sleep
+
+# Constants
+DEFAULT_CHAIN_GUARD = 0.01
+DEFAULT_BUFFER_GRANULARITY = 256
+DEFAULT_LOOKAHEAD_LOW_WATERMARK = 256
+DEFAULT_LOOKAHEAD_HIGH_WATERMARK = 1024
+DEFAULT_FEED_INTERVAL = 0.005
+
+# Create/Free/BytesPerPoint functions of each engine buffer kind. Spline, lookahead and
+# rotation buffers are per channel, the others per axis.
+BUFFER_FUNCTIONS = {
+    'Spline': ('CreateSplineBuffer', 'FreeSplineBuffer', 'GetSplineBytesPerPoint'),
+    'PVT': ('CreatePVTBuffer', 'FreePVTBuffer', 'GetPVTBytesPerPoint'),
+    'PathIntpl': ('CreatePathIntplBuffer', 'FreePathIntplBuffer', 'GetPathIntplBytesPerPoint'),
+    'PathIntplLookahead': ('CreatePathIntplLookaheadBuffer', 'FreePathIntplLookaheadBuffer',
+                           'GetPathIntplLookaheadBytesPerPoint'),
+    'PathIntplWithRotation': ('CreatePathIntplWithRotationBuffer', 'FreePathIntplWithRotationBuffer',
+                              'GetPathIntplWithRotationBytesPerPoint'),
+}
+
+# Point fields of each time-based trajectory command, in column order
+TRAJECTORY_FIELDS = {
+    'PVT': ('pos', 'velocity', 'timeMilliseconds'),
+    'PT': ('pos', 'timeMilliseconds'),
+    'VT': ('velocity', 'timeMilliseconds'),
+    'AT': ('acc', 'timeMilliseconds'),
+}
+
+TRAJECTORY_CLASSES = {
+    'PVT': (AdvMotion_PVTCommand, AdvMotion_PVTPoint, 'StartPVT'),
+    'PT': (AdvMotion_PTCommand, AdvMotion_PTPoint, 'StartPT'),
+    'VT': (AdvMotion_VTCommand, AdvMotion_VTPoint, 'StartVT'),
+    'AT': (AdvMotion_ATCommand, AdvMotion_ATPoint, 'StartAT'),
+}
+
+
+def trajectory_columns(kind, source):
+    """
+    Return the point columns of a trajectory as float64 arrays, in TRAJECTORY_FIELDS order.
+
+    source may be a (points x fields) array, a structured array or dict with the field
+    names, or the path of a .npy file, which is memory-mapped instead of loaded.
+    """
+    fields = TRAJECTORY_FIELDS[kind]
+    if isinstance(source, str):
+        source = np.load(source, mmap_mode='r')
+
+    if isinstance(source, dict):
+        columns = [source[name] for name in fields]
+    elif isinstance(source, np.ndarray) and source.dtype.names:
+        columns = [source[name] for name in fields]
+    else:
+        source = np.asarray(source)
+        if source.ndim != 2 or source.shape[1] != len(fields):
+            raise ValueError(f"{kind} trajectory must have columns {fields}, got shape {source.shape}")
+        columns = [source[:, index] for index in range(len(fields))]
+    return tuple(np.asarray(column, dtype=np.float64).reshape(-1) for column in columns)
+
+
+def trajectory_profile(kind, columns, start_velocity=0.0):
+    """
+    Return (peak_velocity, peak_acc) per interval between consecutive points.
+
+    PVT intervals are cubic Hermite segments, so the acceleration peaks at the ends and
+    the velocity at the ends or where the acceleration crosses zero. PT velocities and
+    accelerations are finite differences, VT accelerations are the slope between points
+    and AT velocities are integrated from start_velocity.
+    """
+    times = columns[-1]
+    dt = np.diff(times)
+    safe_dt = np.where(dt > 0, dt, np.nan) / 1000.0
+
+    if kind == 'PVT':
+        pos, vel = columns[0], columns[1]
+        dp = np.diff(pos)
+        v0, v1 = vel[:-1], vel[1:]
+        a0 = (6.0 * dp - safe_dt * (4.0 * v0 + 2.0 * v1)) / safe_dt ** 2
+        a1 = (-6.0 * dp + safe_dt * (2.0 * v0 + 4.0 * v1)) / safe_dt ** 2
+        jerk = (a1 - a0) / safe_dt
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_zero = np.where(jerk != 0, -a0 / jerk, -1.0)
+        inside = (t_zero > 0) & (t_zero < safe_dt)
+        v_inside = np.where(inside, v0 + a0 * t_zero + 0.5 * jerk * t_zero ** 2, 0.0)
+        peak_velocity = np.maximum(np.maximum(np.abs(v0), np.abs(v1)), np.abs(v_inside))
+        peak_acc = np.maximum(np.abs(a0), np.abs(a1))
+    elif kind == 'PT':
+        velocity = np.diff(columns[0]) / safe_dt
+        peak_velocity = np.abs(velocity)
+        acc = np.diff(velocity, prepend=start_velocity) / safe_dt
+        peak_acc = np.abs(acc)
+    elif kind == 'VT':
+        vel = columns[0]
+        peak_velocity = np.maximum(np.abs(vel[:-1]), np.abs(vel[1:]))
+        peak_acc = np.abs(np.diff(vel)) / safe_dt
+    else:
+        acc = columns[0]
+        gained = np.cumsum(0.5 * (acc[:-1] + acc[1:]) * np.nan_to_num(safe_dt))
+        velocity = start_velocity + np.concatenate(([0.0], gained))
+        peak_velocity = np.maximum(np.abs(velocity[:-1]), np.abs(velocity[1:]))
+        peak_acc = np.maximum(np.abs(acc[:-1]), np.abs(acc[1:]))
+    return peak_velocity, peak_acc
+
+
+def check_trajectory(kind, columns, max_velocity=None, max_acc=None, start_velocity=0.0):
+    """
+    Check a trajectory and raise ValueError naming the first offending point if the time
+    column is not strictly increasing or a velocity/acceleration limit is exceeded.
+    """
+    times = columns[-1]
+    if times.size == 0:
+        raise ValueError(f"{kind} trajectory has no points")
+    if times[0] < 0:
+        raise ValueError(f"{kind} point 0 has negative time {times[0]}")
+    bad = np.flatnonzero(np.diff(times) <= 0)
+    if bad.size:
+        index = bad[0] + 1
+        raise ValueError(f"{kind} point {index} time {times[index]} is not after {times[index - 1]}")
+
+    peak_velocity, peak_acc = trajectory_profile(kind, columns, start_velocity)
+    for name, peaks, limit in (('velocity', peak_velocity, max_velocity), ('acceleration', peak_acc, max_acc)):
+        if limit is None:
+            continue
+        bad = np.flatnonzero(peaks > limit)
+        if bad.size:
+            index = bad[0]
+            raise ValueError(f"{kind} {name} {peaks[index]:g} exceeds limit {limit:g} "
+                             f"between points {index} and {index + 1}")
+
+
+def split_trajectory(columns, max_points):
+    """
+    Split trajectory columns into segments of at most max_points points. Every segment
+    after the first starts with the last point of the previous one at time 0, so the
+    segments can be chained with a RemainingTime trigger.
+    """
+    count = columns[0].size
+    if max_points < 2:
+        raise ValueError("max_points must be at least 2")
+    if count <= max_points:
+        return [columns]
+
+    segments = []
+    start = 0
+    while start < count - 1 or not segments:
+        end = min(start + max_points, count)
+        segment = [column[start:end] for column in columns]
+        segment[-1] = segment[-1] - columns[-1][start] if segments else segment[-1]
+        segments.append(tuple(segment))
+        start = end - 1
+    return segments
+
+
+class TrajectoryLoader:
+    """
+    Builds AdvMotion PVT/PT/VT/AT commands from NumPy data in one pass and runs
+    trajectories longer than the axis PVT buffer as chained segments.
+    """
+    def __init__(self, wmx3_api, core_motion=None, error_queue=None):
+        self.advanced_motion = AdvancedMotion(wmx3_api)
+        self.adv_motion = self.advanced_motion.advMotion
+        self.core_motion = core_motion
+        self.error_queue = error_queue
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def max_segment_points(self, axis):
+        """Return the number of points one command can carry on axis."""
+        ret, points = self.adv_motion.GetPVTBufferPoints(axis)
+        self.check("GetPVTBufferPoints", ret)
+        return min(points, constants.maxPvtAppendPoints) if points > 0 else constants.maxPvtAppendPoints
+
+    def fill_command(self, kind, axis, columns):
+        command_class, point_class, _ = TRAJECTORY_CLASSES[kind]
+        fields = TRAJECTORY_FIELDS[kind]
+        command = command_class()
+        command.axis = axis
+        command.pointCount = columns[0].size
+
+        point = point_class()
+        for index, values in enumerate(zip(*(column.tolist() for column in columns))):
+            for name, value in zip(fields, values):
+                setattr(point, name, value)
+            command.SetPoints(index, point)
+        return command
+
+    def build_commands(self, kind, axis, source, max_velocity=None, max_acc=None, start_velocity=0.0,
+                       check=True, max_points=None):
+        """
+        Return the list of commands for a trajectory, split into chained segments if it
+        is longer than max_points (by default the axis PVT buffer size).
+        """
+        columns = trajectory_columns(kind, source)
+        if check:
+            check_trajectory(kind, columns, max_velocity, max_acc, start_velocity)
+        if max_points is None:
+            max_points = self.max_segment_points(axis)
+        return [self.fill_command(kind, axis, segment) for segment in split_trajectory(columns, max_points)]
+
+    def start(self, kind, commands, guard=DEFAULT_CHAIN_GUARD):
+        """
+        Start commands built by build_commands. Each following segment is queued with a
+        RemainingTime trigger once the segment before it is executing, so segments must
+        last longer than guard seconds. Blocks until the last segment has been queued.
+        """
+        start_function = getattr(self.adv_motion, TRAJECTORY_CLASSES[kind][2])
+        self.check(TRAJECTORY_CLASSES[kind][2], start_function(commands[0]))
+        active_since = monotonic()
+
+        trigger = Trigger()
+        trigger.triggerType = TriggerType.RemainingTime
+        trigger.triggerValue = 0
+        for previous, command in zip(commands, commands[1:]):
+            trigger.triggerAxis = command.axis
+            self.check(TRAJECTORY_CLASSES[kind][2], start_function(command, trigger))
+
+            # Wait until the queued segment is executing before queuing the next one.
+            duration = previous.GetPoints(previous.pointCount - 1).timeMilliseconds / 1000.0
+            active_since += duration
+            remaining = active_since + guard - monotonic()
+            if remaining > 0 and command is not commands[-1]:
+                sleep(remaining)
+
+    def run(self, kind, axis, source, wait=True, **options):
+        """Build and start a trajectory. With wait=True, blocks until the axis stops."""
+        commands = self.build_commands(kind, axis, source, **options)
+        self.start(kind, commands)
+        if wait and self.core_motion is not None:
+            self.check("Wait", self.core_motion.motion.Wait(axis))
+        return commands
+
+
+class AdvMotionBufferPool:
+    """
+    Keeps AdvMotion engine buffers allocated between jobs. A released buffer stays warm
+    and is handed out again for the same kind and axis/channel if it is large enough;
+    idle buffers are freed least recently used first when max_bytes would be exceeded,
+    and acquire() raises ValueError if the buffer still does not fit.
+
+    Point counts are rounded up to a multiple of granularity so that jobs of similar
+    size share a buffer.
+    """
+    def __init__(self, wmx3_api, max_bytes=None, granularity=DEFAULT_BUFFER_GRANULARITY, error_queue=None):
+        self.advanced_motion = AdvancedMotion(wmx3_api)
+        self.adv_motion = self.advanced_motion.advMotion
+        self.max_bytes = max_bytes
+        self.granularity = granularity
+        self.error_queue = error_queue
+        self.bytes_per_point_cache = {}
+        # (kind, index) -> allocated points; idle buffers are kept in LRU order
+        self.allocated = {}
+        self.idle = OrderedDict()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def bytes_per_point(self, kind):
+        value = self.bytes_per_point_cache.get(kind)
+        if value is None:
+            func = BUFFER_FUNCTIONS[kind][2]
+            if kind == 'PathIntpl':
+                # This getter takes a raw pointer argument in the Python binding.
+                pointer = uintp()
+                ret, value = getattr(self.adv_motion, func)(pointer), pointer.value()
+            else:
+                ret, value = getattr(self.adv_motion, func)()
+            self.check(func, ret)
+            self.bytes_per_point_cache[kind] = value
+        return value
+
+    def buffer_bytes(self, key):
+        return self.allocated[key] * self.bytes_per_point(key[0])
+
+    def memory_in_use(self):
+        """Return the engine memory in bytes held by all pooled buffers, idle or not."""
+        return sum(self.buffer_bytes(key) for key in self.allocated)
+
+    def free(self, key):
+        func = BUFFER_FUNCTIONS[key[0]][1]
+        self.check(func, getattr(self.adv_motion, func)(key[1]))
+        del self.allocated[key]
+        self.idle.pop(key, None)
+
+    def reclaim(self, needed_bytes=0):
+        """Free idle buffers, oldest first, until needed_bytes more fit in max_bytes (all of them without a limit)."""
+        while self.idle:
+            if self.max_bytes is not None and self.memory_in_use() + needed_bytes <= self.max_bytes:
+                break
+            key = next(iter(self.idle))
+            self.free(key)
+
+    def acquire(self, kind, index, points):
+        """Return the number of points of a buffer of at least points for kind on axis/channel index."""
+        key = (kind, index)
+        if key in self.allocated and key not in self.idle:
+            raise ValueError(f"{kind} buffer {index} is already in use")
+
+        if self.allocated.get(key, 0) >= points:
+            self.hit_count += 1
+            del self.idle[key]
+            return self.allocated[key]
+
+        self.miss_count += 1
+        if key in self.allocated:
+            self.free(key)
+        points = -(-points // self.granularity) * self.granularity
+        if self.max_bytes is not None:
+            needed_bytes = points * self.bytes_per_point(kind)
+            self.reclaim(needed_bytes)
+            if self.memory_in_use() + needed_bytes > self.max_bytes:
+                raise ValueError(f"{kind} buffer {index} of {points} points ({needed_bytes} bytes) does not fit "
+                                 f"in max_bytes {self.max_bytes} with {self.memory_in_use()} bytes in use")
+
+        func = BUFFER_FUNCTIONS[kind][0]
+        self.check(func, getattr(self.adv_motion, func)(index, points))
+        self.allocated[key] = points
+        return points
+
+    def release(self, kind, index):
+        """Return a buffer to the pool. It stays allocated until reclaimed."""
+        key = (kind, index)
+        if key not in self.allocated:
+            raise ValueError(f"{kind} buffer {index} is not allocated")
+        self.idle[key] = True
+        self.idle.move_to_end(key)
+
+    @contextmanager
+    def buffer(self, kind, index, points):
+        """Context manager holding a pooled buffer for the duration of a job."""
+        allocated = self.acquire(kind, index, points)
+        try:
+            yield allocated
+        finally:
+            self.release(kind, index)
+
+    def hit_rate(self):
+        total = self.hit_count + self.miss_count
+        return self.hit_count / total if total else 0.0
+
+    def report(self):
+        """Return pool statistics and the engine memory held per buffer kind."""
+        memory = {}
+        for key in self.allocated:
+            memory[key[0]] = memory.get(key[0], 0) + self.buffer_bytes(key)
+        return {
+            'hits': self.hit_count,
+            'misses': self.miss_count,
+            'hit_rate': self.hit_rate(),
+            'buffers': len(self.allocated),
+            'idle': len(self.idle),
+            'bytes': sum(memory.values()),
+            'bytes_per_kind': memory,
+        }
+
+    def free_all(self):
+        for key in list(self.allocated):
+            self.free(key)
+
+
+def linear_segment(targets, smooth_radius=0, velocity=None):
+    """Lookahead path segment: linear move of the configured axes to targets."""
+    return ('linear', tuple(targets), smooth_radius, velocity)
+
+
+def circular_segment(center, end, clockwise=False, velocity=None):
+    """Lookahead path segment: arc on the first two configured axes given center and end points."""
+    return ('circular', tuple(center), tuple(end), int(clockwise), velocity)
+
+
+def circular_3d_segment(through, end, velocity=None):
+    """Lookahead path segment: arc on the first three configured axes through a point to end."""
+    return ('circular_3d', tuple(through), tuple(end), velocity)
+
+
+def sleep_segment(milliseconds):
+    """Lookahead path segment: dwell."""
+    return ('sleep', milliseconds)
+
+
+def output_bit_segment(byte_address, bit_address, value):
+    """Lookahead path segment: set an output bit when the segment is reached."""
+    return ('output', byte_address, bit_address, value)
+
+
+def lookahead_point(segment, axes):
+    """
+    Return a new AdvMotion_PathIntplLookaheadCommandPoint for a segment tuple. A fresh
+    point is built every time so that no field of an earlier segment is sent again.
+    """
+    point = AdvMotion_PathIntplLookaheadCommandPoint()
+    kind = segment[0]
+    if kind == 'linear':
+        _, targets, smooth_radius, velocity = segment
+        point.type = AdvMotion_PathIntplLookaheadSegmentType.Linear
+        data = point.linear
+        data.axisCount = len(targets)
+        for index, target in enumerate(targets):
+            data.SetAxis(index, axes[index])
+            data.SetTarget(index, target)
+        data.smoothRadius = smooth_radius
+    elif kind == 'circular':
+        _, center, end, clockwise, velocity = segment
+        point.type = AdvMotion_PathIntplLookaheadSegmentType.CenterAndEndCircular
+        data = point.centerAndEndCircular
+        for index in range(2):
+            data.SetAxis(index, axes[index])
+            data.SetCenterPos(index, center[index])
+            data.SetEndPos(index, end[index])
+        data.clockwise = clockwise
+    elif kind == 'circular_3d':
+        _, through, end, velocity = segment
+        point.type = AdvMotion_PathIntplLookaheadSegmentType.ThroughAndEnd3DCircular
+        data = point.throughAndEnd3DCircular
+        for index in range(3):
+            data.SetAxis(index, axes[index])
+            data.SetThroughPos(index, through[index])
+            data.SetEndPos(index, end[index])
+    elif kind == 'sleep':
+        point.type = AdvMotion_PathIntplLookaheadSegmentType.Sleep
+        point.sleep.milliseconds = segment[1]
+        return point
+    elif kind == 'output':
+        _, byte_address, bit_address, value = segment
+        point.type = AdvMotion_PathIntplLookaheadSegmentType.SetOutputBit
+        data = point.setOutputBit
+        data.byteAddress = byte_address
+        data.bitAddress = bit_address
+        data.value = value
+        return point
+    else:
+        raise ValueError(f"Unknown lookahead segment type: {kind}")
+
+    data.setSegmentCompositeVel = 1 if velocity is not None else 0
+    if velocity is not None:
+        data.segmentCompositeVel = velocity
+    return point
+
+
+class PathIntplLookaheadFeeder:
+    """
+    Streams path segments from an iterator into a path interpolation lookahead
+    channel from a background thread, keeping the number of buffered points between
+    low_watermark and high_watermark.
+
+    The channel buffer must already exist (CreatePathIntplLookaheadBuffer or
+    AdvMotionBufferPool). starvation_count counts polls that found the buffer empty
+    while segments were still pending.
+
+    The segment iterator is only advanced under feed_lock, so wait() may run while the
+    feeder thread is still alive.
+    """
+    def __init__(self, wmx3_api, channel, axes, configuration=None,
+                 low_watermark=DEFAULT_LOOKAHEAD_LOW_WATERMARK, high_watermark=DEFAULT_LOOKAHEAD_HIGH_WATERMARK,
+                 interval=DEFAULT_FEED_INTERVAL, error_queue=None):
+        self.advanced_motion = AdvancedMotion(wmx3_api)
+        self.adv_motion = self.advanced_motion.advMotion
+        self.channel = channel
+        self.axes = list(axes)
+        self.configuration = configuration
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.interval = interval
+        self.error_queue = error_queue
+
+        self.command = AdvMotion_PathIntplLookaheadCommand()
+        self.segments = None
+        self.next_segment = None
+        self.exhausted = False
+        self.feed_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.feeder_thread = None
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.pushed_count = 0
+        self.executed_count = 0
+        self.starvation_count = 0
+        self.min_remain = None
+        self.error_count = 0
+        self.start_time = None
+        self.status = None
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def data_pending(self):
+        if self.next_segment is None and not self.exhausted:
+            self.next_segment = next(self.segments, None)
+            self.exhausted = self.next_segment is None
+        return self.next_segment is not None
+
+    def push(self, count):
+        """Add up to count segments in commands of at most maxPathIntplLookaheadAppendPoints points."""
+        while count > 0 and self.data_pending():
+            batch = min(count, constants.maxPathIntplLookaheadAppendPoints)
+            filled = 0
+            while filled < batch and self.data_pending():
+                self.command.SetPoint(filled, lookahead_point(self.next_segment, self.axes))
+                self.next_segment = None
+                filled += 1
+            self.command.numPoints = filled
+            self.check("AddPathIntplLookaheadCommand",
+                       self.adv_motion.AddPathIntplLookaheadCommand(self.channel, self.command))
+            self.pushed_count += filled
+            count -= filled
+
+    def refill(self):
+        """Top up the buffer if it is below the low watermark. Returns False when all segments are sent."""
+        ret, status = self.adv_motion.GetPathIntplLookaheadStatus(self.channel)
+        self.check("GetPathIntplLookaheadStatus", ret)
+        self.status = status
+        self.executed_count = status.executedCommandCount
+
+        with self.feed_lock:
+            pending = self.data_pending()
+            if pending and self.pushed_count > 0:
+                remain = status.remainCommandCount
+                self.min_remain = remain if self.min_remain is None else min(self.min_remain, remain)
+                if remain == 0:
+                    self.starvation_count += 1
+            if pending and status.remainCommandCount < self.low_watermark:
+                self.push(min(self.high_watermark - status.remainCommandCount, status.freeBuffer))
+            return self.data_pending()
+
+    def feed_task(self):
+        while not self.stop_event.is_set():
+            try:
+                if not self.refill():
+                    break
+            except RuntimeError:
+                # check_errorcode has already reported the error.
+                self.error_count += 1
+                break
+            self.stop_event.wait(self.interval)
+
+    def start(self, segments):
+        """Configure the channel, prefill it from segments and start execution and the feeder thread."""
+        self.segments = iter(segments)
+        self.next_segment = None
+        self.exhausted = False
+        self.reset_metrics()
+
+        if self.configuration is not None:
+            self.check("SetPathIntplLookaheadConfiguration",
+                       self.adv_motion.SetPathIntplLookaheadConfiguration(self.channel, self.configuration))
+        self.refill()
+        self.check("StartPathIntplLookahead", self.adv_motion.StartPathIntplLookahead(self.channel))
+        self.start_time = monotonic()
+
+        self.stop_event.clear()
+        self.feeder_thread = threading.Thread(target=self.feed_task, daemon=True)
+        self.feeder_thread.start()
+
+    def wait(self, timeout=None):
+        """
+        Wait until every segment has been sent and executed. Returns False on timeout or
+        when the feeder thread ended with an error or with segments left unsent.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        if self.feeder_thread:
+            self.feeder_thread.join(timeout)
+            if not self.feeder_thread.is_alive():
+                with self.feed_lock:
+                    pending = self.data_pending()
+                if self.error_count > 0 or pending:
+                    return False
+        while deadline is None or monotonic() < deadline:
+            ret, status = self.adv_motion.GetPathIntplLookaheadStatus(self.channel)
+            self.check("GetPathIntplLookaheadStatus", ret)
+            self.executed_count = status.executedCommandCount
+            with self.feed_lock:
+                pending = self.data_pending()
+            if status.remainCommandCount == 0 and not pending:
+                return True
+            self.stop_event.wait(self.interval)
+        return False
+
+    def stop(self, abort=False):
+        """Stop feeding. With abort=True the motion is stopped and the buffer cleared."""
+        self.stop_event.set()
+        if self.feeder_thread and self.feeder_thread.is_alive():
+            self.feeder_thread.join()
+        self.feeder_thread = None
+
+        if abort:
+            self.check("StopPathIntplLookahead", self.adv_motion.StopPathIntplLookahead(self.channel))
+            self.check("ClearPathIntplLookahead", self.adv_motion.ClearPathIntplLookahead(self.channel))
+
+    def metrics(self):
+        """Return feed and execution rates in segments per second and the starvation counters."""
+        elapsed = monotonic() - self.start_time if self.start_time is not None else 0.0
+        return {
+            'pushed': self.pushed_count,
+            'executed': self.executed_count,
+            'feed_rate': self.pushed_count / elapsed if elapsed > 0 else 0.0,
+            'execution_rate': self.executed_count / elapsed if elapsed > 0 else 0.0,
+            'starvations': self.starvation_count,
+            'min_remain': self.min_remain,
+            'errors': self.error_count,
+        }
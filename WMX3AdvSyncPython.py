@@ -0,0 +1,165 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+from WMX3UtilPython import check_errorcode
+
+# Import Python libraries
+import numpy as np
+
+from collections import OrderedDict
+
+# Constants
+DEFAULT_ECAM_CACHE_SIZE = 64
+DEFAULT_POINTS_PER_SEGMENT = 64
+
+
+def _modified_sine(u):
+    scale = 1.0 / (4.0 + np.pi)
+    return np.select(
+        [u < 0.125, u < 0.875],
+        [scale * (np.pi * u - 0.25 * np.sin(4.0 * np.pi * u)),
+         scale * (2.0 + np.pi * u - 2.25 * np.sin(np.pi / 3.0 + 4.0 * np.pi * u / 3.0))],
+        scale * (4.0 + np.pi * u - 0.25 * np.sin(4.0 * np.pi * u)))
+
+
+# Normalized cam laws: rise s(u) from s(0) = 0 to s(1) = 1 over master fraction u
+CAM_LAWS = {
+    'dwell': lambda u: np.zeros_like(u),
+    'linear': lambda u: u,
+    'polynomial_345': lambda u: u ** 3 * (10.0 - 15.0 * u + 6.0 * u ** 2),
+    'polynomial_4567': lambda u: u ** 4 * (35.0 - 84.0 * u + 70.0 * u ** 2 - 20.0 * u ** 3),
+    'cycloidal': lambda u: u - np.sin(2.0 * np.pi * u) / (2.0 * np.pi),
+    'modified_sine': _modified_sine,
+}
+
+
+def cam_segment(master_span, slave_rise, law='polynomial_345', points=DEFAULT_POINTS_PER_SEGMENT):
+    """One segment of a cam recipe: the slave moves slave_rise while the master moves master_span."""
+    if law not in CAM_LAWS:
+        raise ValueError(f"Unknown cam law: {law}")
+    if master_span <= 0:
+        raise ValueError("master_span must be positive")
+    return (float(master_span), float(slave_rise), law, int(points))
+
+
+def build_cam_table(segments, master_start=0.0, slave_start=0.0):
+    """Return the (master_pos, slave_pos) arrays of a cam built from cam_segment tuples."""
+    master_parts = [np.array([master_start], dtype=np.float64)]
+    slave_parts = [np.array([slave_start], dtype=np.float64)]
+    master, slave = master_start, slave_start
+    for master_span, slave_rise, law, points in segments:
+        u = np.arange(1, points + 1, dtype=np.float64) / points
+        master_parts.append(master + master_span * u)
+        slave_parts.append(slave + slave_rise * CAM_LAWS[law](u))
+        master += master_span
+        slave += slave_rise
+    return np.concatenate(master_parts), np.concatenate(slave_parts)
+
+
+def cam_table_profile(master_pos, slave_pos):
+    """
+    Return the peak slave velocity, acceleration and jerk per unit master travel of a
+    cam table, and the largest slope change between neighbouring intervals.
+    """
+    slopes = np.diff(slave_pos) / np.diff(master_pos)
+    midpoints = 0.5 * (master_pos[1:] + master_pos[:-1])
+    acc = np.diff(slopes) / np.diff(midpoints) if slopes.size > 1 else np.zeros(0)
+    jerk = np.diff(acc) / np.diff(midpoints[1:]) if acc.size > 1 else np.zeros(0)
+    return {
+        'velocity': float(np.max(np.abs(slopes))) if slopes.size else 0.0,
+        'acc': float(np.max(np.abs(acc))) if acc.size else 0.0,
+        'jerk': float(np.max(np.abs(jerk))) if jerk.size else 0.0,
+        'slope_jump': float(np.max(np.abs(np.diff(slopes)))) if slopes.size > 1 else 0.0,
+    }
+
+
+def check_cam_table(master_pos, slave_pos, max_velocity=None, max_acc=None, max_slope_jump=None):
+    """
+    Raise ValueError if the table does not fit in an AdvSync_ECAMData, the master
+    positions are not strictly increasing or a smoothness limit is exceeded. Returns the
+    cam_table_profile.
+    """
+    if master_pos.size != slave_pos.size:
+        raise ValueError("master_pos and slave_pos must have the same length")
+    if not 2 <= master_pos.size <= constants.maxEcamPoints:
+        raise ValueError(f"Cam table must have 2 to {constants.maxEcamPoints} points, got {master_pos.size}")
+    bad = np.flatnonzero(np.diff(master_pos) <= 0)
+    if bad.size:
+        raise ValueError(f"Master position at point {bad[0] + 1} is not increasing")
+
+    profile = cam_table_profile(master_pos, slave_pos)
+    for name, limit in (('velocity', max_velocity), ('acc', max_acc), ('slope_jump', max_slope_jump)):
+        if limit is not None and profile[name] > limit:
+            raise ValueError(f"Cam {name} {profile[name]:g} exceeds limit {limit:g}")
+    return profile
+
+
+class ECAMTableCache:
+    """
+    Compiles cam recipes into AdvSync_ECAMData and keeps the compiled tables keyed by
+    recipe, axes and options, so switching back to a known recipe only costs StartECAM.
+    """
+    def __init__(self, wmx3_api, max_tables=DEFAULT_ECAM_CACHE_SIZE, error_queue=None):
+        self.advanced_motion = AdvancedMotion(wmx3_api)
+        self.adv_sync = self.advanced_motion.advSync
+        self.max_tables = max_tables
+        self.error_queue = error_queue
+        self.tables = OrderedDict()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    @staticmethod
+    def fill_data(master_axis, slave_axis, master_pos, slave_pos, cam_type=None, source_type=None):
+        """Fill an AdvSync_ECAMData from master/slave position arrays."""
+        data = AdvSync_ECAMData()
+        data.masterAxis = master_axis
+        data.slaveAxis = slave_axis
+        data.numPoints = master_pos.size
+        if cam_type is not None:
+            data.options.type = cam_type
+        if source_type is not None:
+            data.options.source.type = source_type
+        for index, (master, slave) in enumerate(zip(master_pos.tolist(), slave_pos.tolist())):
+            data.SetMasterPos(index, master)
+            data.SetSlavePos(index, slave)
+        return data
+
+    def compile(self, master_axis, slave_axis, segments, master_start=0.0, slave_start=0.0,
+                cam_type=None, source_type=None, **limits):
+        """Return the cached AdvSync_ECAMData for a recipe, building and checking it on a miss."""
+        segments = tuple(segments)
+        key = (master_axis, slave_axis, segments, master_start, slave_start, cam_type, source_type,
+               tuple(sorted(limits.items())))
+        data = self.tables.get(key)
+        if data is not None:
+            self.tables.move_to_end(key)
+            self.hit_count += 1
+            return data
+
+        self.miss_count += 1
+        master_pos, slave_pos = build_cam_table(segments, master_start, slave_start)
+        check_cam_table(master_pos, slave_pos, **limits)
+        data = self.fill_data(master_axis, slave_axis, master_pos, slave_pos, cam_type, source_type)
+        self.tables[key] = data
+        if len(self.tables) > self.max_tables:
+            self.tables.popitem(last=False)
+        return data
+
+    def start(self, channel, master_axis, slave_axis, segments, **options):
+        """Compile (or reuse) a recipe and start it on an ECAM channel."""
+        data = self.compile(master_axis, slave_axis, segments, **options)
+        self.check("StartECAM", self.adv_sync.StartECAM(channel, data))
+        return data
+
+    def stop(self, channel):
+        self.check("StopECAM", self.adv_sync.StopECAM(channel))
+
+    def hit_rate(self):
+        total = self.hit_count + self.miss_count
+        return self.hit_count / total if total else 0.0
+
+    def clear(self):
+        self.tables.clear()
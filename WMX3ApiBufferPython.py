@@ -0,0 +1,575 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+from WMX3UtilPython import check_errorcode
+from WMX3MotionPython import MotionCommandCache, profile_fields, profile_key
+
+# Import Python libraries
+import ast
+import hashlib
+from collections import OrderedDict
+from time import monotonic, sleep
+
+# Constants
+DEFAULT_PROGRAM_WAIT_TIMEOUT = 60.0
+
+# ApiBufferConditionType name -> ApiBufferCondition argument member
+CONDITION_ARGUMENTS = {
+    'NeverTrue': 'arg_neverTrue',
+    'AlwaysTrue': 'arg_alwaysTrue',
+    'IOInput': 'arg_ioInput',
+    'IOOutput': 'arg_ioOutput',
+    'UserMemory': 'arg_userMemory',
+    'Event': 'arg_event',
+    'MinimumTrq': 'arg_minimumTrq',
+    'OpState': 'arg_opState',
+    'AxisCmdMode': 'arg_axisCmdMode',
+    'InPos': 'arg_inPos',
+    'PosSET': 'arg_posSET',
+    'DelayedPosSET': 'arg_delayedPosSET',
+    'CommandDistributedEnd': 'arg_commandDistributedEnd',
+    'RemainingTime': 'arg_remainingTime',
+    'RemainingDistance': 'arg_remainingDistance',
+    'CompletedTime': 'arg_completedTime',
+    'CompletedDistance': 'arg_completedDistance',
+    'DecelerationStarted': 'arg_decelerationStarted',
+    'DistanceToTarget': 'arg_distanceToTarget',
+    'AxisIdle': 'arg_axisIdle',
+    'MotionStarted': 'arg_motionStarted',
+    'MotionStartedOverrideReady': 'arg_motionStartedOverrideReady',
+}
+
+
+class BufferCondition:
+    """
+    Hashable description of an ApiBufferCondition, e.g.
+    BufferCondition('IOInput', byteAddress=0, bitAddress=3) or BufferCondition('AxisIdle', axes=[0, 1]).
+    """
+    def __init__(self, condition_type, **arguments):
+        if condition_type not in CONDITION_ARGUMENTS:
+            raise ValueError(f"Unknown ApiBufferConditionType: {condition_type}")
+        if 'axes' in arguments:
+            arguments['axes'] = tuple(arguments['axes'])
+        self.condition_type = condition_type
+        self.arguments = tuple(sorted(arguments.items()))
+
+    def key(self):
+        return (self.condition_type, self.arguments)
+
+    def __eq__(self, other):
+        return isinstance(other, BufferCondition) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        arguments = ', '.join(f'{name}={value!r}' for name, value in self.arguments)
+        return f"BufferCondition({self.condition_type!r}{', ' if arguments else ''}{arguments})"
+
+    def build(self):
+        condition = ApiBufferCondition()
+        condition.bufferConditionType = getattr(ApiBufferConditionType, self.condition_type)
+        condition_arguments = getattr(condition, CONDITION_ARGUMENTS[self.condition_type])
+        for name, value in self.arguments:
+            if name == 'axes':
+                condition_arguments.axisCount = len(value)
+                for index, axis in enumerate(value):
+                    condition_arguments.SetAxis(index, axis)
+            else:
+                setattr(condition_arguments, name, value)
+        return condition
+
+
+class MotionSequence:
+    """
+    Records a host-independent sequence of motion, I/O, wait and flow steps. A sequence
+    is only data; ApiBufferProgramCache compiles it into an ApiBuffer channel.
+    """
+    def __init__(self):
+        self.steps = []
+
+    def start_pos(self, axis, target, **profile_fields):
+        self.steps.append(('start_pos', axis, target, profile_key(profile_fields)))
+        return self
+
+    def start_mov(self, axis, target, **profile_fields):
+        self.steps.append(('start_mov', axis, target, profile_key(profile_fields)))
+        return self
+
+    def start_linear_intpl_pos(self, axes, targets, **profile_fields):
+        self.steps.append(('start_linear_intpl_pos', tuple(axes), tuple(targets), profile_key(profile_fields)))
+        return self
+
+    def start_linear_intpl_mov(self, axes, targets, **profile_fields):
+        self.steps.append(('start_linear_intpl_mov', tuple(axes), tuple(targets), profile_key(profile_fields)))
+        return self
+
+    def set_output_bit(self, byte_address, bit_address, value):
+        self.steps.append(('set_output_bit', byte_address, bit_address, value))
+        return self
+
+    def wait(self, axis):
+        self.steps.append(('wait', axis))
+        return self
+
+    def wait_axes(self, axes):
+        self.steps.append(('wait_axes', tuple(axes)))
+        return self
+
+    def wait_condition(self, condition):
+        self.steps.append(('wait_condition', condition))
+        return self
+
+    def sleep(self, milliseconds):
+        self.steps.append(('sleep', milliseconds))
+        return self
+
+    def flow_if(self, condition):
+        self.steps.append(('flow_if', condition))
+        return self
+
+    def flow_else_if(self, condition):
+        self.steps.append(('flow_else_if', condition))
+        return self
+
+    def flow_else(self):
+        self.steps.append(('flow_else',))
+        return self
+
+    def flow_end_if(self):
+        self.steps.append(('flow_end_if',))
+        return self
+
+    def validate(self):
+        """Check that FlowIf/FlowElseIf/FlowElse/FlowEndIf are balanced."""
+        depth = []
+        for index, step in enumerate(self.steps):
+            op = step[0]
+            if op == 'flow_if':
+                depth.append(False)
+            elif op in ('flow_else_if', 'flow_else'):
+                if not depth or depth[-1]:
+                    raise ValueError(f"Step {index}: {op} without matching flow_if")
+                if op == 'flow_else':
+                    depth[-1] = True
+            elif op == 'flow_end_if':
+                if not depth:
+                    raise ValueError(f"Step {index}: flow_end_if without matching flow_if")
+                depth.pop()
+        if depth:
+            raise ValueError("Sequence ends inside a flow_if block")
+
+    def sequence_hash(self):
+        return hashlib.sha1(repr(self.steps).encode('utf-8')).hexdigest()
+
+    def __len__(self):
+        return len(self.steps)
+
+
+class ApiBufferProgramCache:
+    """
+    Compiles MotionSequence objects into ApiBuffer channels and keeps them recorded, keyed
+    by sequence hash. Running a cached sequence only rewinds and executes its channel.
+    When all channels are in use the least recently run program is freed.
+    """
+    def __init__(self, wmx3_api, core_motion, io=None, channels=None, buffer_size=None, error_queue=None):
+        self.api_buffer = ApiBuffer(wmx3_api)
+        self.core_motion = core_motion
+        self.io = io
+        self.buffer_size = buffer_size
+        self.error_queue = error_queue
+        self.free_channels = list(channels if channels is not None else range(constants.maxApiBufferChannel))
+        self.programs = OrderedDict()
+        self.commands = MotionCommandCache()
+        self.compile_count = 0
+        self.hit_count = 0
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def replay_step(self, step):
+        """Issue the API call for one step. While recording, the engine stores it in the buffer."""
+        op = step[0]
+        motion = self.core_motion.motion
+        if op in ('start_pos', 'start_mov'):
+            _, axis, target, key = step
+            command = self.commands.pos_command(axis, target, **profile_fields(key))
+            ret = motion.StartPos(command) if op == 'start_pos' else motion.StartMov(command)
+            self.check(f"{'StartPos' if op == 'start_pos' else 'StartMov'} during recording", ret)
+        elif op in ('start_linear_intpl_pos', 'start_linear_intpl_mov'):
+            _, axes, targets, key = step
+            command = self.commands.linear_intpl_command(axes, targets, **profile_fields(key))
+            if op == 'start_linear_intpl_pos':
+                self.check("StartLinearIntplPos during recording", motion.StartLinearIntplPos(command))
+            else:
+                self.check("StartLinearIntplMov during recording", motion.StartLinearIntplMov(command))
+        elif op == 'set_output_bit':
+            if self.io is None:
+                raise ValueError("set_output_bit requires an Io instance")
+            self.check("SetOutBit during recording", self.io.SetOutBit(step[1], step[2], step[3]))
+        elif op == 'wait':
+            self.check("Wait during recording", self.api_buffer.Wait(step[1]))
+        elif op == 'wait_axes':
+            axis_sel = AxisSelection()
+            axis_sel.axisCount = len(step[1])
+            for index, axis in enumerate(step[1]):
+                axis_sel.SetAxis(index, axis)
+            self.check("Wait_AxisSel during recording", self.api_buffer.Wait_AxisSel(axis_sel))
+        elif op == 'wait_condition':
+            self.check("Wait_ApiBufferCondition during recording",
+                       self.api_buffer.Wait_ApiBufferCondition(step[1].build()))
+        elif op == 'sleep':
+            self.check("Sleep during recording", self.api_buffer.Sleep(step[1]))
+        elif op == 'flow_if':
+            self.check("FlowIf during recording", self.api_buffer.FlowIf(step[1].build()))
+        elif op == 'flow_else_if':
+            self.check("FlowElseIf during recording", self.api_buffer.FlowElseIf(step[1].build()))
+        elif op == 'flow_else':
+            self.check("FlowElse during recording", self.api_buffer.FlowElse())
+        elif op == 'flow_end_if':
+            self.check("FlowEndIf during recording", self.api_buffer.FlowEndIf())
+        else:
+            raise ValueError(f"Unknown sequence step: {op}")
+
+    def allocate_channel(self):
+        if not self.free_channels:
+            _, evicted_channel = self.programs.popitem(last=False)
+            self.check("FreeApiBuffer", self.api_buffer.FreeApiBuffer(evicted_channel))
+            self.free_channels.append(evicted_channel)
+        channel = self.free_channels.pop(0)
+
+        if self.buffer_size is None:
+            ret = self.api_buffer.CreateApiBuffer(channel)
+        else:
+            ret = self.api_buffer.CreateApiBuffer(channel, self.buffer_size)
+        if ret != ErrorCode.PyNone:
+            self.free_channels.insert(0, channel)
+            check_errorcode("CreateApiBuffer", ret, self.error_queue)
+        return channel
+
+    def compile(self, sequence, min_free_size=0):
+        """
+        Return the channel holding the recorded sequence, recording it if necessary.
+        Raises ValueError before recording if the cleared channel has less than
+        min_free_size bytes free.
+        """
+        sequence_hash = sequence.sequence_hash()
+        channel = self.programs.get(sequence_hash)
+        if channel is not None:
+            self.programs.move_to_end(sequence_hash)
+            self.hit_count += 1
+            return channel
+
+        sequence.validate()
+        channel = self.allocate_channel()
+        try:
+            self.check("Clear", self.api_buffer.Clear(channel))
+            ret, status = self.api_buffer.GetStatus(channel)
+            self.check("GetStatus", ret)
+            if status.freeSize < min_free_size:
+                raise ValueError(f"ApiBuffer channel {channel} has {status.freeSize} bytes free, "
+                                 f"{min_free_size} required")
+            self.check("StartRecordBufferChannel", self.api_buffer.StartRecordBufferChannel(channel))
+            try:
+                for step in sequence.steps:
+                    self.replay_step(step)
+            except Exception:
+                # End the recording unchecked so the replay error is the one reported.
+                self.api_buffer.EndRecordBufferChannel()
+                raise
+            self.check("EndRecordBufferChannel", self.api_buffer.EndRecordBufferChannel())
+        except Exception:
+            self.api_buffer.FreeApiBuffer(channel)
+            self.free_channels.append(channel)
+            raise
+
+        self.programs[sequence_hash] = channel
+        self.compile_count += 1
+        return channel
+
+    def run(self, sequence, wait=False, timeout=DEFAULT_PROGRAM_WAIT_TIMEOUT):
+        """Compile (or reuse) the sequence and execute it from its first block."""
+        channel = self.compile(sequence)
+        self.check("Rewind", self.api_buffer.Rewind(channel))
+        self.check("Execute", self.api_buffer.Execute(channel))
+        if wait:
+            self.wait(channel, timeout)
+        return channel
+
+    def wait(self, channel, timeout=DEFAULT_PROGRAM_WAIT_TIMEOUT):
+        """Poll until the channel has executed all blocks. Returns False on timeout."""
+        deadline = monotonic() + timeout
+        while monotonic() < deadline:
+            ret, status = self.api_buffer.GetStatus(channel)
+            self.check("GetStatus", ret)
+            if status.errorCount > 0:
+                error_log = status.GetErrorLog(0)
+                check_errorcode(f"ApiBuffer channel {channel} block {error_log.execBlockNumber}",
+                                error_log.errorCode, self.error_queue)
+            if status.remainingBlockCount == 0 and status.state != ApiBufferState.Active:
+                return True
+            sleep(0.001)
+        return False
+
+    def block_count(self, channel):
+        ret, status = self.api_buffer.GetStatus(channel)
+        self.check("GetStatus", ret)
+        return status.blockCount
+
+    def compile_script(self, source, min_free_size=0, **names):
+        """
+        Compile a restricted-Python script (see parse_script) into a channel and return a
+        report with the channel, recorded block count and remaining buffer space.
+        Raises ValueError before recording if the channel has less than min_free_size bytes free.
+        """
+        sequence = parse_script(source, **names)
+        channel = self.compile(sequence, min_free_size)
+        ret, status = self.api_buffer.GetStatus(channel)
+        self.check("GetStatus", ret)
+        return {
+            'channel': channel,
+            'sequence': sequence,
+            'step_count': len(sequence),
+            'block_count': status.blockCount,
+            'buffer_size': status.bufferSize,
+            'free_size': status.freeSize,
+        }
+
+    def free_all(self):
+        for channel in self.programs.values():
+            self.api_buffer.FreeApiBuffer(channel)
+            self.free_channels.append(channel)
+        self.programs.clear()
+
+
+# Axis attributes usable as conditions in scripts: attribute -> ApiBufferConditionType
+SCRIPT_AXIS_FLAGS = {
+    'in_pos': 'InPos',
+    'pos_set': 'PosSET',
+    'delayed_pos_set': 'DelayedPosSET',
+    'distributed_end': 'CommandDistributedEnd',
+    'decelerating': 'DecelerationStarted',
+    'motion_started': 'MotionStarted',
+    'override_ready': 'MotionStartedOverrideReady',
+    'idle': 'AxisIdle',
+}
+# Axis quantities usable in comparisons: attribute -> (ApiBufferConditionType, argument, operators)
+SCRIPT_AXIS_QUANTITIES = {
+    'remaining_distance': ('RemainingDistance', 'distance', (ast.Lt, ast.LtE)),
+    'remaining_time': ('RemainingTime', 'timeMilliseconds', (ast.Lt, ast.LtE)),
+    'distance_to_target': ('DistanceToTarget', 'distance', (ast.Lt, ast.LtE)),
+    'completed_distance': ('CompletedDistance', 'distance', (ast.Gt, ast.GtE)),
+    'completed_time': ('CompletedTime', 'timeMilliseconds', (ast.Gt, ast.GtE)),
+}
+# Bit sources usable as conditions in scripts: name -> ApiBufferConditionType
+SCRIPT_BIT_SOURCES = {
+    'io': 'IOInput',
+    'out': 'IOOutput',
+    'mem': 'UserMemory',
+}
+
+
+class ScriptCompiler:
+    """
+    Translates a restricted subset of Python into a MotionSequence. Supported statements:
+
+        start_pos(axis, target, velocity=..., acc=..., dec=..., type='SCurve')
+        start_mov(axis, distance, ...)
+        linear_pos([axes], [targets], ...) / linear_mov([axes], [distances], ...)
+        set_out_bit(byte, bit, value)
+        wait(axis) / wait([axes]) / wait_until(condition) / sleep(milliseconds)
+        if / elif / else, pass
+
+    Conditions: io[byte].bit(n), out[byte].bit(n), mem[byte].bit(n), axis(n).in_pos,
+    axis(n).in_pos(channel), axis(n).idle, axis(n).pos_set, axis(n).remaining_distance <= x,
+    axis(n).completed_time >= x, ..., event(id), True, False, combined with and/or/not.
+    ApiBuffer only evaluates single conditions, so and/or are compiled into nested
+    FlowIf blocks (duplicating the branch that is shared).
+    """
+    def __init__(self, names=None):
+        self.names = dict(names or {})
+        self.sequence = MotionSequence()
+
+    def error(self, node, message):
+        return ValueError(f"line {getattr(node, 'lineno', '?')}: {message}")
+
+    def value(self, node):
+        """Evaluate a constant expression: numbers, strings, names passed in, lists and arithmetic."""
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id not in self.names:
+                raise self.error(node, f"unknown name '{node.id}'")
+            return self.names[node.id]
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return [self.value(element) for element in node.elts]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self.value(node.operand)
+            return -operand if isinstance(node.op, ast.USub) else operand
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.Div)):
+            left, right = self.value(node.left), self.value(node.right)
+            if isinstance(node.op, ast.Add):
+                return left + right
+            if isinstance(node.op, ast.Sub):
+                return left - right
+            if isinstance(node.op, ast.Mult):
+                return left * right
+            return left / right
+        raise self.error(node, "only constant expressions are allowed here")
+
+    def call_name(self, node):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            return node.func.id
+        return None
+
+    def axis_of(self, node):
+        """Return the axis number of an axis(n) call, or None."""
+        if self.call_name(node) == 'axis' and len(node.args) == 1 and not node.keywords:
+            return self.value(node.args[0])
+        return None
+
+    def condition(self, node, invert=False):
+        """Translate a single (non and/or) condition expression into a BufferCondition."""
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return self.condition(node.operand, not invert)
+
+        if isinstance(node, ast.Constant) and isinstance(node.value, bool):
+            return BufferCondition('AlwaysTrue' if node.value != invert else 'NeverTrue')
+
+        # io[byte].bit(n), out[byte].bit(n), mem[byte].bit(n)
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'bit'
+                and isinstance(node.func.value, ast.Subscript) and isinstance(node.func.value.value, ast.Name)
+                and node.func.value.value.id in SCRIPT_BIT_SOURCES and len(node.args) == 1):
+            return BufferCondition(SCRIPT_BIT_SOURCES[node.func.value.value.id],
+                                   byteAddress=self.value(node.func.value.slice),
+                                   bitAddress=self.value(node.args[0]), invert=int(invert))
+
+        if invert:
+            raise self.error(node, "'not' is only supported for io/out/mem bits and True/False")
+
+        # event(id)
+        if self.call_name(node) == 'event' and len(node.args) == 1:
+            return BufferCondition('Event', eventID=self.value(node.args[0]))
+
+        # axis(n).flag and axis(n).in_pos(channel)
+        attribute, channel = node, None
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'in_pos':
+            attribute, channel = node.func, self.value(node.args[0]) if node.args else 0
+        if isinstance(attribute, ast.Attribute) and attribute.attr in SCRIPT_AXIS_FLAGS:
+            axis = self.axis_of(attribute.value)
+            if axis is not None:
+                condition_type = SCRIPT_AXIS_FLAGS[attribute.attr]
+                if condition_type == 'AxisIdle':
+                    return BufferCondition(condition_type, axes=[axis])
+                if condition_type == 'InPos':
+                    return BufferCondition(condition_type, axis=axis, channel=channel or 0)
+                return BufferCondition(condition_type, axis=axis)
+
+        # axis(n).quantity <= value
+        if (isinstance(node, ast.Compare) and len(node.ops) == 1 and isinstance(node.left, ast.Attribute)
+                and node.left.attr in SCRIPT_AXIS_QUANTITIES):
+            axis = self.axis_of(node.left.value)
+            condition_type, argument, operators = SCRIPT_AXIS_QUANTITIES[node.left.attr]
+            if axis is None or not isinstance(node.ops[0], operators):
+                raise self.error(node, f"unsupported comparison on {node.left.attr}")
+            return BufferCondition(condition_type, axis=axis, **{argument: self.value(node.comparators[0])})
+
+        raise self.error(node, f"unsupported condition: {ast.unparse(node)}")
+
+    def is_simple(self, node):
+        return not isinstance(node, ast.BoolOp)
+
+    def emit_if(self, test, body, orelse):
+        """Emit FlowIf blocks for test; body and orelse are callables emitting the branches."""
+        if isinstance(test, ast.BoolOp):
+            first, rest = test.values[0], test.values[1:]
+            remainder = rest[0] if len(rest) == 1 else ast.BoolOp(op=test.op, values=rest)
+            if isinstance(test.op, ast.And):
+                self.emit_if(first, lambda: self.emit_if(remainder, body, orelse), orelse)
+            else:
+                self.emit_if(first, body, lambda: self.emit_if(remainder, body, orelse))
+            return
+
+        self.sequence.flow_if(self.condition(test))
+        body()
+        if orelse is not None:
+            self.sequence.flow_else()
+            orelse()
+        self.sequence.flow_end_if()
+
+    def statement_if(self, node):
+        # Chains of simple elif conditions map directly onto FlowElseIf.
+        if self.is_simple(node.test):
+            self.sequence.flow_if(self.condition(node.test))
+            self.statements(node.body)
+            orelse = node.orelse
+            while len(orelse) == 1 and isinstance(orelse[0], ast.If) and self.is_simple(orelse[0].test):
+                self.sequence.flow_else_if(self.condition(orelse[0].test))
+                self.statements(orelse[0].body)
+                orelse = orelse[0].orelse
+            if orelse:
+                self.sequence.flow_else()
+                self.statements(orelse)
+            self.sequence.flow_end_if()
+            return
+
+        self.emit_if(node.test, lambda: self.statements(node.body),
+                     (lambda: self.statements(node.orelse)) if node.orelse else None)
+
+    def profile_arguments(self, node):
+        fields = {}
+        for keyword in node.keywords:
+            value = self.value(keyword.value)
+            if keyword.arg == 'type' and isinstance(value, str):
+                value = getattr(ProfileType, value)
+            fields[keyword.arg] = value
+        return fields
+
+    def statement_call(self, node):
+        name = self.call_name(node)
+        args = node.args
+        try:
+            if name in ('start_pos', 'start_mov') and len(args) == 2:
+                method = self.sequence.start_pos if name == 'start_pos' else self.sequence.start_mov
+                method(self.value(args[0]), self.value(args[1]), **self.profile_arguments(node))
+            elif name in ('linear_pos', 'linear_mov') and len(args) == 2:
+                method = (self.sequence.start_linear_intpl_pos if name == 'linear_pos'
+                          else self.sequence.start_linear_intpl_mov)
+                method(self.value(args[0]), self.value(args[1]), **self.profile_arguments(node))
+            elif name == 'set_out_bit' and len(args) == 3:
+                self.sequence.set_output_bit(*(self.value(arg) for arg in args))
+            elif name == 'wait' and len(args) == 1:
+                axes = self.value(args[0])
+                if isinstance(axes, list):
+                    self.sequence.wait_axes(axes)
+                else:
+                    self.sequence.wait(axes)
+            elif name == 'wait_until' and len(args) == 1:
+                if not self.is_simple(args[0]):
+                    raise self.error(node, "wait_until accepts a single condition")
+                self.sequence.wait_condition(self.condition(args[0]))
+            elif name == 'sleep' and len(args) == 1:
+                self.sequence.sleep(self.value(args[0]))
+            else:
+                raise self.error(node, f"unsupported statement: {ast.unparse(node)}")
+        except (AttributeError, TypeError) as e:
+            raise self.error(node, str(e))
+
+    def statements(self, nodes):
+        for node in nodes:
+            if isinstance(node, ast.If):
+                self.statement_if(node)
+            elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+                self.statement_call(node.value)
+            elif isinstance(node, ast.Pass):
+                continue
+            else:
+                raise self.error(node, f"unsupported statement: {ast.unparse(node)}")
+
+
+def parse_script(source, **names):
+    """Compile a restricted-Python script into a MotionSequence. names supplies constants."""
+    compiler = ScriptCompiler(names)
+    compiler.statements(ast.parse(source).body)
+    compiler.sequence.validate()
+    return compiler.sequence
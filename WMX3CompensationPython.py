@@ -0,0 +1,514 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+from WMX3UtilPython import check_errorcode
+
+# Import Python libraries
+import numpy as np
+
+from time import sleep
+
+# Constants
+DEFAULT_VERIFY_SAMPLES = 64
+DEFAULT_CAPTURE_CHUNK_ROWS = 1 << 20
+DEFAULT_CAPTURE_INTERVAL = 0.1
+
+
+def _dropoff_index(pos, origin_position, origin_index, interval, direction, count, edge_dropoff):
+    """
+    Return the fractional table index of each position, clamped to the table, and the
+    edge dropoff factor (1 inside the table, falling linearly to 0 over edge_dropoff).
+    """
+    sign = -1.0 if direction else 1.0
+    index = origin_index + sign * (pos - origin_position) / interval
+    outside = np.maximum(np.maximum(-index, index - (count - 1)), 0.0) * interval
+    if edge_dropoff > 0:
+        factor = np.clip(1.0 - outside / edge_dropoff, 0.0, 1.0)
+    else:
+        factor = (outside == 0).astype(np.float64)
+    return np.clip(index, 0.0, count - 1), factor
+
+
+def _interpolate(values, index):
+    """Linear interpolation of values at fractional indices along the first axis."""
+    lower = np.minimum(np.floor(index).astype(np.int64), values.shape[0] - 2)
+    weight = index - lower
+    if values.ndim > 1:
+        weight = weight[..., None]
+    return values[lower] * (1.0 - weight) + values[lower + 1] * weight
+
+
+class PitchErrorTable:
+    """
+    Local copy of a PitchErrorCompensationData table that is evaluated vectorized.
+
+    Table point i lies at pitchOriginPosition + (i - pitchOriginIndex) * pitchInterval,
+    or at decreasing positions when pitchIntervalDirection is non-zero. Between points
+    the compensation is interpolated linearly; outside the table it falls linearly from
+    the edge value to 0 over edgeDropoffDistance.
+    """
+    def __init__(self, values, origin_position=0.0, origin_index=0, interval=1.0, direction=0, edge_dropoff=0.0):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.origin_position = origin_position
+        self.origin_index = origin_index
+        self.interval = interval
+        self.direction = direction
+        self.edge_dropoff = edge_dropoff
+        # Per-point error statistics when the table was generated from captures
+        self.statistics = None
+
+    @classmethod
+    def from_data(cls, data):
+        count = data.pitchCount
+        values = [data.GetPitchCompensationValue(index) for index in range(count)]
+        return cls(values, data.pitchOriginPosition, data.pitchOriginIndex, data.pitchInterval,
+                   data.pitchIntervalDirection, data.edgeDropoffDistance)
+
+    def to_data(self, options=None):
+        """Return an enabled PitchErrorCompensationData for SetPitchErrorCompensation."""
+        if not 2 <= self.values.size <= constants.maxPitchErrorCompPoints:
+            raise ValueError(f"Pitch table must have 2 to {constants.maxPitchErrorCompPoints} points, "
+                             f"got {self.values.size}")
+        data = PitchErrorCompensationData()
+        data.enable = 1
+        data.pitchOriginPosition = self.origin_position
+        data.pitchOriginIndex = self.origin_index
+        data.pitchInterval = self.interval
+        data.pitchIntervalDirection = self.direction
+        data.pitchCount = self.values.size
+        data.edgeDropoffDistance = self.edge_dropoff
+        for index, value in enumerate(self.values.tolist()):
+            data.SetPitchCompensationValue(index, value)
+        if options is not None:
+            data.options = options
+        return data
+
+    def positions(self):
+        """Return the positions of the table points."""
+        sign = -1.0 if self.direction else 1.0
+        return self.origin_position + sign * (np.arange(self.values.size) - self.origin_index) * self.interval
+
+    def evaluate(self, pos):
+        """Return the compensation at each position of pos."""
+        pos = np.asarray(pos, dtype=np.float64)
+        if self.values.size < 2:
+            return np.zeros_like(pos)
+        index, factor = _dropoff_index(pos, self.origin_position, self.origin_index, self.interval,
+                                       self.direction, self.values.size, self.edge_dropoff)
+        return _interpolate(self.values, index) * factor
+
+
+class PitchErrorTable2D:
+    """
+    Local copy of a TwoDPitchErrorCompensationData table, evaluated with bilinear
+    interpolation over the two reference axis positions. The edge dropoff factors of
+    both reference axes are multiplied.
+    """
+    def __init__(self, values, axis, reference_axes, origin_positions=(0.0, 0.0), origin_indexes=(0, 0),
+                 intervals=(1.0, 1.0), edge_dropoffs=(0.0, 0.0)):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.axis = axis
+        self.reference_axes = tuple(reference_axes)
+        self.origin_positions = tuple(origin_positions)
+        self.origin_indexes = tuple(origin_indexes)
+        self.intervals = tuple(intervals)
+        self.edge_dropoffs = tuple(edge_dropoffs)
+        self.statistics = None
+
+    @classmethod
+    def from_data(cls, data):
+        counts = (data.GetPitchCount(0), data.GetPitchCount(1))
+        values = [[data.GetPitchCompensationValue(row, column) for column in range(counts[1])]
+                  for row in range(counts[0])]
+        return cls(values, data.axis, [data.GetReferenceAxis(i) for i in range(2)],
+                   [data.GetPitchOriginPosition(i) for i in range(2)],
+                   [data.GetPitchOriginIndex(i) for i in range(2)],
+                   [data.GetPitchInterval(i) for i in range(2)],
+                   [data.GetEdgeDropoffDistance(i) for i in range(2)])
+
+    def to_data(self, options=None):
+        """Return an enabled TwoDPitchErrorCompensationData for Set2DPitchErrorCompensation."""
+        if not all(2 <= count <= constants.max2dPitchErrorCompPoints for count in self.values.shape):
+            raise ValueError(f"2-D pitch table must have 2 to {constants.max2dPitchErrorCompPoints} points "
+                             f"per axis, got {self.values.shape}")
+        data = TwoDPitchErrorCompensationData()
+        data.enable = 1
+        data.axis = self.axis
+        for dimension in range(2):
+            data.SetReferenceAxis(dimension, self.reference_axes[dimension])
+            data.SetPitchOriginPosition(dimension, self.origin_positions[dimension])
+            data.SetPitchOriginIndex(dimension, self.origin_indexes[dimension])
+            data.SetPitchInterval(dimension, self.intervals[dimension])
+            data.SetPitchCount(dimension, self.values.shape[dimension])
+            data.SetEdgeDropoffDistance(dimension, self.edge_dropoffs[dimension])
+        for row, values in enumerate(self.values.tolist()):
+            for column, value in enumerate(values):
+                data.SetPitchCompensationValue(row, column, value)
+        if options is not None:
+            data.options = options
+        return data
+
+    def evaluate(self, pos1, pos2):
+        """Return the compensation of the compensated axis at reference positions (pos1, pos2)."""
+        pos1, pos2 = np.broadcast_arrays(np.asarray(pos1, dtype=np.float64), np.asarray(pos2, dtype=np.float64))
+        if min(self.values.shape) < 2:
+            return np.zeros_like(pos1)
+        index1, factor1 = _dropoff_index(pos1, self.origin_positions[0], self.origin_indexes[0], self.intervals[0],
+                                         0, self.values.shape[0], self.edge_dropoffs[0])
+        index2, factor2 = _dropoff_index(pos2, self.origin_positions[1], self.origin_indexes[1], self.intervals[1],
+                                         0, self.values.shape[1], self.edge_dropoffs[1])
+        # Interpolate along the first reference axis, then along the second.
+        rows = _interpolate(self.values, index1.reshape(-1))
+        lower = np.minimum(np.floor(index2.reshape(-1)).astype(np.int64), self.values.shape[1] - 2)
+        weight = index2.reshape(-1) - lower
+        points = np.arange(rows.shape[0])
+        result = rows[points, lower] * (1.0 - weight) + rows[points, lower + 1] * weight
+        return result.reshape(pos1.shape) * factor1 * factor2
+
+
+class CompensationModel:
+    """
+    Reads the pitch error compensation tables of a set of axes and 2-D channels once
+    and predicts compensated positions for whole paths without engine round trips.
+    """
+    def __init__(self, wmx3_api, error_queue=None):
+        self.compensation = Compensation(wmx3_api)
+        self.error_queue = error_queue
+        self.tables = {}
+        self.tables_2d = {}
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def load(self, axes=(), channels=()):
+        """Read the 1-D tables of axes and the 2-D tables of channels from the engine."""
+        for axis in axes:
+            ret, data = self.compensation.GetPitchErrorCompensation(axis)
+            self.check("GetPitchErrorCompensation", ret)
+            if data.enable:
+                self.tables[axis] = PitchErrorTable.from_data(data)
+        for channel in channels:
+            ret, data = self.compensation.Get2DPitchErrorCompensation(channel)
+            self.check("Get2DPitchErrorCompensation", ret)
+            if data.enable:
+                self.tables_2d[channel] = PitchErrorTable2D.from_data(data)
+
+    def compensation_of(self, path, axes):
+        """
+        Return the total compensation of each axis for a (points x axes) array of command
+        positions. 2-D tables need both reference axes to be part of axes.
+        """
+        path = np.asarray(path, dtype=np.float64).reshape(-1, len(axes))
+        columns = {axis: path[:, index] for index, axis in enumerate(axes)}
+        result = np.zeros_like(path)
+        for index, axis in enumerate(axes):
+            if axis in self.tables:
+                result[:, index] += self.tables[axis].evaluate(columns[axis])
+        for table in self.tables_2d.values():
+            if table.axis in columns and all(axis in columns for axis in table.reference_axes):
+                result[:, list(axes).index(table.axis)] += table.evaluate(
+                    columns[table.reference_axes[0]], columns[table.reference_axes[1]])
+        return result
+
+    def predict(self, path, axes):
+        """Return the compensated positions of a (points x axes) array of command positions."""
+        path = np.asarray(path, dtype=np.float64).reshape(-1, len(axes))
+        return path + self.compensation_of(path, axes)
+
+    def verify(self, axis=None, channel=None, positions=None, samples=DEFAULT_VERIFY_SAMPLES):
+        """
+        Compare the local evaluation with GetPitchErrorCompensationAtPosition (axis) or
+        Get2DPitchErrorCompensationAtPosition (channel) and return the largest absolute
+        difference. By default samples positions spanning the table and its dropoff zones.
+        """
+        if axis is not None:
+            table = self.tables[axis]
+            if positions is None:
+                table_positions = table.positions()
+                margin = table.edge_dropoff + table.interval
+                positions = np.linspace(table_positions.min() - margin, table_positions.max() + margin, samples)
+            positions = np.asarray(positions, dtype=np.float64)
+            engine = np.empty_like(positions)
+            for index, pos in enumerate(positions.tolist()):
+                ret, engine[index] = self.compensation.GetPitchErrorCompensationAtPosition(axis, pos)
+                self.check("GetPitchErrorCompensationAtPosition", ret)
+            return float(np.max(np.abs(engine - table.evaluate(positions))))
+
+        table = self.tables_2d[channel]
+        if positions is None:
+            grids = []
+            for dimension in range(2):
+                first = table.origin_positions[dimension] - table.origin_indexes[dimension] * table.intervals[dimension]
+                last = first + (table.values.shape[dimension] - 1) * table.intervals[dimension]
+                margin = table.edge_dropoffs[dimension] + table.intervals[dimension]
+                grids.append(np.linspace(first - margin, last + margin, int(np.sqrt(samples)) or 1))
+            positions = np.stack([grid.reshape(-1) for grid in np.meshgrid(*grids)], axis=1)
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        engine = np.empty(positions.shape[0])
+        for index, (pos1, pos2) in enumerate(positions.tolist()):
+            ret, engine[index] = self.compensation.Get2DPitchErrorCompensationAtPosition(channel, pos1, pos2)
+            self.check("Get2DPitchErrorCompensationAtPosition", ret)
+        return float(np.max(np.abs(engine - table.evaluate(positions[:, 0], positions[:, 1]))))
+
+
+def table_geometry(min_pos, max_pos, max_points, interval=None):
+    """
+    Return (origin_position, interval, count) of a table covering [min_pos, max_pos].
+    Without an interval the finest one that fits in max_points is used; an interval
+    that would need more points raises ValueError.
+    """
+    span = max_pos - min_pos
+    if span <= 0:
+        raise ValueError("max_pos must be greater than min_pos")
+    if interval is None:
+        interval = span / (max_points - 1)
+    count = max(int(np.ceil(span / interval - 1e-9)) + 1, 2)
+    if count > max_points:
+        raise ValueError(f"Interval {interval:g} needs {count} points, the table limit is {max_points}")
+    return min_pos, interval, count
+
+
+def iterate_capture_file(file_path, chunk_rows=DEFAULT_CAPTURE_CHUNK_ROWS):
+    """Yield consecutive row chunks of a (memory-mapped) .npy capture file."""
+    capture = np.load(file_path, mmap_mode='r')
+    for start in range(0, capture.shape[0], chunk_rows):
+        yield np.asarray(capture[start:start + chunk_rows])
+
+
+class PitchErrorBinner:
+    """
+    Accumulates position error statistics per table point from streamed chunks.
+
+    Each sample is assigned to the nearest table point (origin_position + i * interval
+    per dimension) and the count, sum, sum of squares, minimum and maximum of the error
+    (reference - command) are accumulated with np.bincount, so captures of any size are
+    processed in constant memory.
+
+    The sums of a local linear fit of the error against the offset from the point are
+    accumulated as well, so that the value at the point is not biased when the samples
+    of a bin are not centred on it (for example at the table edges).
+    """
+    def __init__(self, origin_positions, intervals, counts):
+        self.origin_positions = np.atleast_1d(np.asarray(origin_positions, dtype=np.float64))
+        self.intervals = np.atleast_1d(np.asarray(intervals, dtype=np.float64))
+        self.counts = tuple(np.atleast_1d(counts).tolist())
+        size = int(np.prod(self.counts))
+        self.sample_count = np.zeros(size, dtype=np.int64)
+        self.error_sum = np.zeros(size)
+        self.error_sum_sq = np.zeros(size)
+        self.error_min = np.full(size, np.inf)
+        self.error_max = np.full(size, -np.inf)
+        # Normal equations of error ~ c + offsets . slope per point
+        features = len(self.counts) + 1
+        self.gram = np.zeros((size, features, features))
+        self.moments = np.zeros((size, features))
+        self.outside_count = 0
+
+    def update(self, positions, errors):
+        """Add samples: positions is (samples,) or (samples x 2) reference positions."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, len(self.counts))
+        errors = np.asarray(errors, dtype=np.float64).reshape(-1)
+        indexes = np.rint((positions - self.origin_positions) / self.intervals).astype(np.int64)
+        inside = np.all((indexes >= 0) & (indexes < np.asarray(self.counts)), axis=1)
+        self.outside_count += int(np.count_nonzero(~inside))
+        flat = np.ravel_multi_index(tuple(indexes[inside].T), self.counts)
+        errors = errors[inside]
+        offsets = (positions[inside] - self.origin_positions) / self.intervals - indexes[inside]
+        features = np.concatenate((np.ones((offsets.shape[0], 1)), offsets), axis=1)
+
+        size = self.sample_count.size
+        self.sample_count += np.bincount(flat, minlength=size)
+        self.error_sum += np.bincount(flat, weights=errors, minlength=size)
+        self.error_sum_sq += np.bincount(flat, weights=errors * errors, minlength=size)
+        np.minimum.at(self.error_min, flat, errors)
+        np.maximum.at(self.error_max, flat, errors)
+        for row in range(features.shape[1]):
+            self.moments[:, row] += np.bincount(flat, weights=features[:, row] * errors, minlength=size)
+            for column in range(row, features.shape[1]):
+                total = np.bincount(flat, weights=features[:, row] * features[:, column], minlength=size)
+                self.gram[:, row, column] += total
+                if column != row:
+                    self.gram[:, column, row] += total
+
+    def statistics(self):
+        """Return per-point mean, standard deviation, min, max and sample count arrays."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.error_sum / self.sample_count
+            std = np.sqrt(np.maximum(self.error_sum_sq / self.sample_count - mean * mean, 0.0))
+        shape = self.counts
+        return {
+            'mean': mean.reshape(shape),
+            'std': std.reshape(shape),
+            'min': self.error_min.reshape(shape),
+            'max': self.error_max.reshape(shape),
+            'count': self.sample_count.reshape(shape),
+        }
+
+    def compensation_values(self, min_samples=1):
+        """
+        Return the compensation (minus the fitted error) per table point. Points with
+        fewer than min_samples samples are filled by linear interpolation along each dimension.
+        """
+        valid = self.sample_count >= min_samples
+        if not np.any(valid):
+            raise ValueError("No table point has enough samples")
+        # A small ridge on the slopes turns bins without spread into a plain mean.
+        ridge = np.zeros_like(self.gram)
+        diagonal = np.arange(1, self.gram.shape[1])
+        ridge[:, diagonal, diagonal] = 1e-9 * np.maximum(self.sample_count, 1)[:, None]
+        ridge[:, 0, 0] = (self.sample_count == 0)
+        fitted = np.linalg.solve(self.gram + ridge, self.moments[..., None])[:, 0, 0]
+        values = np.where(valid, -fitted, np.nan).reshape(self.counts)
+        for dimension in range(values.ndim):
+            values = np.apply_along_axis(_fill_gaps, dimension, values)
+        return values
+
+
+def _fill_gaps(values):
+    known = ~np.isnan(values)
+    if not np.any(known) or np.all(known):
+        return values
+    indexes = np.arange(values.size)
+    return np.interp(indexes, indexes[known], values[known])
+
+
+class MemoryLogCapture:
+    """
+    Captures commandPos of the logged axes together with an external reference
+    position read from input IO (a laser or linear scale) through SetMemoryIOLog, and
+    yields the samples in chunks of ('command' per axis, 'reference') arrays.
+
+    The reference is decoded from reference_size input bytes at reference_address with
+    reference_dtype and multiplied by reference_scale.
+    """
+    def __init__(self, wmx3_api, channel, axes, reference_address, reference_dtype='<i4',
+                 reference_scale=1.0, interval=DEFAULT_CAPTURE_INTERVAL, error_queue=None):
+        self.log = Log(wmx3_api)
+        self.channel = channel
+        self.axes = list(axes)
+        self.reference_address = reference_address
+        self.reference_dtype = np.dtype(reference_dtype)
+        self.reference_scale = reference_scale
+        self.interval = interval
+        self.error_queue = error_queue
+        self.overflow_count = 0
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def start(self):
+        self.check("OpenMemoryLogBuffer", self.log.OpenMemoryLogBuffer(self.channel))
+        axis_sel = AxisSelection()
+        axis_sel.axisCount = len(self.axes)
+        for index, axis in enumerate(self.axes):
+            axis_sel.SetAxis(index, axis)
+        mem_option = MemoryLogOptions()
+        mem_option.triggerEventCount = 0
+        self.check("SetMemoryLog", self.log.SetMemoryLog(self.channel, axis_sel, mem_option))
+
+        io_address = IOAddress()
+        io_address.byte = self.reference_address
+        io_address.bit = 0
+        io_address.size = self.reference_dtype.itemsize
+        self.check("SetMemoryIOLog", self.log.SetMemoryIOLog(self.channel, io_address, 1, IOAddress(), 0))
+        self.check("StartMemoryLog", self.log.StartMemoryLog(self.channel))
+
+    def collect(self):
+        """Return the samples logged since the last call as (commands, reference) arrays."""
+        ret, memory_logdata = self.log.GetMemoryLogData(self.channel)
+        self.check("GetMemoryLogData", ret)
+        if memory_logdata.overflowFlag > 0:
+            self.overflow_count += 1
+
+        count = memory_logdata.count
+        commands = np.empty((count, len(self.axes)))
+        raw = np.empty((count, self.reference_dtype.itemsize), dtype=np.uint8)
+        for index in range(count):
+            logdata = memory_logdata.GetLogData(index)
+            for column, axis in enumerate(self.axes):
+                commands[index, column] = logdata.GetLogAxisData(axis).commandPos
+            io_data = logdata.logIOData
+            raw[index] = [io_data.GetInput(byte) for byte in range(self.reference_dtype.itemsize)]
+        reference = raw.view(self.reference_dtype).reshape(-1).astype(np.float64) * self.reference_scale
+        return commands, reference
+
+    def chunks(self, stop_event, min_rows=1):
+        """Yield (commands, reference) chunks until stop_event is set."""
+        while not stop_event.is_set():
+            commands, reference = self.collect()
+            if commands.shape[0] >= min_rows:
+                yield commands, reference
+            sleep(self.interval)
+        commands, reference = self.collect()
+        if commands.shape[0]:
+            yield commands, reference
+
+    def stop(self):
+        self.check("StopMemoryLog", self.log.StopMemoryLog(self.channel))
+        self.check("CloseMemoryLogBuffer", self.log.CloseMemoryLogBuffer(self.channel))
+
+
+class CompensationTableGenerator:
+    """
+    Builds 1-D and 2-D pitch error compensation tables from streamed captures of
+    command positions and an external reference, and pushes them to the engine.
+
+    A 1-D table compensates axis by its own position. A 2-D table compensates axis by
+    the positions of two reference axes; the error is measured on axis.
+    """
+    def __init__(self, wmx3_api, error_queue=None):
+        self.compensation = Compensation(wmx3_api)
+        self.error_queue = error_queue
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    @staticmethod
+    def build_table(chunks, min_pos, max_pos, interval=None, edge_dropoff=0.0, min_samples=1):
+        """
+        Return a PitchErrorTable from chunks of (command_pos, reference_pos) arrays
+        covering [min_pos, max_pos].
+        """
+        origin, interval, count = table_geometry(min_pos, max_pos, constants.maxPitchErrorCompPoints, interval)
+        binner = PitchErrorBinner(origin, interval, count)
+        for command_pos, reference_pos in chunks:
+            command_pos = np.asarray(command_pos, dtype=np.float64).reshape(-1)
+            binner.update(command_pos, np.asarray(reference_pos, dtype=np.float64).reshape(-1) - command_pos)
+        table = PitchErrorTable(binner.compensation_values(min_samples), origin, 0, interval, 0, edge_dropoff)
+        table.statistics = binner.statistics()
+        return table
+
+    @staticmethod
+    def build_table_2d(chunks, axis, reference_axes, min_pos, max_pos, intervals=(None, None),
+                       edge_dropoffs=(0.0, 0.0), min_samples=1):
+        """
+        Return a PitchErrorTable2D from chunks of (reference_positions (samples x 2),
+        command_pos, reference_pos) arrays; min_pos/max_pos give the range per reference axis.
+        """
+        geometry = [table_geometry(min_pos[i], max_pos[i], constants.max2dPitchErrorCompPoints, intervals[i])
+                    for i in range(2)]
+        origins, steps, counts = zip(*geometry)
+        binner = PitchErrorBinner(origins, steps, counts)
+        for positions, command_pos, reference_pos in chunks:
+            command_pos = np.asarray(command_pos, dtype=np.float64).reshape(-1)
+            binner.update(positions, np.asarray(reference_pos, dtype=np.float64).reshape(-1) - command_pos)
+        table = PitchErrorTable2D(binner.compensation_values(min_samples), axis, reference_axes,
+                                  origins, (0, 0), steps, edge_dropoffs)
+        table.statistics = binner.statistics()
+        return table
+
+    def push(self, axis, table, options=None, enable=True):
+        """Write a 1-D table to axis with SetPitchErrorCompensation."""
+        self.check("SetPitchErrorCompensation",
+                   self.compensation.SetPitchErrorCompensation(axis, table.to_data(options)))
+        if enable:
+            self.check("EnablePitchErrorCompensation", self.compensation.EnablePitchErrorCompensation(axis))
+
+    def push_2d(self, channel, table, options=None, enable=True):
+        """Write a 2-D table to channel with Set2DPitchErrorCompensation."""
+        self.check("Set2DPitchErrorCompensation",
+                   self.compensation.Set2DPitchErrorCompensation(channel, table.to_data(options)))
+        if enable:
+            self.check("Enable2DPitchErrorCompensation", self.compensation.Enable2DPitchErrorCompensation(channel))
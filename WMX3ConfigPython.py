@@ -0,0 +1,292 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+from WMX3EventControlPython import flatten_struct
+from WMX3UtilPython import check_errorcode
+
+# Import Python libraries
+import numpy as np
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Constants
+DEFAULT_CONFIG_WORKERS = 4
+SNAPSHOT_AXES_KEY = '__axes__'
+SNAPSHOT_COLUMN_SEPARATOR = ':'
+
+# Per-axis sections of Config_SystemParam: section -> (Config_SystemParam getter, Config setter)
+SYSTEM_PARAM_SECTIONS = {
+    'feedback': ('GetFeedbackParam', 'SetFeedbackParam'),
+    'home': ('GetHomeParam', 'SetHomeParam'),
+    'limit': ('GetLimitParam', 'SetLimitParam'),
+    'motion': ('GetMotionParam', 'SetMotionParam'),
+    'alarm': ('GetAlarmParam', 'SetAlarmParam'),
+    'sync': ('GetSyncParam', 'SetSyncParam'),
+}
+# Per-axis arrays of Config_AxisParam, stored as the 'axis' section
+AXIS_PARAM_FIELDS = (
+    'axisCommandMode', 'gearRatioNumerator', 'gearRatioDenominator', 'singleTurnMode',
+    'singleTurnEncoderCount', 'maxTrqLimit', 'negativeTrqLimit', 'positiveTrqLimit', 'axisUnit',
+    'velocityFeedforwardGain', 'axisPolarity', 'maxMotorSpeed', 'absoluteEncoderMode',
+    'absoluteEncoderHomeOffset',
+)
+AXIS_SECTION = 'axis'
+SECTIONS = tuple(SYSTEM_PARAM_SECTIONS) + (AXIS_SECTION,)
+
+
+def set_struct_fields(data, values):
+    """Assign a {dotted name: value} dict to the fields of a SWIG struct."""
+    for name, value in values.items():
+        target = data
+        *path, field = name.split('.')
+        for part in path:
+            target = getattr(target, part)
+        setattr(target, field, value)
+
+
+def values_to_record(values, names=None):
+    """Return one row of a NumPy structured array holding a {name: value} dict."""
+    names = list(values) if names is None else list(names)
+    dtype = [(name, np.bool_ if isinstance(values[name], bool) else
+              np.int64 if isinstance(values[name], int) else
+              np.float64 if isinstance(values[name], float) else object) for name in names]
+    return np.array([tuple(values[name] for name in names)], dtype=dtype)
+
+
+class ConfigParamStore:
+    """
+    Caches the Config parameters of a set of axes as {section: {field: value}} dicts.
+
+    One GetParam_Axis and one GetAxisParam_Axis call read every section of an axis, and
+    the axes are read concurrently by a thread pool. apply() compares a recipe with the
+    cache field by field and writes only the sections that changed, each with its own
+    Set*Param call (SetAxisParam_Axis for the Config_AxisParam fields).
+    """
+    def __init__(self, wmx3_api, axes, max_workers=DEFAULT_CONFIG_WORKERS, error_queue=None):
+        self.core_motion = CoreMotion(wmx3_api)
+        self.config = self.core_motion.config
+        self.axes = list(axes)
+        self.max_workers = max_workers
+        self.error_queue = error_queue
+
+        self.values = {}
+        self.structs = {}
+        self.lock = threading.Lock()
+        self.read_count = 0
+        self.hit_count = 0
+        self.write_count = 0
+        self.skipped_count = 0
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def read_axis(self, axis):
+        """Read every section of one axis with two API calls and cache it."""
+        ret, system_param = self.config.GetParam_Axis(axis)
+        self.check("GetParam_Axis", ret)
+        ret, axis_param = self.config.GetAxisParam_Axis(axis)
+        self.check("GetAxisParam_Axis", ret)
+
+        structs = {section: getattr(system_param, getter)(axis)
+                   for section, (getter, _) in SYSTEM_PARAM_SECTIONS.items()}
+        values = {section: flatten_struct(data) for section, data in structs.items()}
+        structs[AXIS_SECTION] = axis_param
+        values[AXIS_SECTION] = {field: getattr(axis_param, 'Get' + field[0].upper() + field[1:])(axis)
+                                for field in AXIS_PARAM_FIELDS}
+        with self.lock:
+            self.structs[axis] = structs
+            self.values[axis] = values
+            self.read_count += 1
+        return values
+
+    def read(self, axes=None, refresh=False):
+        """Return {axis: {section: {field: value}}}, reading uncached (or all, with refresh) axes in parallel."""
+        axes = self.axes if axes is None else list(axes)
+        missing = axes if refresh else [axis for axis in axes if axis not in self.values]
+        self.hit_count += len(axes) - len(missing)
+        if len(missing) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(min(self.max_workers, len(missing))) as pool:
+                list(pool.map(self.read_axis, missing))
+        else:
+            for axis in missing:
+                self.read_axis(axis)
+        return {axis: self.values[axis] for axis in axes}
+
+    def records(self, section, axes=None):
+        """Return one section of every axis as a NumPy structured array with an 'axis' column."""
+        rows = []
+        for axis, values in self.read(axes).items():
+            row = dict(axis=axis)
+            row.update(values[section])
+            rows.append(values_to_record(row))
+        return np.concatenate(rows) if rows else None
+
+    def diff(self, recipe):
+        """
+        Compare a {axis: {section: {field: value}}} recipe with the cached parameters.
+        Returns {axis: {section: {field: (current, target)}}} of the differing fields.
+        """
+        current = self.read(recipe.keys())
+        changes = {}
+        for axis, sections in recipe.items():
+            for section, fields in sections.items():
+                if section not in SECTIONS:
+                    raise ValueError(f"Unknown parameter section: {section}")
+                values = current[axis][section]
+                for field, target in fields.items():
+                    if field not in values:
+                        raise ValueError(f"Unknown {section} parameter: {field}")
+                    if values[field] != target:
+                        changes.setdefault(axis, {}).setdefault(section, {})[field] = (values[field], target)
+        return changes
+
+    def write_section(self, axis, section, fields):
+        """Write the changed fields of one cached section with a single Set*Param call."""
+        data = self.structs[axis][section]
+        if section == AXIS_SECTION:
+            for field, value in fields.items():
+                getattr(data, 'Set' + field[0].upper() + field[1:])(axis, value)
+            ret, _ = self.config.SetAxisParam_Axis(axis, data)
+            self.check("SetAxisParam_Axis", ret)
+        else:
+            setter = SYSTEM_PARAM_SECTIONS[section][1]
+            set_struct_fields(data, fields)
+            ret, _ = getattr(self.config, setter)(axis, data)
+            self.check(setter, ret)
+        self.values[axis][section].update(fields)
+        self.write_count += 1
+
+    def apply(self, recipe, dry_run=False):
+        """Write only the sections of recipe that differ from the controller. Returns the diff."""
+        changes = self.diff(recipe)
+        if not dry_run:
+            for axis, sections in changes.items():
+                for section, fields in sections.items():
+                    try:
+                        self.write_section(axis, section, {field: target for field, (_, target) in fields.items()})
+                    except RuntimeError:
+                        # The cached struct may be partly updated; read the axis again next time.
+                        self.invalidate(axis)
+                        raise
+        recipe_sections = sum(len(sections) for sections in recipe.values())
+        self.skipped_count += recipe_sections - sum(len(sections) for sections in changes.values())
+        return changes
+
+    def invalidate(self, axis=None):
+        with self.lock:
+            if axis is None:
+                self.values.clear()
+                self.structs.clear()
+            else:
+                self.values.pop(axis, None)
+                self.structs.pop(axis, None)
+
+    def metrics(self):
+        return {
+            'axis_reads': self.read_count,
+            'cache_hits': self.hit_count,
+            'section_writes': self.write_count,
+            'sections_skipped': self.skipped_count,
+        }
+
+
+def column_name(section, field):
+    return section + SNAPSHOT_COLUMN_SEPARATOR + field
+
+
+def split_column_name(name):
+    return tuple(name.split(SNAPSHOT_COLUMN_SEPARATOR, 1))
+
+
+class ParamSnapshot:
+    """
+    Parameters of a set of axes as typed columns: one NumPy array per
+    'section:field', indexed like the axes array. Snapshots are saved as
+    uncompressed .npz files (no pickled objects), hashed by content and compared
+    column by column across all axes at once.
+    """
+    def __init__(self, axes, columns):
+        self.axes = np.asarray(axes, dtype=np.int32)
+        self.columns = dict(sorted(columns.items()))
+
+    @classmethod
+    def from_values(cls, values):
+        """Build a snapshot from ConfigParamStore.read() output."""
+        axes = sorted(values)
+        columns = {}
+        for section in SECTIONS:
+            fields = values[axes[0]][section] if axes else {}
+            for field in fields:
+                columns[column_name(section, field)] = np.array([values[axis][section][field] for axis in axes])
+        return cls(axes, columns)
+
+    @classmethod
+    def from_store(cls, store, axes=None, refresh=True):
+        """Read the controller through a ConfigParamStore and snapshot it."""
+        return cls.from_values(store.read(axes, refresh=refresh))
+
+    def content_hash(self):
+        """Return a SHA-1 of the axes, column names, dtypes and values."""
+        digest = hashlib.sha1(self.axes.tobytes())
+        for name, column in self.columns.items():
+            digest.update(name.encode('utf-8'))
+            digest.update(column.dtype.str.encode('utf-8'))
+            digest.update(np.ascontiguousarray(column).tobytes())
+        return digest.hexdigest()
+
+    def save(self, path):
+        np.savez(path, **{SNAPSHOT_AXES_KEY: self.axes}, **self.columns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            columns = {name: data[name] for name in data.files if name != SNAPSHOT_AXES_KEY}
+            return cls(data[SNAPSHOT_AXES_KEY], columns)
+
+    def diff(self, other):
+        """
+        Compare with another snapshot on the axes both contain. Returns a list of
+        (axis, section, field, value, other_value); a column missing on one side gives None.
+        """
+        axes, mine, theirs = np.intersect1d(self.axes, other.axes, return_indices=True)
+        changes = []
+        for name in sorted(set(self.columns) | set(other.columns)):
+            a = self.columns[name][mine] if name in self.columns else None
+            b = other.columns[name][theirs] if name in other.columns else None
+            if a is None or b is None:
+                changed = np.ones(axes.size, dtype=bool)
+            else:
+                changed = a != b
+                if a.dtype.kind == 'f' and b.dtype.kind == 'f':
+                    changed &= ~(np.isnan(a) & np.isnan(b))
+            section, field = split_column_name(name)
+            for index in np.flatnonzero(changed).tolist():
+                changes.append((int(axes[index]), section, field,
+                                None if a is None else a[index].item(), None if b is None else b[index].item()))
+        return changes
+
+    def to_recipe(self, axes=None):
+        """Return the {axis: {section: {field: value}}} recipe of the snapshot."""
+        selected = np.isin(self.axes, self.axes if axes is None else list(axes))
+        recipe = {}
+        for name, column in self.columns.items():
+            section, field = split_column_name(name)
+            for axis, value in zip(self.axes[selected].tolist(), column[selected].tolist()):
+                recipe.setdefault(axis, {}).setdefault(section, {})[field] = value
+        return recipe
+
+
+def restore_snapshot(store, snapshot, dry_run=False):
+    """
+    Bring the controller to a snapshot through a ConfigParamStore, writing only the
+    sections that differ. Returns the list of differing fields.
+    """
+    current = ParamSnapshot.from_store(store, snapshot.axes.tolist())
+    changes = [change for change in current.diff(snapshot) if change[3] is not None and change[4] is not None]
+    recipe = {}
+    for axis, section, field, _, value in changes:
+        recipe.setdefault(axis, {}).setdefault(section, {})[field] = value
+    store.apply(recipe, dry_run)
+    return changes
@@ -0,0 +1,308 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+from WMX3UtilPython import check_errorcode
+
+# Import Python libraries
+import numpy as np
+
+import threading
+from time import monotonic, sleep
+
+# Constants
+DEFAULT_CYCLIC_BUFFER_CYCLES = 4096
+DEFAULT_LOW_WATERMARK = 1024
+DEFAULT_FEED_INTERVAL = 0.005
+
+
+def iterate_chunks(source, axis_count):
+    """
+    Yield (points x axes) float64 arrays from a NumPy array, or from an iterable of
+    single points or chunks of points.
+    """
+    if isinstance(source, np.ndarray):
+        yield source.reshape(-1, axis_count).astype(np.float64, copy=False)
+        return
+    for item in source:
+        yield np.asarray(item, dtype=np.float64).reshape(-1, axis_count)
+
+
+def merge_constant_runs(points, interval_cycles=None, relative=False):
+    """
+    Merge consecutive commands that can be expressed by one longer intervalCycles
+    command. Returns (points, interval_cycles) with fewer rows.
+
+    For absolute commands repeated positions (holds) are merged; the first repeat keeps
+    its own row so the approach to the position is unchanged. For relative commands
+    rows moving at the same rate (delta / intervalCycles) are summed.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    count = points.shape[0]
+    if count == 0:
+        return points.reshape(0, points.shape[1] if points.ndim > 1 else 0), np.zeros(0, dtype=np.int64)
+    points = points.reshape(count, -1)
+    if interval_cycles is None:
+        interval_cycles = np.ones(count, dtype=np.int64)
+    else:
+        interval_cycles = np.broadcast_to(np.asarray(interval_cycles, dtype=np.int64), (count,))
+    if count < 2:
+        return points, np.array(interval_cycles)
+
+    if relative:
+        rates = points / interval_cycles[:, None]
+        same = np.all(rates[1:] == rates[:-1], axis=1)
+        starts = np.concatenate(([True], ~same))
+    else:
+        repeat = np.concatenate(([False], np.all(points[1:] == points[:-1], axis=1)))
+        starts = ~(repeat & np.concatenate(([False], repeat[:-1])))
+
+    indices = np.flatnonzero(starts)
+    merged_intervals = np.add.reduceat(interval_cycles, indices)
+    merged_points = np.add.reduceat(points, indices, axis=0) if relative else points[indices]
+    return merged_points, merged_intervals
+
+
+class CyclicBufferCommandBuilder:
+    """
+    Converts (points x axes) NumPy arrays into CyclicBufferMultiAxisCommands.
+
+    The command objects come from an internal pool and are overwritten by the next
+    call to build().
+    """
+    def __init__(self, axes, command_type=None, merge_runs=True):
+        self.axes = list(axes)
+        self.command_type = command_type if command_type is not None else CyclicBufferCommandType.AbsolutePos
+        self.merge_runs = merge_runs
+        self.command_pool = []
+        self.input_count = 0
+        self.output_count = 0
+
+        self.single = CyclicBufferSingleAxisCommand()
+        self.single.type = self.command_type
+
+    def build(self, points, interval_cycles=None):
+        """Return one CyclicBufferMultiAxisCommands per (merged) row of points."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, len(self.axes))
+        self.input_count += points.shape[0]
+        if self.merge_runs:
+            relative = self.command_type == CyclicBufferCommandType.RelativePos
+            points, interval_cycles = merge_constant_runs(points, interval_cycles, relative)
+        elif interval_cycles is None:
+            interval_cycles = np.ones(points.shape[0], dtype=np.int64)
+        else:
+            interval_cycles = np.broadcast_to(np.asarray(interval_cycles, dtype=np.int64), (points.shape[0],))
+
+        count = points.shape[0]
+        while len(self.command_pool) < count:
+            self.command_pool.append(CyclicBufferMultiAxisCommands())
+        commands = self.command_pool[:count]
+
+        single = self.single
+        for command, row, interval in zip(commands, points.tolist(), interval_cycles.tolist()):
+            single.intervalCycles = interval
+            for axis, position in zip(self.axes, row):
+                single.command = position
+                command.SetCmd(axis, single)
+        self.output_count += count
+        return commands
+
+    def reduction_ratio(self):
+        """Return the fraction of input points removed by merging."""
+        if self.input_count == 0:
+            return 0.0
+        return 1.0 - self.output_count / self.input_count
+
+
+def add_commands(cyclic_buffer, axes, points, interval_cycles=None, command_type=None,
+                 merge_runs=True, timeout=None, poll_interval=DEFAULT_FEED_INTERVAL, error_queue=None):
+    """
+    Send a whole (points x axes) trajectory to an open CyclicBuffer. Each batch is
+    sized to the smallest availableCount of the axes; when the buffer is full the
+    function waits for it to drain. Returns the number of commands sent.
+
+    The commands of a batch are built in one pass but still added one
+    AddCommand_AxisSel call each: the Python API has no array type for
+    CyclicBufferMultiAxisCommands, so the count overload of AddCommand cannot be used.
+    """
+    axes = list(axes)
+    axis_sel = AxisSelection()
+    axis_sel.axisCount = len(axes)
+    for index, axis in enumerate(axes):
+        axis_sel.SetAxis(index, axis)
+
+    # Merge the whole trajectory once so runs are not cut at batch boundaries.
+    builder = CyclicBufferCommandBuilder(axes, command_type, merge_runs=False)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, len(axes))
+    if merge_runs:
+        relative = builder.command_type == CyclicBufferCommandType.RelativePos
+        points, interval_cycles = merge_constant_runs(points, interval_cycles, relative)
+    elif interval_cycles is not None:
+        interval_cycles = np.broadcast_to(np.asarray(interval_cycles, dtype=np.int64), (points.shape[0],))
+
+    deadline = None if timeout is None else monotonic() + timeout
+    sent = 0
+    while sent < points.shape[0]:
+        ret, status = cyclic_buffer.GetStatus_AxisSel(axis_sel)
+        if ret != ErrorCode.PyNone:
+            check_errorcode("GetStatus_AxisSel", ret, error_queue)
+        available = min(status.GetStatus(axis).availableCount for axis in axes)
+        if available <= 0:
+            if deadline is not None and monotonic() >= deadline:
+                break
+            sleep(poll_interval)
+            continue
+
+        end = min(sent + available, points.shape[0])
+        batch_intervals = None if interval_cycles is None else interval_cycles[sent:end]
+        for command in builder.build(points[sent:end], batch_intervals):
+            ret = cyclic_buffer.AddCommand_AxisSel(axis_sel, command)
+            if ret != ErrorCode.PyNone:
+                check_errorcode("AddCommand_AxisSel", ret, error_queue)
+        sent = end
+    return sent
+
+
+class CyclicBufferFeeder:
+    """
+    Streams per-cycle positions for one or many axes into CyclicBuffer from a
+    background thread. The buffer is refilled whenever the smallest remainCount of the
+    axes drops below low_watermark.
+
+    underrun_count counts refills that found the buffer empty while data was still
+    pending; min_margin_milliseconds is the smallest remaining buffered time seen,
+    estimated as remainCount x cycle_time_milliseconds (a lower bound when merge_runs
+    is enabled, as merged commands span several cycles).
+    """
+    def __init__(self, wmx3_api, axes, buffer_cycles=DEFAULT_CYCLIC_BUFFER_CYCLES,
+                 low_watermark=DEFAULT_LOW_WATERMARK, command_type=None,
+                 cycle_time_milliseconds=1.0, interval=DEFAULT_FEED_INTERVAL, merge_runs=False,
+                 error_queue=None):
+        self.cyclic_buffer = CyclicBuffer(wmx3_api)
+        self.axes = list(axes)
+        self.buffer_cycles = buffer_cycles
+        self.low_watermark = low_watermark
+        self.command_type = command_type if command_type is not None else CyclicBufferCommandType.AbsolutePos
+        self.cycle_time_milliseconds = cycle_time_milliseconds
+        self.interval = interval
+        self.error_queue = error_queue
+
+        self.axis_sel = AxisSelection()
+        self.axis_sel.axisCount = len(self.axes)
+        for index, axis in enumerate(self.axes):
+            self.axis_sel.SetAxis(index, axis)
+
+        self.builder = CyclicBufferCommandBuilder(self.axes, self.command_type, merge_runs)
+        self.chunks = None
+        self.pending = np.zeros((0, len(self.axes)))
+        self.exhausted = False
+        self.stop_event = threading.Event()
+        self.feeder_thread = None
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.pushed_count = 0
+        self.refill_count = 0
+        self.underrun_count = 0
+        self.min_margin_milliseconds = float('inf')
+        self.error_count = 0
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def next_points(self, count):
+        """Return up to count pending points, pulling more chunks from the source as needed."""
+        while self.pending.shape[0] < count and not self.exhausted:
+            try:
+                self.pending = np.concatenate((self.pending, next(self.chunks)), axis=0)
+            except StopIteration:
+                self.exhausted = True
+        points, self.pending = self.pending[:count], self.pending[count:]
+        return points
+
+    def push(self, points):
+        """Send points as CyclicBufferMultiAxisCommands, merging constant runs if enabled."""
+        for command in self.builder.build(points):
+            self.check("AddCommand_AxisSel", self.cyclic_buffer.AddCommand_AxisSel(self.axis_sel, command))
+        self.pushed_count += points.shape[0]
+
+    def buffer_status(self):
+        """Return (remainCount, availableCount) of the least filled axis."""
+        ret, status = self.cyclic_buffer.GetStatus_AxisSel(self.axis_sel)
+        self.check("GetStatus_AxisSel", ret)
+        remain = min(status.GetStatus(axis).remainCount for axis in self.axes)
+        available = min(status.GetStatus(axis).availableCount for axis in self.axes)
+        return remain, available
+
+    def refill(self):
+        """Top up the buffer if it is below the low watermark. Returns False when all data is sent."""
+        remain, available = self.buffer_status()
+        data_pending = not (self.exhausted and self.pending.shape[0] == 0)
+        if data_pending and self.pushed_count > 0:
+            self.min_margin_milliseconds = min(self.min_margin_milliseconds, remain * self.cycle_time_milliseconds)
+            if remain == 0:
+                self.underrun_count += 1
+        if remain < self.low_watermark and available > 0:
+            points = self.next_points(available)
+            if points.shape[0] > 0:
+                self.push(points)
+                self.refill_count += 1
+        return not (self.exhausted and self.pending.shape[0] == 0)
+
+    def feed_task(self):
+        while not self.stop_event.is_set():
+            try:
+                if not self.refill():
+                    break
+            except RuntimeError:
+                # check_errorcode has already reported the error.
+                self.error_count += 1
+                break
+            self.stop_event.wait(self.interval)
+
+    def start(self, source):
+        """Open the buffer, prefill it from source, start execution and the feeder thread."""
+        self.chunks = iterate_chunks(source, len(self.axes))
+        self.pending = np.zeros((0, len(self.axes)))
+        self.exhausted = False
+        self.reset_metrics()
+
+        self.check("OpenCyclicBuffer_AxisSel",
+                   self.cyclic_buffer.OpenCyclicBuffer_AxisSel(self.axis_sel, self.buffer_cycles))
+        self.refill()
+        self.check("Execute_AxisSel", self.cyclic_buffer.Execute_AxisSel(self.axis_sel))
+
+        self.stop_event.clear()
+        self.feeder_thread = threading.Thread(target=self.feed_task, daemon=True)
+        self.feeder_thread.start()
+
+    def wait(self, timeout=None):
+        """Wait until the source is exhausted and every command has been executed."""
+        deadline = None if timeout is None else monotonic() + timeout
+        if self.feeder_thread:
+            self.feeder_thread.join(timeout)
+        while deadline is None or monotonic() < deadline:
+            remain, _ = self.buffer_status()
+            if remain == 0:
+                return True
+            self.stop_event.wait(self.interval)
+        return False
+
+    def stop(self, abort=False):
+        """Stop feeding and close the buffer. With abort=True the remaining commands are discarded."""
+        self.stop_event.set()
+        if self.feeder_thread and self.feeder_thread.is_alive():
+            self.feeder_thread.join()
+        self.feeder_thread = None
+
+        if abort:
+            self.check("Abort_AxisSel", self.cyclic_buffer.Abort_AxisSel(self.axis_sel))
+        self.check("CloseCyclicBuffer_AxisSel", self.cyclic_buffer.CloseCyclicBuffer_AxisSel(self.axis_sel))
+
+    def metrics(self):
+        return {
+            'pushed': self.pushed_count,
+            'refills': self.refill_count,
+            'underruns': self.underrun_count,
+            'min_margin_milliseconds': self.min_margin_milliseconds,
+            'errors': self.error_count,
+        }
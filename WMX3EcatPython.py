@@ -0,0 +1,526 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+from WMX3UtilPython import check_errorcode
+
+# Import Python libraries
+import numpy as np
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+
+# Constants
+DEFAULT_SDO_WORKERS = 8
+DEFAULT_SDO_WAIT_MILLISECONDS = 1000
+DEFAULT_SDO_RETRIES = 2
+DEFAULT_SDO_RETRY_DELAY = 0.01
+DEFAULT_SDO_BUFFER_SIZE = 256
+SDO_ABORT_TIMEOUT = 0x05040000
+
+SLAVE_IDENTITY_FIELDS = ('id', 'position', 'address', 'alias', 'vendorId', 'productCode', 'revisionNo',
+                         'serialNo', 'numOfAxes', 'inputAddr', 'inputSize', 'outputAddr', 'outputSize')
+# EcSlavePdoInfo entries of the input (TxPDO) and output (RxPDO) process images
+PDO_INFO_INPUTS = ('statusWord', 'modesOfOperationDisplay', 'positionActualValue', 'velocityActualValue',
+                   'torqueActualValue', 'errorCode', 'touchProbeStatus', 'touchProbePositionPos1',
+                   'touchProbePositionPos2', 'followingError', 'digitalInput')
+PDO_INFO_OUTPUTS = ('controlWord', 'modesOfOperation', 'targetPosition', 'targetVelocity', 'targetTorque',
+                    'maxTorque', 'positiveTorqueLimit', 'negativeTorqueLimit', 'touchProbeFunction',
+                    'velocityOffset', 'torqueOffset', 'maxMotorSpeed', 'digitalOutput')
+# CoE PDO assignment objects: image -> sync manager PDO assign index
+PDO_ASSIGN_OBJECTS = {'output': 0x1C12, 'input': 0x1C13}
+# CiA 402 data types of the EcSlavePdoInfo entries; other entries default to unsigned
+PDO_INFO_TYPES = {
+    'statusWord': '<u2', 'modesOfOperationDisplay': '<i1', 'positionActualValue': '<i4',
+    'velocityActualValue': '<i4', 'torqueActualValue': '<i2', 'errorCode': '<u2', 'touchProbeStatus': '<u2',
+    'touchProbePositionPos1': '<i4', 'touchProbePositionPos2': '<i4', 'followingError': '<i4',
+    'digitalInput': '<u4', 'controlWord': '<u2', 'modesOfOperation': '<i1', 'targetPosition': '<i4',
+    'targetVelocity': '<i4', 'targetTorque': '<i2', 'maxTorque': '<u2', 'positiveTorqueLimit': '<u2',
+    'negativeTorqueLimit': '<u2', 'touchProbeFunction': '<u2', 'velocityOffset': '<i4', 'torqueOffset': '<i2',
+    'maxMotorSpeed': '<u4', 'digitalOutput': '<u4',
+}
+# Data types of common CiA 402 objects by index, for entries from the PDO mapping
+CIA402_OBJECT_TYPES = {
+    0x603F: '<u2', 0x6040: '<u2', 0x6041: '<u2', 0x6060: '<i1', 0x6061: '<i1', 0x6064: '<i4', 0x606C: '<i4',
+    0x6071: '<i2', 0x6072: '<u2', 0x6077: '<i2', 0x607A: '<i4', 0x6080: '<u4', 0x60B1: '<i4', 0x60B2: '<i2',
+    0x60B8: '<u2', 0x60B9: '<u2', 0x60BA: '<i4', 0x60BB: '<i4', 0x60E0: '<u2', 0x60E1: '<u2', 0x60F4: '<i4',
+    0x60FD: '<u4', 0x60FE: '<u4', 0x60FF: '<i4',
+}
+
+# SDO data type name -> little-endian NumPy dtype; 'bytes' transfers raw data
+SDO_TYPES = {
+    'int8': np.dtype('<i1'), 'uint8': np.dtype('<u1'),
+    'int16': np.dtype('<i2'), 'uint16': np.dtype('<u2'),
+    'int32': np.dtype('<i4'), 'uint32': np.dtype('<u4'),
+    'int64': np.dtype('<i8'), 'uint64': np.dtype('<u8'),
+    'float32': np.dtype('<f4'), 'float64': np.dtype('<f8'),
+    'bytes': None,
+}
+
+
+def sdo_read(slave, index, subindex, sdo_type):
+    """One SDO upload operation for SdoBatch."""
+    return (slave, index, subindex, sdo_type, None)
+
+
+def sdo_write(slave, index, subindex, sdo_type, value):
+    """One SDO download operation for SdoBatch."""
+    return (slave, index, subindex, sdo_type, value)
+
+
+def encode_sdo(sdo_type, value):
+    """Return the bytes of an SDO value."""
+    if SDO_TYPES[sdo_type] is None:
+        return bytes(value)
+    return np.array(value, dtype=SDO_TYPES[sdo_type]).tobytes()
+
+
+def decode_sdo(sdo_type, data):
+    """Return the value of SDO bytes."""
+    if SDO_TYPES[sdo_type] is None:
+        return bytes(data)
+    return np.frombuffer(bytes(data), dtype=SDO_TYPES[sdo_type], count=1)[0].item()
+
+
+class SdoBatch:
+    """
+    Runs a list of SDO operations (see sdo_read/sdo_write) concurrently across
+    slaves. The operations of one slave run in order on one worker; different
+    slaves run in parallel on a pool of max_workers threads, slaves with the most
+    operations first.
+
+    A transfer is retried up to retries times when the mailbox is busy or the
+    slave reports an SDO timeout abort. When an operation still fails, the later
+    operations of that slave are skipped unless stop_on_error is False.
+    """
+    def __init__(self, wmx3_api, max_workers=DEFAULT_SDO_WORKERS, wait_milliseconds=DEFAULT_SDO_WAIT_MILLISECONDS,
+                 retries=DEFAULT_SDO_RETRIES, retry_delay=DEFAULT_SDO_RETRY_DELAY,
+                 buffer_size=DEFAULT_SDO_BUFFER_SIZE, error_queue=None):
+        self.wmx3_api = wmx3_api
+        self.max_workers = max_workers
+        self.wait_milliseconds = wait_milliseconds
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.buffer_size = buffer_size
+        self.error_queue = error_queue
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.slave_metrics = {}
+
+    def ecat(self):
+        """Return the Ecat instance of the calling worker thread."""
+        ecat = getattr(self.local, 'ecat', None)
+        if ecat is None:
+            ecat = self.local.ecat = Ecat(self.wmx3_api)
+        return ecat
+
+    @staticmethod
+    def retryable(ret, error_code):
+        return ret == EcErrorCode.SlaveMailboxInUse or error_code == SDO_ABORT_TIMEOUT
+
+    def transfer(self, slave, index, subindex, sdo_type, value):
+        """Run one SDO transfer. Returns (ret, error_code, value, attempts, bytes)."""
+        ecat = self.ecat()
+        if value is None:
+            size = SDO_TYPES[sdo_type].itemsize if SDO_TYPES[sdo_type] is not None else self.buffer_size
+        else:
+            data = encode_sdo(sdo_type, value)
+            data_array = uintArray(len(data))
+            for position, byte in enumerate(data):
+                data_array[position] = byte
+
+        for attempt in range(1, self.retries + 2):
+            if value is None:
+                ret, buffer, actual_size, error_code = ecat.SdoUpload_WaitTime(
+                    slave, index, subindex, size, self.wait_milliseconds)
+                result = decode_sdo(sdo_type, buffer[:actual_size]) if ret == ErrorCode.PyNone else None
+                transferred = actual_size
+            else:
+                ret, error_code = ecat.SdoDownload_WaitTime(
+                    slave, index, subindex, len(data), data_array, self.wait_milliseconds)
+                result = value
+                transferred = len(data)
+            if ret == ErrorCode.PyNone or attempt > self.retries or not self.retryable(ret, error_code):
+                return ret, error_code, result, attempt, transferred
+            sleep(self.retry_delay)
+
+    def run_slave(self, slave, operations, results, stop_on_error=True):
+        """Run the (position, operation) list of one slave in order."""
+        metrics = {'operations': 0, 'bytes': 0, 'retries': 0, 'failures': 0, 'skipped': 0,
+                   'latencies': [], 'busy_seconds': 0.0}
+        started = monotonic()
+        failed = False
+        for position, (_, index, subindex, sdo_type, value) in operations:
+            if failed:
+                results[position] = (None, None, 'skipped')
+                metrics['skipped'] += 1
+                continue
+            call_started = monotonic()
+            ret, error_code, result, attempts, transferred = self.transfer(slave, index, subindex, sdo_type, value)
+            metrics['latencies'].append(monotonic() - call_started)
+            metrics['operations'] += 1
+            metrics['retries'] += attempts - 1
+            if ret == ErrorCode.PyNone:
+                metrics['bytes'] += transferred
+                results[position] = (result, None, None)
+            else:
+                metrics['failures'] += 1
+                results[position] = (None, error_code, ret)
+                failed = stop_on_error
+                try:
+                    check_errorcode(f"SDO 0x{index:04X}:{subindex} on slave {slave}", ret, self.error_queue)
+                except RuntimeError:
+                    # Reported; the batch goes on with the other slaves.
+                    pass
+        metrics['busy_seconds'] = monotonic() - started
+        with self.lock:
+            self.slave_metrics[slave] = metrics
+
+    def run(self, operations, stop_on_error=True):
+        """
+        Run the operations and return one (value, sdo_error_code, error) tuple per
+        operation, in input order. value is the uploaded (or downloaded) value; error is
+        None on success, the API error code on failure, or 'skipped'.
+        """
+        operations = list(operations)
+        for operation in operations:
+            if operation[3] not in SDO_TYPES:
+                raise ValueError(f"Unknown SDO type: {operation[3]}")
+        by_slave = {}
+        for position, operation in enumerate(operations):
+            by_slave.setdefault(operation[0], []).append((position, operation))
+
+        results = [None] * len(operations)
+        self.slave_metrics = {}
+        slaves = sorted(by_slave, key=lambda slave: len(by_slave[slave]), reverse=True)
+        with ThreadPoolExecutor(max(1, min(self.max_workers, len(slaves)))) as pool:
+            futures = [pool.submit(self.run_slave, slave, by_slave[slave], results, stop_on_error) for slave in slaves]
+            for future in futures:
+                future.result()
+        return results
+
+    def metrics(self):
+        """Return per-slave throughput (operations/s, bytes/s) and latency (mean, max) in milliseconds."""
+        report = {}
+        for slave, metrics in sorted(self.slave_metrics.items()):
+            latencies = np.array(metrics['latencies']) * 1000.0
+            busy = metrics['busy_seconds']
+            report[slave] = {
+                'operations': metrics['operations'],
+                'retries': metrics['retries'],
+                'failures': metrics['failures'],
+                'skipped': metrics['skipped'],
+                'operations_per_second': metrics['operations'] / busy if busy > 0 else 0.0,
+                'bytes_per_second': metrics['bytes'] / busy if busy > 0 else 0.0,
+                'mean_latency_milliseconds': float(latencies.mean()) if latencies.size else 0.0,
+                'max_latency_milliseconds': float(latencies.max()) if latencies.size else 0.0,
+            }
+        return report
+
+
+def slave_identity(slave_info):
+    """Return the identity and process image fields of an EcSlaveInfo as a dict."""
+    return {name: getattr(slave_info, name) for name in SLAVE_IDENTITY_FIELDS}
+
+
+def topology_hash(identities):
+    """Return a hash of the slave identities of a network."""
+    return hashlib.sha1(json.dumps(identities, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def device_key(slave):
+    """Return the key of the device type of a slave, shared by identical slaves."""
+    return f"{slave['vendorId']:08X}:{slave['productCode']:08X}:{slave['revisionNo']:08X}"
+
+
+def pdo_layout(mapping, start_address):
+    """
+    Return [(index, subindex, byte_address, bit_offset, bit_length)] of the mapped entries of
+    one process image, given the [(index, subindex, bit_length)] mapping in image order.
+    Padding entries (index 0) only advance the offset.
+    """
+    layout = []
+    bit = 0
+    for index, subindex, bit_length in mapping:
+        if index:
+            layout.append((index, subindex, start_address + bit // 8, bit % 8, bit_length))
+        bit += bit_length
+    return layout
+
+
+class EcatTopologyCache:
+    """
+    On-disk cache of the EtherCAT slave information and per-device object dictionary
+    data, with in-memory indexes by slave, by axis and by PDO address.
+
+    load() starts from the cache file without touching the network; scan() runs
+    ScanNetwork, hashes the slave identities (vendorId, productCode, revisionNo,
+    serialNo, position and process image) and rebuilds the cache only if the
+    topology changed. On a rebuild the per-axis EcSlavePdoInfo entries are read and,
+    with an SdoBatch, the PDO assignment/mapping objects and the given objects are
+    uploaded once per device type.
+    """
+    def __init__(self, wmx3_api, path, sdo_batch=None, objects=(), error_queue=None):
+        self.ecat = Ecat(wmx3_api)
+        self.path = path
+        self.sdo_batch = sdo_batch
+        self.objects = list(objects)
+        self.error_queue = error_queue
+        self.data = None
+        self.by_slave = {}
+        self.by_axis = {}
+        self.by_pdo_address = {}
+        self.by_object = {}
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def load(self):
+        """Load the cache file and build the indexes. Returns False if there is no cache."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'r') as cache_file:
+            self.data = json.load(cache_file)
+        self.build_indexes()
+        return True
+
+    def save(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as cache_file:
+            json.dump(self.data, cache_file)
+        os.replace(temporary, self.path)
+
+    def scan(self, scan_network=True):
+        """Rescan the network and rebuild the cache if the topology hash changed. Returns True on a rebuild."""
+        if scan_network:
+            self.check("ScanNetwork", self.ecat.ScanNetwork())
+        ret, master_info = self.ecat.GetMasterInfo()
+        self.check("GetMasterInfo", ret)
+        slaves = [master_info.GetSlaves(index) for index in range(master_info.numOfSlaves)]
+        identities = [slave_identity(slave) for slave in slaves]
+        digest = topology_hash(identities)
+        if (self.data is None and not self.load()) or self.data['topology_hash'] != digest:
+            self.rebuild(slaves, identities, digest)
+            return True
+        return False
+
+    def rebuild(self, slaves, identities, digest):
+        for slave_info, slave in zip(slaves, identities):
+            slave['axes'] = []
+            for axis_number in range(slave['numOfAxes']):
+                axis_info = slave_info.GetAxisInfo(axis_number)
+                pdo_info = axis_info.pdoInfo
+                pdo = {}
+                for name in PDO_INFO_INPUTS + PDO_INFO_OUTPUTS:
+                    entry = getattr(pdo_info, name)
+                    if entry.enable:
+                        pdo[name] = [entry.size, entry.offset]
+                slave['axes'].append({'axis': axis_info.axisIndex, 'pdo': pdo})
+
+        dictionaries = {}
+        if self.sdo_batch is not None:
+            representatives = {}
+            for slave in identities:
+                representatives.setdefault(device_key(slave), slave['id'])
+            dictionaries = self.read_dictionaries(representatives)
+        self.data = {'topology_hash': digest, 'slaves': identities, 'dictionaries': dictionaries}
+        self.save()
+        self.build_indexes()
+
+    def read_round(self, operations):
+        """Run SDO reads and return {(slave, index, subindex): value} of those that succeeded."""
+        results = self.sdo_batch.run(operations, stop_on_error=False)
+        return {operation[:3]: value for operation, (value, _, error) in zip(operations, results) if error is None}
+
+    def read_dictionaries(self, representatives):
+        """
+        Read the PDO mapping and the configured objects of one slave per device type.
+        Dependent reads run in rounds, each round across all device types at once.
+        """
+        slaves = list(representatives.values())
+        counts = self.read_round([sdo_read(slave, assign, 0, 'uint8')
+                                  for slave in slaves for assign in PDO_ASSIGN_OBJECTS.values()])
+        assigned = self.read_round([sdo_read(slave, assign, sub, 'uint16')
+                                    for (slave, assign, _), count in counts.items() for sub in range(1, count + 1)])
+        entry_counts = self.read_round([sdo_read(slave, pdo, 0, 'uint8') for (slave, _, _), pdo in assigned.items()])
+        entries = self.read_round([sdo_read(slave, pdo, sub, 'uint32')
+                                   for (slave, pdo, _), count in entry_counts.items() for sub in range(1, count + 1)])
+        objects = self.read_round([sdo_read(slave, index, subindex, sdo_type)
+                                   for slave in slaves for index, subindex, sdo_type in self.objects])
+
+        dictionaries = {}
+        for key, slave in representatives.items():
+            dictionary = {'objects': {f"{index:04X}:{subindex}": value
+                                      for (owner, index, subindex), value in objects.items() if owner == slave
+                                      and not isinstance(value, bytes)}}
+            for image, assign in PDO_ASSIGN_OBJECTS.items():
+                count = counts.get((slave, assign, 0))
+                pdos = [assigned.get((slave, assign, sub)) for sub in range(1, (count or 0) + 1)]
+                mapping = []
+                for pdo in pdos:
+                    entry_count = entry_counts.get((slave, pdo, 0))
+                    values = [entries.get((slave, pdo, sub)) for sub in range(1, (entry_count or 0) + 1)]
+                    if pdo is None or entry_count is None or None in values:
+                        mapping = None
+                        break
+                    mapping.extend([value >> 16, (value >> 8) & 0xFF, value & 0xFF] for value in values)
+                dictionary[image] = mapping if count is not None else None
+            dictionaries[key] = dictionary
+        return dictionaries
+
+    def build_indexes(self):
+        self.by_slave = {}
+        self.by_axis = {}
+        self.by_pdo_address = {}
+        self.by_object = {}
+        for slave in self.data['slaves']:
+            slave_id = slave['id']
+            self.by_slave[slave_id] = slave
+            starts = {'input': slave['inputAddr'], 'output': slave['outputAddr']}
+            for axis_number, axis in enumerate(slave['axes']):
+                self.by_axis[axis['axis']] = (slave_id, axis_number)
+                for name, (size, offset) in axis['pdo'].items():
+                    image = 'input' if name in PDO_INFO_INPUTS else 'output'
+                    entry = {'slave': slave_id, 'axis': axis['axis'], 'name': name, 'image': image,
+                             'address': starts[image] + offset, 'bit': 0, 'bits': size * 8}
+                    self.by_pdo_address[(image, entry['address'])] = entry
+                    self.by_object[(slave_id, name)] = entry
+
+            dictionary = self.data['dictionaries'].get(device_key(slave), {})
+            for image in PDO_ASSIGN_OBJECTS:
+                for index, subindex, address, bit, bits in pdo_layout(dictionary.get(image) or (), starts[image]):
+                    entry = {'slave': slave_id, 'index': index, 'subindex': subindex, 'image': image,
+                             'address': address, 'bit': bit, 'bits': bits}
+                    self.by_pdo_address.setdefault((image, address), entry)
+                    self.by_object[(slave_id, index, subindex)] = entry
+
+    def slave(self, slave_id):
+        return self.by_slave[slave_id]
+
+    def axis(self, axis):
+        """Return (slave id, axis number on the slave) of an axis."""
+        return self.by_axis[axis]
+
+    def pdo_entry(self, slave_id, name_or_index, subindex=0):
+        """Return the PDO entry of a slave by EcSlavePdoInfo name or by object index/subindex."""
+        if isinstance(name_or_index, str):
+            return self.by_object[(slave_id, name_or_index)]
+        return self.by_object[(slave_id, name_or_index, subindex)]
+
+    def at_address(self, image, address):
+        """Return the PDO entry starting at a process image byte address."""
+        return self.by_pdo_address.get((image, address))
+
+    def dictionary(self, slave_id):
+        """Return the cached object dictionary data of the device type of a slave."""
+        return self.data['dictionaries'].get(device_key(self.by_slave[slave_id]))
+
+
+class PdoImage:
+    """
+    Reads the process data of many slaves with one Io.GetInBytes and one
+    Io.GetOutBytes call per refresh, using the slave image addresses and PDO
+    entries of an EcatTopologyCache.
+
+    The bytes land in preallocated uint8 arrays; every byte-aligned entry gets a
+    one-element typed NumPy view into them, so after refresh() the views hold the
+    new values without further copies. column() gathers one entry across all slaves
+    in a single vectorized step.
+    """
+    def __init__(self, wmx3_api, topology, slaves=None, types=None, error_queue=None):
+        self.io = Io(wmx3_api)
+        self.topology = topology
+        self.slaves = sorted(topology.by_slave) if slaves is None else list(slaves)
+        self.types = dict(types or {})
+        self.error_queue = error_queue
+        self.refresh_count = 0
+        self.compile()
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def entry_dtype(self, key, entry):
+        """
+        Return the dtype of an entry: from types (by key, name or object index), the CiA 402
+        tables, or unsigned of the entry width. None for entries that are not whole integers.
+        """
+        name = entry.get('name', entry.get('index'))
+        dtype = self.types.get(key, self.types.get(name, PDO_INFO_TYPES.get(name, CIA402_OBJECT_TYPES.get(name))))
+        if dtype is None:
+            dtype = {8: '<u1', 16: '<u2', 32: '<u4', 64: '<u8'}.get(entry['bits'])
+        return np.dtype(dtype) if dtype is not None else None
+
+    def compile(self):
+        """Size the image buffers to span the selected slaves and build the entry views."""
+        self.spans = {}
+        self.buffers = {}
+        for image, (start_field, size_field) in (('input', ('inputAddr', 'inputSize')),
+                                                 ('output', ('outputAddr', 'outputSize'))):
+            ranges = [(slave[start_field], slave[start_field] + slave[size_field])
+                      for slave in (self.topology.by_slave[slave_id] for slave_id in self.slaves)
+                      if slave[size_field] > 0]
+            if ranges:
+                start = min(first for first, _ in ranges)
+                self.spans[image] = (start, max(end for _, end in ranges) - start)
+                self.buffers[image] = np.zeros(self.spans[image][1], dtype=np.uint8)
+
+        self.entries = {}
+        self.views = {}
+        for key, entry in self.topology.by_object.items():
+            if key[0] not in self.slaves or entry['image'] not in self.spans:
+                continue
+            offset = entry['address'] - self.spans[entry['image']][0]
+            dtype = self.entry_dtype(key, entry)
+            self.entries[key] = (entry['image'], offset, entry['bit'], entry['bits'], dtype)
+            if entry['bit'] == 0 and dtype is not None and dtype.itemsize * 8 == entry['bits']:
+                self.views[key] = self.buffers[entry['image']][offset:offset + dtype.itemsize].view(dtype)
+
+    def read_image(self, image):
+        start, size = self.spans[image]
+        getter = self.io.GetInBytes if image == 'input' else self.io.GetOutBytes
+        ret, data = getter(start, size)
+        self.check("GetInBytes" if image == 'input' else "GetOutBytes", ret)
+        # The bytes arrive as (possibly signed) ints; keep the low 8 bits in place.
+        self.buffers[image][:] = np.array(data, dtype=np.int64) & 0xFF
+
+    def refresh(self, outputs=True):
+        """Read the input image (and output image) of all selected slaves in one call each."""
+        if 'input' in self.spans:
+            self.read_image('input')
+        if outputs and 'output' in self.spans:
+            self.read_image('output')
+        self.refresh_count += 1
+
+    def value(self, slave_id, name_or_index, subindex=0):
+        """Return the current value of one entry, by EcSlavePdoInfo name or object index/subindex."""
+        key = (slave_id, name_or_index) if isinstance(name_or_index, str) else (slave_id, name_or_index, subindex)
+        view = self.views.get(key)
+        if view is not None:
+            return view[0].item()
+        image, offset, bit, bits, _ = self.entries[key]
+        raw = int.from_bytes(self.buffers[image][offset:offset + (bit + bits + 7) // 8].tobytes(), 'little')
+        return (raw >> bit) & ((1 << bits) - 1)
+
+    def column(self, name_or_index, subindex=0, slaves=None):
+        """Return (slave ids, values) of one entry across slaves, gathered in one vectorized step."""
+        keys = []
+        for slave_id in (self.slaves if slaves is None else slaves):
+            key = (slave_id, name_or_index) if isinstance(name_or_index, str) else (slave_id, name_or_index, subindex)
+            if key in self.entries:
+                keys.append(key)
+        if not keys:
+            return np.zeros(0, dtype=np.int32), np.zeros(0)
+        image, _, bit, bits, dtype = self.entries[keys[0]]
+        offsets = np.array([self.entries[key][1] for key in keys])
+        slave_ids = np.array([key[0] for key in keys], dtype=np.int32)
+        if bit == 0 and dtype is not None and dtype.itemsize * 8 == bits:
+            raw = self.buffers[image][offsets[:, None] + np.arange(dtype.itemsize)]
+            return slave_ids, np.ascontiguousarray(raw).view(dtype).ravel()
+        width = (bit + bits + 7) // 8
+        raw = self.buffers[image][offsets[:, None] + np.arange(width)].astype(np.uint64)
+        packed = (raw << (np.arange(width, dtype=np.uint64) * np.uint64(8))).sum(axis=1, dtype=np.uint64)
+        return slave_ids, (packed >> np.uint64(bit)) & np.uint64((1 << bits) - 1)
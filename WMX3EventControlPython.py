@@ -0,0 +1,791 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+from WMX3UtilPython import check_errorcode
+
+# Import Python libraries
+import numpy as np
+
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+# Constants
+DEFAULT_PSO_REFILL_FRACTION = 0.5
+DEFAULT_PSO_INTERVAL = 0.002
+DEFAULT_VELOCITY_TABLE_CACHE_SIZE = 16
+DEFAULT_EVENT_READ_MAX_AGE = 1.0
+MAX_STRUCT_DEPTH = 4
+DEFAULT_PROBE_INTERVAL = 0.001
+DEFAULT_PROBE_QUEUE_SIZE = 65536
+
+SOFTWARE_PROBE = 0
+HARDWARE_PROBE = 1
+LATCH_DTYPE = np.dtype([('timestamp', np.float64), ('cycle_counter', np.int64), ('kind', np.int8),
+                        ('channel', np.int32), ('axis', np.int32), ('position', np.float64)])
+
+
+def pso_min_spacing(max_velocity, cycle_time_milliseconds=1.0):
+    """Return the distance the comparator source covers in one cycle at max_velocity."""
+    return abs(max_velocity) * cycle_time_milliseconds / 1000.0
+
+
+def check_pso_positions(positions, direction=1, min_spacing=0.0):
+    """
+    Raise ValueError if the PSO positions are not finite, strictly ordered in the
+    direction of travel (1 or -1) or closer than min_spacing. Returns the smallest spacing.
+    """
+    positions = np.asarray(positions, dtype=np.float64).ravel()
+    if positions.size == 0:
+        raise ValueError("No PSO positions")
+    bad = np.flatnonzero(~np.isfinite(positions))
+    if bad.size:
+        raise ValueError(f"PSO position {bad[0]} is not finite")
+
+    spacing = np.diff(positions) * direction
+    bad = np.flatnonzero(spacing <= 0)
+    if bad.size:
+        raise ValueError(f"PSO position {bad[0] + 1} does not follow position {bad[0]} in the direction of travel")
+    bad = np.flatnonzero(spacing < min_spacing)
+    if bad.size:
+        raise ValueError(f"PSO positions {bad[0]} and {bad[0] + 1} are closer than {min_spacing:g}")
+    return float(spacing.min()) if spacing.size else float('inf')
+
+
+class PSOJob:
+    """
+    Runs a position synchronized output job of any length on one PSO channel.
+
+    The positions are loaded through one reused doubleArray in windows of up to
+    constants.maxPsoData points. A background thread polls GetPSOStatus and, once
+    activeDataIndex has passed refill_fraction of the window, reloads the window
+    starting at the next unfired position; the reload replaces the channel data and
+    comparison restarts at its first point. Positions the source has already passed
+    when a window is reloaded are skipped and counted as missed.
+
+    The job relies on activeDataIndex counting from the first point of the last
+    SetPSOMultipleData call, including after a reload while PSO is running; the
+    absolute index of the next position is window_start + activeDataIndex.
+
+    min_margin_points is the smallest number of loaded positions still ahead of the
+    source seen while more data was pending.
+    """
+    def __init__(self, wmx3_api, channel, window_points=None, refill_fraction=DEFAULT_PSO_REFILL_FRACTION,
+                 interval=DEFAULT_PSO_INTERVAL, error_queue=None):
+        self.event_control = EventControl(wmx3_api)
+        self.core_motion = CoreMotion(wmx3_api)
+        self.channel = channel
+        self.window_points = min(window_points or constants.maxPsoData, constants.maxPsoData)
+        self.refill_fraction = refill_fraction
+        self.interval = interval
+        self.error_queue = error_queue
+
+        self.data_array = doubleArray(self.window_points)
+        self.axis = None
+        self.source_type = None
+        self.direction = 1
+        self.positions = np.zeros(0)
+        self.ordered = np.zeros(0)
+        self.window_start = 0
+        self.window_count = 0
+        self.stop_event = threading.Event()
+        self.refill_thread = None
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.fired_count = 0
+        self.load_count = 0
+        self.missed_count = 0
+        self.min_margin_points = float('inf')
+        self.last_margin_points = 0
+        self.error_count = 0
+        self.started_time = None
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def configure(self, axis, comparison_type=None, source_type=None, output_type=None,
+                  byte_address=0, bit_address=0, invert=0, min_duration_milliseconds=1.0):
+        """Set the comparator source and output of the channel with SetPSOConfig."""
+        comparison_type = comparison_type if comparison_type is not None else EventControl_ComparisonType.PositiveDirection
+        source = EventControl_ComparatorSource()
+        source.axis = axis
+        source.sourceType = source_type if source_type is not None else EventControl_ComparatorSourceType.PosCommand
+        output = EventControl_PSOOutput()
+        output.outputType = output_type if output_type is not None else EventControl_PSOOutputType.IOOutput
+        output.byteAddress = byte_address
+        output.bitAddress = bit_address
+        output.invert = invert
+        self.check("SetPSOConfig", self.event_control.SetPSOConfig(
+            self.channel, comparison_type, source, output, min_duration_milliseconds))
+
+        self.axis = axis
+        self.source_type = source.sourceType
+        self.direction = -1 if comparison_type == EventControl_ComparisonType.NegativeDirection else 1
+
+    def source_position(self):
+        """Return the comparator source position, or None for sources that are not positions."""
+        if self.source_type == EventControl_ComparatorSourceType.PosCommand:
+            field = 'posCmd'
+        elif self.source_type == EventControl_ComparatorSourceType.PosFeedback:
+            field = 'actualPos'
+        else:
+            return None
+        ret, status = self.core_motion.GetStatus()
+        self.check("GetStatus", ret)
+        return getattr(status.GetAxesStatus(self.axis), field)
+
+    def load_window(self, start):
+        """Load the positions from start into the channel, up to window_points of them."""
+        count = min(self.window_points, self.positions.size - start)
+        data_array = self.data_array
+        for index, position in enumerate(self.positions[start:start + count].tolist()):
+            data_array[index] = position
+        self.check("SetPSOMultipleData", self.event_control.SetPSOMultipleData(self.channel, count, data_array))
+        self.window_start = start
+        self.window_count = count
+        self.load_count += 1
+
+    def refill(self):
+        """Reload the window if the job has moved far enough into it. Returns False when the job is done."""
+        ret, status = self.event_control.GetPSOStatus(self.channel)
+        self.check("GetPSOStatus", ret)
+        # activeDataIndex is relative to the window loaded last (see the class docstring).
+        active = min(status.activeDataIndex, self.window_count)
+        self.fired_count = self.window_start + active
+        window_end = self.window_start + self.window_count
+        if self.fired_count >= self.positions.size:
+            return False
+
+        self.last_margin_points = self.window_count - active
+        if window_end < self.positions.size:
+            self.min_margin_points = min(self.min_margin_points, self.last_margin_points)
+            if active >= self.refill_fraction * self.window_count:
+                start = self.fired_count
+                position = self.source_position()
+                if position is not None:
+                    passed = int(np.searchsorted(self.ordered, position * self.direction, 'right'))
+                    start = max(start, min(passed, self.positions.size - 1))
+                    self.missed_count += start - self.fired_count
+                self.load_window(start)
+        return True
+
+    def refill_task(self):
+        while not self.stop_event.is_set():
+            try:
+                if not self.refill():
+                    break
+            except RuntimeError:
+                # check_errorcode has already reported the error.
+                self.error_count += 1
+                break
+            self.stop_event.wait(self.interval)
+
+    def start(self, positions, min_spacing=0.0):
+        """Check the positions, load the first window, start PSO and the refill thread."""
+        positions = np.asarray(positions, dtype=np.float64).ravel()
+        check_pso_positions(positions, self.direction, min_spacing)
+        self.positions = positions
+        # Increasing in both directions, so positions already passed are one search away.
+        self.ordered = positions * self.direction
+        self.reset_metrics()
+
+        self.load_window(0)
+        self.check("StartPSO", self.event_control.StartPSO(self.channel))
+        self.started_time = monotonic()
+
+        self.stop_event.clear()
+        self.refill_thread = threading.Thread(target=self.refill_task, daemon=True)
+        self.refill_thread.start()
+
+    def wait(self, timeout=None):
+        """Wait until every position has fired. Returns False on timeout."""
+        if self.refill_thread:
+            self.refill_thread.join(timeout)
+            return not self.refill_thread.is_alive() and self.fired_count >= self.positions.size
+        return self.fired_count >= self.positions.size
+
+    def stop(self):
+        self.stop_event.set()
+        if self.refill_thread and self.refill_thread.is_alive():
+            self.refill_thread.join()
+        self.refill_thread = None
+        self.check("StopPSO", self.event_control.StopPSO(self.channel))
+
+    def metrics(self):
+        elapsed = monotonic() - self.started_time if self.started_time is not None else 0.0
+        return {
+            'positions': int(self.positions.size),
+            'fired': self.fired_count - self.missed_count,
+            'missed': self.missed_count,
+            'loads': self.load_count,
+            'window_points': self.window_points,
+            'margin_points': self.last_margin_points,
+            'min_margin_points': self.min_margin_points,
+            'fire_rate': self.fired_count / elapsed if elapsed > 0 else 0.0,
+            'errors': self.error_count,
+        }
+
+
+def curvature_velocity(points, max_velocity, max_lateral_acc, source_column=None):
+    """
+    Return (pos, velocity) limiting the velocity at each vertex of a (points x dims)
+    path so the lateral acceleration v^2 * curvature stays below max_lateral_acc.
+    pos is the path length, or the coordinate in source_column when given.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    points = points.reshape(points.shape[0], -1)
+    edges = np.diff(points, axis=0)
+    lengths = np.linalg.norm(edges, axis=1)
+
+    # Curvature of the circle through three neighbouring vertices: 2 sin(turn) / chord.
+    a, b = edges[:-1], edges[1:]
+    cross_sq = np.maximum(np.einsum('ij,ij->i', a, a) * np.einsum('ij,ij->i', b, b)
+                          - np.einsum('ij,ij->i', a, b) ** 2, 0.0)
+    denominator = lengths[:-1] * lengths[1:] * np.linalg.norm(a + b, axis=1)
+    curvature = np.zeros(points.shape[0])
+    np.divide(2.0 * np.sqrt(cross_sq), denominator, out=curvature[1:-1], where=denominator > 0)
+
+    velocity = np.full(points.shape[0], float(max_velocity))
+    curved = curvature > 0
+    velocity[curved] = np.minimum(max_velocity, np.sqrt(max_lateral_acc / curvature[curved]))
+    if source_column is None:
+        pos = np.concatenate(([0.0], np.cumsum(lengths)))
+    else:
+        pos = points[:, source_column].copy()
+    return pos, velocity
+
+
+def process_map_velocity(pos, map_pos, map_velocity, max_velocity=None):
+    """Return the velocity of a process map (e.g. feed vs. material thickness) interpolated at pos."""
+    velocity = np.interp(pos, map_pos, map_velocity)
+    return velocity if max_velocity is None else np.minimum(velocity, max_velocity)
+
+
+def limit_velocity_changes(pos, velocity, max_acc):
+    """
+    Lower velocities so each change between neighbouring points is reachable with
+    max_acc, both accelerating (forward) and decelerating (backward).
+    """
+    pos = np.asarray(pos, dtype=np.float64)
+    squared = np.asarray(velocity, dtype=np.float64) ** 2
+    # v[i]^2 <= v[i-1]^2 + 2 a ds is a running minimum of v^2 - 2 a s.
+    reach = 2.0 * max_acc * np.abs(pos - pos[0])
+    squared = np.minimum.accumulate(squared - reach) + reach
+    reach = reach[-1] - reach
+    squared = (np.minimum.accumulate((squared - reach)[::-1]) + reach[::-1])[::-1]
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+def resample_velocity_profile(pos, velocity, max_points):
+    """
+    Reduce a velocity profile to at most max_points. Each point holds its velocity until
+    the next one, so repeated velocities are dropped first; if still too long, points are
+    spread by velocity variation and distance and each keeps the lowest velocity it covers.
+    """
+    pos = np.asarray(pos, dtype=np.float64)
+    velocity = np.asarray(velocity, dtype=np.float64)
+    starts = np.flatnonzero(np.concatenate(([True], velocity[1:] != velocity[:-1])))
+    if starts.size > max_points:
+        change = np.concatenate(([0.0], np.cumsum(np.abs(np.diff(velocity)))))
+        distance = np.abs(pos - pos[0])
+        weight = (change / change[-1] if change[-1] > 0 else 0.0) + (distance / distance[-1] if distance[-1] > 0 else 0.0)
+        targets = np.linspace(0.0, weight[-1], max_points, endpoint=False)
+        starts = np.unique(np.searchsorted(weight, targets, 'left'))
+        starts[0] = 0
+    return pos[starts], np.minimum.reduceat(velocity, starts)
+
+
+class PlannedVelocityOverride:
+    """
+    Compiles velocity profiles into EventControl_PlannedVelocityDataArray tables for
+    one planned velocity override channel and caches them by part program key, so
+    re-running a job only uploads the cached table.
+
+    Profiles are resampled to max_points (constants.maxPveloData by default) and must be
+    ordered in the direction of travel of the comparator source.
+    """
+    def __init__(self, wmx3_api, channel, max_points=None, max_tables=DEFAULT_VELOCITY_TABLE_CACHE_SIZE,
+                 error_queue=None):
+        self.event_control = EventControl(wmx3_api)
+        self.channel = channel
+        self.max_points = min(max_points or constants.maxPveloData, constants.maxPveloData)
+        self.max_tables = max_tables
+        self.error_queue = error_queue
+        self.direction = 1
+        self.tables = OrderedDict()
+        self.active_table = None
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def configure(self, axis, source_axis=None, comparison_type=None, source_type=None):
+        """Override the velocity of axis at positions of source_axis (default: axis itself)."""
+        comparison_type = comparison_type if comparison_type is not None else EventControl_ComparisonType.PositiveDirection
+        source = EventControl_ComparatorSource()
+        source.axis = source_axis if source_axis is not None else axis
+        source.sourceType = source_type if source_type is not None else EventControl_ComparatorSourceType.PosCommand
+        self.check("SetPlannedVelOverrideConfig",
+                   self.event_control.SetPlannedVelOverrideConfig(self.channel, comparison_type, source, axis))
+        self.direction = -1 if comparison_type == EventControl_ComparisonType.NegativeDirection else 1
+
+    def fill_data(self, pos, velocity):
+        """Fill an EventControl_PlannedVelocityDataArray from pos/velocity arrays."""
+        data_array = EventControl_PlannedVelocityDataArray(pos.size)
+        data = EventControl_PlannedVelocityData()
+        for index, (position, speed) in enumerate(zip(pos.tolist(), velocity.tolist())):
+            data.pos = position
+            data.velocity = speed
+            data_array[index] = data
+        return data_array
+
+    def compile(self, key, build, *args, max_acc=None, **kwargs):
+        """
+        Return the cached (data_array, pos, velocity) table for a part program key. On a
+        miss build(*args, **kwargs) must return (pos, velocity); the profile is limited to
+        max_acc if given, resampled, checked and converted.
+        """
+        table = self.tables.get(key)
+        if table is not None:
+            self.tables.move_to_end(key)
+            self.hit_count += 1
+            return table
+
+        self.miss_count += 1
+        pos, velocity = build(*args, **kwargs)
+        pos = np.asarray(pos, dtype=np.float64).ravel()
+        velocity = np.broadcast_to(np.asarray(velocity, dtype=np.float64), pos.shape)
+        if max_acc is not None:
+            velocity = limit_velocity_changes(pos, velocity, max_acc)
+        pos, velocity = resample_velocity_profile(pos, velocity, self.max_points)
+        check_pso_positions(pos, self.direction)
+        if np.any(velocity < 0):
+            raise ValueError("Planned velocities must not be negative")
+
+        table = (self.fill_data(pos, velocity), pos, velocity)
+        self.tables[key] = table
+        if len(self.tables) > self.max_tables:
+            self.tables.popitem(last=False)
+        return table
+
+    def start(self, table):
+        """Upload a compiled table in one SetPlannedVelOverrideMultipleData call and start it."""
+        data_array, pos, _ = table
+        self.check("SetPlannedVelOverrideMultipleData",
+                   self.event_control.SetPlannedVelOverrideMultipleData(self.channel, pos.size, data_array))
+        self.check("StartPlannedVelOverride", self.event_control.StartPlannedVelOverride(self.channel))
+        self.active_table = table
+
+    def stop(self):
+        self.check("StopPlannedVelOverride", self.event_control.StopPlannedVelOverride(self.channel))
+        self.active_table = None
+
+    def status(self):
+        """Return the GetPlannedVelOverrideStatus fields and the progress through the active table."""
+        ret, status = self.event_control.GetPlannedVelOverrideStatus(self.channel)
+        self.check("GetPlannedVelOverrideStatus", ret)
+        result = {
+            'enabled': status.enabled,
+            'active': status.active,
+            'index': status.activeDataIndex,
+            'velocity': status.activeVelocityCommand,
+        }
+        if self.active_table is not None:
+            pos = self.active_table[1]
+            result['pos'] = float(pos[min(status.activeDataIndex, pos.size - 1)])
+            result['progress'] = status.activeDataIndex / pos.size
+        return result
+
+    def hit_rate(self):
+        total = self.hit_count + self.miss_count
+        return self.hit_count / total if total else 0.0
+
+    def clear(self):
+        self.tables.clear()
+
+
+def flatten_struct(data, prefix='', depth=MAX_STRUCT_DEPTH):
+    """Return a {dotted name: value} dict of the SWIG properties of a struct, nested structs included."""
+    values = {}
+    for name in dir(type(data)):
+        if name == 'thisown' or not isinstance(getattr(type(data), name, None), property):
+            continue
+        value = getattr(data, name)
+        if isinstance(value, (bool, int, float, str)):
+            values[prefix + name] = value
+        elif depth > 0:
+            values.update(flatten_struct(value, prefix + name + '.', depth - 1))
+    return values
+
+
+def struct_fingerprint(*structs, exclude=()):
+    """Return a hash of the flattened fields of one or more SWIG structs."""
+    items = []
+    for index, data in enumerate(structs):
+        if data is not None:
+            items.extend((index, name, value) for name, value in sorted(flatten_struct(data).items())
+                         if name not in exclude)
+    return hashlib.sha1(repr(items).encode('utf-8')).hexdigest()
+
+
+def event_spec(event_input, event_output, enabled=True, option=None, event_id=None):
+    """One entry of a desired event table; event_id pins the ID, otherwise one is allocated."""
+    return (event_input, event_output, enabled, option, event_id)
+
+
+class EventTable:
+    """
+    Reconciles the engine event table with a desired {name: event_spec} dict.
+
+    Each name keeps its event ID across reconciliations. Changed definitions are
+    rewritten in place with SetEvent_ID, enable-only changes use EnableEvent and
+    names no longer desired are removed last, so unchanged (e.g. protective) events
+    are never cleared. Events not created by this table are left alone.
+
+    A definition counts as unchanged when its input/output/option fields match what
+    was last written and the engine copy (GetEvent) still matches the read-back taken
+    after writing. Engine reads are reused for max_age seconds. state()/load_state()
+    carry the name-to-ID map and hashes across restarts.
+    """
+    def __init__(self, wmx3_api, id_range=None, max_age=DEFAULT_EVENT_READ_MAX_AGE, error_queue=None):
+        self.event_control = EventControl(wmx3_api)
+        self.id_range = id_range if id_range is not None else range(constants.maxEvents)
+        self.max_age = max_age
+        self.error_queue = error_queue
+        self.ids = {}
+        self.applied = {}
+        self.events = None
+        self.read_time = None
+        self.set_count = 0
+        self.enable_count = 0
+        self.remove_count = 0
+        self.read_count = 0
+        self.cached_read_count = 0
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def read_events(self, max_age=None):
+        """Return {id: EventControl_Event} of every defined event, reusing a read younger than max_age seconds."""
+        max_age = self.max_age if max_age is None else max_age
+        if self.events is not None and monotonic() - self.read_time <= max_age:
+            self.cached_read_count += 1
+            return self.events
+
+        ret, all_event_id = self.event_control.GetAllEventID()
+        self.check("GetAllEventID", ret)
+        events = {}
+        for index in range(all_event_id.count):
+            event_id = all_event_id.GetId(index)
+            ret, event = self.event_control.GetEvent(event_id)
+            self.check("GetEvent", ret)
+            events[event_id] = event
+        self.events = events
+        self.read_time = monotonic()
+        self.read_count += 1
+        return events
+
+    def invalidate(self):
+        self.events = None
+
+    def allocate_id(self, name, event_id, used):
+        """Return the pinned ID, the ID name had before, or the lowest free ID in id_range."""
+        if event_id is not None:
+            return event_id
+        event_id = self.ids.get(name)
+        if event_id is not None:
+            return event_id
+        for event_id in self.id_range:
+            if event_id not in used:
+                return event_id
+        raise ValueError(f"No free event ID for {name}")
+
+    def plan(self, desired):
+        """Return the [(action, name, id)] list that brings the engine to desired: 'set', 'enable', 'disable', 'remove'."""
+        events = self.read_events()
+        owners = {event_id: name for name, event_id in self.ids.items()}
+        used = set(events) | set(owners)
+        used.update(spec[4] for spec in desired.values() if spec[4] is not None)
+
+        actions = []
+        allocated = set()
+        for name, (event_input, event_output, enabled, option, event_id) in desired.items():
+            event_id = self.allocate_id(name, event_id, used)
+            owner = owners.get(event_id)
+            if owner is not None and owner != name and owner in desired:
+                raise ValueError(f"Events {owner} and {name} both use ID {event_id}")
+            used.add(event_id)
+            allocated.add(event_id)
+
+            record = self.applied.get(name)
+            current = events.get(event_id)
+            wanted = struct_fingerprint(event_input, event_output, option)
+            if (record is None or record[0] != event_id or record[1] != wanted or current is None
+                    or struct_fingerprint(current, exclude=('enabled',)) != record[2]):
+                actions.append(('set', name, event_id))
+            elif bool(current.enabled) != bool(enabled):
+                actions.append(('enable' if enabled else 'disable', name, event_id))
+
+        # An ID handed over to a desired name is overwritten by its 'set', not removed.
+        for name, event_id in self.ids.items():
+            if name not in desired and event_id in events and event_id not in allocated:
+                actions.append(('remove', name, event_id))
+        return actions
+
+    def apply(self, desired):
+        """Reconcile the engine with desired and return the actions taken."""
+        actions = self.plan(desired)
+        for action, name, event_id in actions:
+            if action == 'set':
+                event_input, event_output, enabled, option, _ = desired[name]
+                if option is None:
+                    ret, event_id = self.event_control.SetEvent_ID(event_input, event_output, event_id)
+                else:
+                    ret, event_id = self.event_control.SetEvent_ID_Option(event_input, event_output, event_id, option)
+                self.check("SetEvent_ID", ret)
+                self.set_count += 1
+                if not enabled:
+                    self.check("EnableEvent", self.event_control.EnableEvent(event_id, 0))
+                    self.enable_count += 1
+                ret, event = self.event_control.GetEvent(event_id)
+                self.check("GetEvent", ret)
+                self.ids[name] = event_id
+                self.applied[name] = (event_id, struct_fingerprint(event_input, event_output, option),
+                                      struct_fingerprint(event, exclude=('enabled',)))
+                if self.events is not None:
+                    self.events[event_id] = event
+            elif action in ('enable', 'disable'):
+                self.check("EnableEvent", self.event_control.EnableEvent(event_id, 1 if action == 'enable' else 0))
+                self.enable_count += 1
+                if self.events is not None and event_id in self.events:
+                    self.events[event_id].enabled = 1 if action == 'enable' else 0
+
+        for action, name, event_id in actions:
+            if action == 'remove':
+                self.check("RemoveEvent", self.event_control.RemoveEvent(event_id))
+                self.remove_count += 1
+                if self.events is not None:
+                    self.events.pop(event_id, None)
+
+        for name in list(self.ids):
+            if name not in desired:
+                del self.ids[name]
+                self.applied.pop(name, None)
+        return actions
+
+    def state(self):
+        """Return the name-to-ID map and hashes as plain data, e.g. for JSON."""
+        return {name: list(record) for name, record in self.applied.items()}
+
+    def load_state(self, state):
+        self.applied = {name: tuple(record) for name, record in state.items()}
+        self.ids = {name: record[0] for name, record in self.applied.items()}
+
+    def metrics(self):
+        return {
+            'events': len(self.ids),
+            'sets': self.set_count,
+            'enables': self.enable_count,
+            'removes': self.remove_count,
+            'reads': self.read_count,
+            'cached_reads': self.cached_read_count,
+        }
+
+
+class TouchProbeCapture:
+    """
+    Polls every configured software and hardware touch probe channel in one loop and
+    delivers each latch once as a (timestamp, cycle_counter, kind, channel, axis,
+    position) record, kind being SOFTWARE_PROBE or HARDWARE_PROBE.
+
+    Software probes cost one GetSoftwareTouchProbeCounterValue call per poll; a latch is
+    new when the probe was not latched at the previous poll or its counter value
+    changed. Hardware probes report every latched value beyond those already seen.
+    With auto_rearm the probe is disabled and enabled again after each latch. Records
+    are timestamped with the engine cycle counter read once per poll.
+    """
+    def __init__(self, wmx3_api, interval=DEFAULT_PROBE_INTERVAL, auto_rearm=True,
+                 queue_size=DEFAULT_PROBE_QUEUE_SIZE, error_queue=None):
+        self.wmx3_api = wmx3_api
+        self.event_control = EventControl(wmx3_api)
+        self.interval = interval
+        self.auto_rearm = auto_rearm
+        self.error_queue = error_queue
+
+        self.software_probes = {}
+        self.hardware_probes = {}
+        self.latches = queue.Queue(queue_size)
+        self.stop_event = threading.Event()
+        self.capture_thread = None
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.poll_count = 0
+        self.latch_count = 0
+        self.dropped_count = 0
+        self.rearm_count = 0
+        self.error_count = 0
+        self.last_error = None
+        self.max_poll_seconds = 0.0
+        self.started_time = None
+
+    def check(self, func, ret):
+        if ret != ErrorCode.PyNone:
+            check_errorcode(func, ret, self.error_queue)
+
+    def add_software_probe(self, channel, axis=None, byte_address=None, bit_offset=None, logic=1, mode=None):
+        """
+        Capture a software touch probe channel. With byte_address and bit_offset the
+        channel is also configured with SetSoftwareTouchProbe.
+        """
+        if byte_address is not None:
+            mode = mode if mode is not None else EventControl_TouchProbeMode.LatchFirst
+            self.check("SetSoftwareTouchProbe", self.event_control.SetSoftwareTouchProbe(
+                channel, 1, axis, byte_address, bit_offset, logic, mode))
+        elif axis is None:
+            ret, _, axis, _, _, _, _ = self.event_control.GetSoftwareTouchProbe(channel)
+            self.check("GetSoftwareTouchProbe", ret)
+        # [axis, latched at the previous poll, last counter value]
+        self.software_probes[channel] = [axis, False, None]
+
+    def add_hardware_probe(self, channel, axis=None, mode=None, trigger_source=None):
+        """Capture a hardware touch probe channel, configuring it with SetHardwareTouchProbe if axis is given."""
+        if axis is not None:
+            mode = mode if mode is not None else EventControl_TouchProbeMode.LatchFirst
+            trigger_source = trigger_source if trigger_source is not None else EventControl_TouchProbeSource.TouchProbe
+            self.check("SetHardwareTouchProbe", self.event_control.SetHardwareTouchProbe(
+                axis, 1, mode, trigger_source, channel))
+        # [axis, latched values already delivered]
+        self.hardware_probes[channel] = [axis, 0]
+
+    def emit(self, timestamp, cycle_counter, kind, channel, axis, position):
+        try:
+            self.latches.put_nowait((timestamp, cycle_counter, kind, channel, axis, position))
+            self.latch_count += 1
+        except queue.Full:
+            self.dropped_count += 1
+
+    def rearm_software(self, channel):
+        self.check("EnableSoftwareTouchProbe", self.event_control.EnableSoftwareTouchProbe(channel, 0))
+        self.check("EnableSoftwareTouchProbe", self.event_control.EnableSoftwareTouchProbe(channel, 1))
+        self.rearm_count += 1
+
+    def rearm_hardware(self, axis):
+        self.check("EnableHardwareTouchProbe", self.event_control.EnableHardwareTouchProbe(axis, 0))
+        self.check("EnableHardwareTouchProbe", self.event_control.EnableHardwareTouchProbe(axis, 1))
+        self.rearm_count += 1
+
+    def poll(self):
+        """Poll every probe once and queue the new latches. Returns the number found."""
+        started = monotonic()
+        ret, engine_status = self.wmx3_api.GetEngineStatus()
+        self.check("GetEngineStatus", ret)
+        cycle_counter = engine_status.interrupts.cycleCounter
+        found = 0
+
+        for channel, probe in self.software_probes.items():
+            ret, latched, value = self.event_control.GetSoftwareTouchProbeCounterValue(channel)
+            self.check("GetSoftwareTouchProbeCounterValue", ret)
+            if latched and (not probe[1] or value != probe[2]):
+                self.emit(started, cycle_counter, SOFTWARE_PROBE, channel, probe[0], value)
+                found += 1
+                probe[2] = value
+                if self.auto_rearm:
+                    self.rearm_software(channel)
+                    latched = 0
+            probe[1] = bool(latched)
+
+        for channel, probe in self.hardware_probes.items():
+            ret, status = self.event_control.GetHardwareTouchProbeStatus(channel)
+            self.check("GetHardwareTouchProbeStatus", ret)
+            if probe[0] is None:
+                probe[0] = status.axis
+            if not status.latched:
+                probe[1] = 0
+                continue
+            count = max(status.latchedValueCount, 1)
+            for index in range(probe[1] if probe[1] <= count else 0, count):
+                self.emit(started, cycle_counter, HARDWARE_PROBE, channel, probe[0], status.GetLatchedPos(index))
+                found += 1
+            probe[1] = count
+            if self.auto_rearm:
+                self.rearm_hardware(probe[0])
+                probe[1] = 0
+
+        self.poll_count += 1
+        self.max_poll_seconds = max(self.max_poll_seconds, monotonic() - started)
+        return found
+
+    def capture_task(self):
+        while not self.stop_event.is_set():
+            try:
+                self.poll()
+            except RuntimeError as e:
+                # check_errorcode has already reported the error.
+                self.error_count += 1
+                self.last_error = str(e)
+                break
+            except Exception as e:
+                self.error_count += 1
+                self.last_error = f"function: TouchProbeCapture.poll, Error: {e!r}"
+                if self.error_queue:
+                    self.error_queue.put(self.last_error)
+                break
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        """Arm every probe and start the capture thread."""
+        self.reset_metrics()
+        for channel in self.software_probes:
+            self.rearm_software(channel)
+        for probe in self.hardware_probes.values():
+            if probe[0] is not None:
+                self.rearm_hardware(probe[0])
+        self.started_time = monotonic()
+        self.stop_event.clear()
+        self.capture_thread = threading.Thread(target=self.capture_task, daemon=True)
+        self.capture_thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.capture_thread and self.capture_thread.is_alive():
+            self.capture_thread.join()
+        self.capture_thread = None
+
+    def stream(self, timeout=None):
+        """Yield latch records as they arrive; stops after timeout seconds without a latch."""
+        while True:
+            try:
+                yield self.latches.get(timeout=timeout)
+            except queue.Empty:
+                return
+
+    def batch(self, max_count=None):
+        """Return the queued latch records as a LATCH_DTYPE structured array."""
+        records = []
+        while max_count is None or len(records) < max_count:
+            try:
+                records.append(self.latches.get_nowait())
+            except queue.Empty:
+                break
+        return np.array(records, dtype=LATCH_DTYPE)
+
+    def metrics(self):
+        elapsed = monotonic() - self.started_time if self.started_time is not None else 0.0
+        return {
+            'polls': self.poll_count,
+            'poll_rate': self.poll_count / elapsed if elapsed > 0 else 0.0,
+            'max_poll_milliseconds': self.max_poll_seconds * 1000.0,
+            'latches': self.latch_count,
+            'dropped': self.dropped_count,
+            'rearms': self.rearm_count,
+            'errors': self.error_count,
+            'last_error': self.last_error,
+            'running': self.capture_thread is not None and self.capture_thread.is_alive(),
+        }
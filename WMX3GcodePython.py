@@ -0,0 +1,317 @@
+# Import WMX3 API library
+from WMX3AdvMotionPython import (circular_3d_segment, circular_segment, linear_segment,
+                                 sleep_segment)
+
+# Import Python libraries
+import numpy as np
+
+import re
+from time import monotonic
+
+# Constants
+DEFAULT_TOLERANCE = 0.001
+DEFAULT_CHUNK_POINTS = 4096
+MIN_ARC_POINTS = 5
+FULL_TURN_MARGIN = 1e-3
+
+GCODE_COMMENT = re.compile(r'\([^)]*\)')
+GCODE_WORD = re.compile(r'([A-Za-z])\s*([-+]?(?:\d+\.?\d*|\.\d+))')
+
+
+def parse_gcode_line(line):
+    """Return the list of (letter, value) words of one G-code line, without comments."""
+    line = GCODE_COMMENT.sub('', line).split(';', 1)[0]
+    return [(letter.upper(), float(value)) for letter, value in GCODE_WORD.findall(line)]
+
+
+def segment_distances(points, start, end):
+    """Vectorized distance of each point to the segment start-end."""
+    direction = end - start
+    length_sq = direction @ direction
+    if length_sq == 0:
+        return np.linalg.norm(points - start, axis=1)
+    t = np.clip((points - start) @ direction / length_sq, 0.0, 1.0)
+    return np.linalg.norm(points - (start + t[:, None] * direction), axis=1)
+
+
+def simplify_polyline(points, tolerance):
+    """
+    Return the indices of the points kept when merging nearly collinear runs
+    (Ramer-Douglas-Peucker). Every removed point lies within tolerance of the result.
+    """
+    count = points.shape[0]
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = segment_distances(points[first + 1:last], points[first], points[last])
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def circumcircle(a, b, c):
+    """Return (center, radius, normal) of the circle through three 3-D points, or None if collinear."""
+    ab, ac = b - a, c - a
+    normal = np.cross(ab, ac)
+    normal_sq = normal @ normal
+    if normal_sq <= 1e-24 * (ab @ ab) * (ac @ ac):
+        return None
+    center = a + (np.cross(normal, ab) * (ac @ ac) + np.cross(ac, normal) * (ab @ ab)) / (2.0 * normal_sq)
+    return center, np.linalg.norm(a - center), normal / np.sqrt(normal_sq)
+
+
+def arc_fit(points, tolerance):
+    """
+    Check whether 3-D points lie on one arc within tolerance, travelled in one direction
+    for less than a full turn and curved by more than tolerance.
+    Returns (center, normal, sweep) or None.
+    """
+    circle = circumcircle(points[0], points[points.shape[0] // 2], points[-1])
+    if circle is None:
+        return None
+    center, radius, normal = circle
+
+    offsets = points - center
+    out_of_plane = offsets @ normal
+    in_plane = offsets - out_of_plane[:, None] * normal
+    deviation = np.hypot(np.linalg.norm(in_plane, axis=1) - radius, out_of_plane)
+    if np.any(deviation > tolerance):
+        return None
+
+    turns = np.cross(in_plane[:-1], in_plane[1:]) @ normal
+    steps = np.arctan2(turns, np.einsum('ij,ij->i', in_plane[:-1], in_plane[1:]))
+    if not (np.all(steps > 0) or np.all(steps < 0)):
+        return None
+    sweep = abs(steps.sum())
+    # Nearly straight runs are left to the polyline simplification.
+    if sweep >= 2.0 * np.pi - FULL_TURN_MARGIN or radius * (1.0 - np.cos(sweep / 2.0)) <= tolerance:
+        return None
+    return center, normal, sweep
+
+
+def find_arcs(points, tolerance, min_points=MIN_ARC_POINTS):
+    """Greedily return (first, last, center, normal) index ranges of points that form arcs."""
+    if min_points < 3:
+        raise ValueError(f"An arc needs at least 3 points, got min_points={min_points}")
+    arcs = []
+    count = points.shape[0]
+    if count < min_points:
+        return arcs
+
+    # An arc can only start where the next min_points - 2 corners all turn the same
+    # way; rule out straight and zigzag stretches for every start index at once.
+    edges = np.diff(points, axis=0)
+    corners = np.cross(edges[:-1], edges[1:])
+    turning = np.einsum('ij,ij->i', corners, corners) > 1e-24 * np.einsum('ij,ij->i', edges[:-1], edges[:-1]) ** 2
+    same_way = turning[:-1] & turning[1:] & (np.einsum('ij,ij->i', corners[:-1], corners[1:]) > 0)
+    window = min_points - 3
+    if window == 0:
+        # Three points have a single corner, so every start index is a candidate.
+        candidate = np.ones(count - 2, dtype=bool)
+    else:
+        same_count = np.concatenate(([0], np.cumsum(same_way)))
+        candidate = (same_count[window:] - same_count[:-window]) == window
+
+    first = 0
+    while first + min_points <= count:
+        if not candidate[first]:
+            first += 1
+            continue
+        last = first + min_points - 1
+        fit = arc_fit(points[first:last + 1], tolerance)
+        if fit is None:
+            first += 1
+            continue
+        # Grow the arc by doubling, then bisect to the longest run that still fits.
+        good, step = last, min_points
+        while good + step < count and arc_fit(points[first:good + step + 1], tolerance) is not None:
+            good += step
+            step *= 2
+        bad = min(good + step, count)
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            if arc_fit(points[first:middle + 1], tolerance) is not None:
+                good = middle
+            else:
+                bad = middle
+        center, normal, _ = arc_fit(points[first:good + 1], tolerance)
+        arcs.append((first, good, center, normal))
+        first = good
+    return arcs
+
+
+class GcodeImporter:
+    """
+    Streams G-code (G0/G1/G2/G3/G4, G90/G91, F) into path interpolation lookahead
+    segments for PathIntplLookaheadFeeder.
+
+    Consecutive G1 moves at the same feed are collected into chunks of up to
+    chunk_points points; each chunk is fitted with arcs and the rest merged into
+    longer linear segments, all within tolerance. XY arcs become center/end circular
+    segments and arcs in other planes through/end 3-D circular segments. Feeds are
+    scaled by feed_scale (default: units/min to units/s).
+    """
+    def __init__(self, axis_letters='XYZ', tolerance=DEFAULT_TOLERANCE, chunk_points=DEFAULT_CHUNK_POINTS,
+                 feed_scale=1.0 / 60.0, rapid_velocity=None, fit_arcs=True, start_position=None):
+        self.axis_letters = axis_letters
+        self.tolerance = tolerance
+        self.chunk_points = chunk_points
+        self.feed_scale = feed_scale
+        self.rapid_velocity = rapid_velocity
+        self.fit_arcs = fit_arcs
+        self.start_position = start_position
+        self.reset()
+
+    def reset(self):
+        start = self.start_position if self.start_position is not None else ()
+        self.position = np.zeros(3)
+        self.position[:len(start)] = start
+        self.motion_mode = 1
+        self.absolute = True
+        self.feed = None
+        self.line_count = 0
+        self.input_count = 0
+        self.output_count = 0
+        self.parse_seconds = 0.0
+
+    def parse(self, lines):
+        """
+        Yield the moves of the G-code lines with absolute end positions: ('line', end, velocity),
+        ('rapid', end, velocity), ('arc', end, center, clockwise, velocity) and ('dwell', milliseconds).
+        """
+        dimensions = len(self.axis_letters)
+        for line in lines:
+            started = monotonic()
+            self.line_count += 1
+            words = parse_gcode_line(line)
+            if not words:
+                self.parse_seconds += monotonic() - started
+                continue
+
+            move = None
+            target = self.position.copy() if self.absolute else np.zeros(3)
+            has_axis = False
+            offsets = {}
+            dwell = False
+            dwell_time = 0.0
+            for letter, value in words:
+                if letter == 'G':
+                    code = int(value)
+                    if code in (0, 1, 2, 3):
+                        self.motion_mode = code
+                    elif code == 4:
+                        dwell = True
+                    elif code == 90:
+                        self.absolute = True
+                        target = self.position.copy()
+                    elif code == 91:
+                        self.absolute = False
+                        target = np.zeros(3)
+                elif letter == 'F':
+                    self.feed = value * self.feed_scale
+                elif letter in self.axis_letters:
+                    target[self.axis_letters.index(letter)] = value
+                    has_axis = True
+                elif letter in 'IJ':
+                    offsets[letter] = value
+                elif letter == 'P':
+                    # P may come before or after G4 on the line.
+                    dwell_time = value
+
+            if dwell:
+                move = ('dwell', dwell_time)
+            elif has_axis:
+                end = target if self.absolute else self.position + target
+                end[dimensions:] = 0.0
+                if self.motion_mode == 0:
+                    move = ('rapid', end, self.rapid_velocity)
+                elif self.motion_mode == 1:
+                    move = ('line', end, self.feed)
+                else:
+                    if 'I' not in offsets and 'J' not in offsets:
+                        raise ValueError(f"Line {self.line_count}: only I/J arcs are supported")
+                    if end[2] != self.position[2]:
+                        raise ValueError(f"Line {self.line_count}: helical arcs are not supported")
+                    center = self.position + np.array([offsets.get('I', 0.0), offsets.get('J', 0.0), 0.0])
+                    move = ('arc', end, center, self.motion_mode == 2, self.feed)
+                self.position = end
+
+            self.parse_seconds += monotonic() - started
+            if move is not None:
+                self.input_count += 1
+                yield move
+
+    def compact_run(self, points, velocity):
+        """Yield the merged segments of one run of linear moves starting at points[0]."""
+        dimensions = len(self.axis_letters)
+        arcs = find_arcs(points, self.tolerance) if self.fit_arcs else []
+        position = 0
+        for first, last, center, normal in arcs + [(points.shape[0] - 1, None, None, None)]:
+            if first > position:
+                for index in simplify_polyline(points[position:first + 1], self.tolerance)[1:]:
+                    yield linear_segment(points[position + index][:dimensions], velocity=velocity)
+            if last is None:
+                break
+            end = points[last]
+            if abs(normal[2]) > 1.0 - 1e-9 and np.ptp(points[first:last + 1, 2]) <= self.tolerance:
+                # Arc in the XY plane: the sign of the normal gives the direction.
+                clockwise = normal[2] < 0
+                yield circular_segment(center[:2], end[:2], clockwise, velocity)
+            else:
+                yield circular_3d_segment(points[(first + last) // 2][:3], end[:3], velocity)
+            position = last
+
+    def flush(self, run, velocity):
+        if len(run) > 1:
+            for segment in self.compact_run(np.array(run), velocity):
+                self.output_count += 1
+                yield segment
+
+    def segments(self, lines):
+        """Yield lookahead segments for the G-code lines."""
+        dimensions = len(self.axis_letters)
+        self.reset()
+        run = [self.position.copy()]
+        run_velocity = None
+        for move in self.parse(lines):
+            if move[0] == 'line' and (len(run) == 1 or move[2] == run_velocity):
+                run.append(move[1])
+                run_velocity = move[2]
+                if len(run) > self.chunk_points:
+                    yield from self.flush(run, run_velocity)
+                    run = [run[-1]]
+                continue
+
+            yield from self.flush(run, run_velocity)
+            run = [run[-1]]
+            if move[0] == 'line':
+                run.append(move[1])
+                run_velocity = move[2]
+                continue
+
+            self.output_count += 1
+            if move[0] == 'rapid':
+                yield linear_segment(move[1][:dimensions], velocity=move[2])
+                run = [move[1]]
+            elif move[0] == 'arc':
+                yield circular_segment(move[2][:2], move[1][:2], move[3], move[4])
+                run = [move[1]]
+            else:
+                yield sleep_segment(move[1])
+        yield from self.flush(run, run_velocity)
+
+    def reduction_ratio(self):
+        """Return the fraction of input moves removed by merging and arc fitting."""
+        return 1.0 - self.output_count / self.input_count if self.input_count else 0.0
+
+    def parse_throughput(self):
+        """Return the parsed G-code lines per second of parse time."""
+        return self.line_count / self.parse_seconds if self.parse_seconds > 0 else 0.0
@@ -0,0 +1,191 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+
+# Import Python libraries
+import numpy as np
+
+from collections import OrderedDict
+
+# Constants
+DEFAULT_PROFILE_CACHE_SIZE = 256
+
+# Profile fields in the order used for cache keys
+PROFILE_FIELDS = (
+    'type', 'velocity', 'acc', 'dec', 'jerkAcc', 'jerkDec', 'jerkAccRatio', 'jerkDecRatio',
+    'accTimeMilliseconds', 'decTimeMilliseconds', 'startingVelocity', 'endVelocity',
+    'secondVelocity', 'movingAverageTimeMilliseconds',
+)
+
+
+def profile_key(profile_fields):
+    """Return a hashable key for a dict of Profile fields. Missing fields count as 0."""
+    unknown = set(profile_fields) - set(PROFILE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown Profile fields: {sorted(unknown)}")
+    key = [profile_fields.get(name, 0) for name in PROFILE_FIELDS]
+    if 'type' not in profile_fields:
+        key[0] = ProfileType.Trapezoidal
+    return tuple(key)
+
+
+def profile_fields(key):
+    """Inverse of profile_key: return the dict of Profile fields for a key."""
+    return dict(zip(PROFILE_FIELDS, key))
+
+
+def make_profile(key):
+    """Build a Profile from a key returned by profile_key."""
+    profile = Profile()
+    for name, value in zip(PROFILE_FIELDS, key):
+        if value:
+            setattr(profile, name, value)
+    return profile
+
+
+class MotionCommandCache:
+    """
+    Caches prebuilt Profile objects and Motion command templates per profile, so a
+    command only needs its axis/target patched before it is sent.
+
+    Commands returned by pos_command() and linear_intpl_command() are shared
+    templates: use them (StartPos, StartMov, ...) before requesting the next command
+    with the same profile.
+    """
+    def __init__(self, max_profiles=DEFAULT_PROFILE_CACHE_SIZE):
+        self.max_profiles = max_profiles
+        self.profiles = OrderedDict()
+        self.pos_templates = OrderedDict()
+        self.linear_templates = OrderedDict()
+        self.pos_command_pool = []
+        self.linear_command_pool = []
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def _lookup(self, cache, key, factory):
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+            self.hit_count += 1
+            return value
+
+        self.miss_count += 1
+        value = factory()
+        cache[key] = value
+        if len(cache) > self.max_profiles:
+            cache.popitem(last=False)
+        return value
+
+    def get_profile(self, **profile_fields):
+        key = profile_key(profile_fields)
+        return self._lookup(self.profiles, key, lambda: make_profile(key))
+
+    def pos_command(self, axis, target, **profile_fields):
+        """Return the cached Motion_PosCommand for the profile with axis/target patched."""
+        key = profile_key(profile_fields)
+
+        def build():
+            command = Motion_PosCommand()
+            command.profile = self._lookup(self.profiles, key, lambda: make_profile(key))
+            return command
+
+        command = self._lookup(self.pos_templates, key, build)
+        command.axis = axis
+        command.target = target
+        return command
+
+    def linear_intpl_command(self, axes, targets, **profile_fields):
+        """Return the cached Motion_LinearIntplCommand for the axes and profile with targets patched."""
+        axes = tuple(axes)
+        key = (axes, profile_key(profile_fields))
+
+        def build():
+            command = Motion_LinearIntplCommand()
+            command.axisCount = len(axes)
+            for index, axis in enumerate(axes):
+                command.SetAxis(index, axis)
+            command.profile = self._lookup(self.profiles, key[1], lambda: make_profile(key[1]))
+            return command
+
+        command = self._lookup(self.linear_templates, key, build)
+        for index, target in enumerate(targets):
+            command.SetTarget(index, target)
+        return command
+
+    def _pooled(self, pool, count, factory):
+        while len(pool) < count:
+            pool.append(factory())
+        return pool[:count]
+
+    def _batch_profiles(self, count, velocities, accs, decs, profile_fields):
+        """Return one cached Profile per command, built once per distinct (velocity, acc, dec)."""
+        columns = []
+        for name, values in (('velocity', velocities), ('acc', accs), ('dec', decs)):
+            if values is not None:
+                columns.append((name, np.broadcast_to(np.asarray(values, dtype=np.float64), (count,))))
+        if not columns:
+            profile = self.get_profile(**profile_fields)
+            return [profile] * count
+
+        stacked = np.stack([values for _, values in columns], axis=1)
+        unique_rows, inverse = np.unique(stacked, axis=0, return_inverse=True)
+        unique_profiles = []
+        for row in unique_rows.tolist():
+            fields = dict(profile_fields)
+            fields.update((name, value) for (name, _), value in zip(columns, row))
+            unique_profiles.append(self.get_profile(**fields))
+        return [unique_profiles[index] for index in inverse.reshape(-1).tolist()]
+
+    def build_pos_commands(self, axes, targets, velocities=None, accs=None, decs=None,
+                           reuse=True, **profile_fields):
+        """
+        Fill Motion_PosCommand objects from NumPy arrays in one pass. axes, velocities,
+        accs and decs may be scalars or arrays broadcastable to targets.
+
+        With reuse=True the commands come from an internal pool and are overwritten
+        by the next call.
+        """
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1)
+        count = targets.size
+        axes = np.broadcast_to(np.asarray(axes, dtype=np.int64), (count,)).tolist()
+        profiles = self._batch_profiles(count, velocities, accs, decs, profile_fields)
+
+        if reuse:
+            commands = self._pooled(self.pos_command_pool, count, Motion_PosCommand)
+        else:
+            commands = [Motion_PosCommand() for _ in range(count)]
+
+        for command, axis, target, profile in zip(commands, axes, targets.tolist(), profiles):
+            command.axis = axis
+            command.target = target
+            command.profile = profile
+        return commands
+
+    def build_linear_intpl_commands(self, axes, targets, velocities=None, accs=None, decs=None,
+                                    reuse=True, **profile_fields):
+        """
+        Fill Motion_LinearIntplCommand objects from a (points x axes) target array in one pass.
+        """
+        axes = list(axes)
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, len(axes))
+        count = targets.shape[0]
+        profiles = self._batch_profiles(count, velocities, accs, decs, profile_fields)
+
+        if reuse:
+            commands = self._pooled(self.linear_command_pool, count, Motion_LinearIntplCommand)
+        else:
+            commands = [Motion_LinearIntplCommand() for _ in range(count)]
+
+        for command, row, profile in zip(commands, targets.tolist(), profiles):
+            command.axisCount = len(axes)
+            for index, (axis, target) in enumerate(zip(axes, row)):
+                command.SetAxis(index, axis)
+                command.SetTarget(index, target)
+            command.profile = profile
+        return commands
+
+    def clear(self):
+        self.profiles.clear()
+        self.pos_templates.clear()
+        self.linear_templates.clear()
+        self.pos_command_pool.clear()
+        self.linear_command_pool.clear()
@@ -0,0 +1,437 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+from WMX3UtilPython import check_errorcode
+
+from WMX3MotionPython import PROFILE_FIELDS
+
+# Import Python libraries
+import numpy as np
+
+from collections import OrderedDict
+from time import monotonic
+
+# Constants
+BISECTION_ITERATIONS = 64
+DEFAULT_SIMULATION_CACHE_SIZE = 4096
+
+# Profile types evaluated by ProfileSimulation
+SUPPORTED_PROFILE_TYPES = ('Trapezoidal', 'SCurve', 'JerkRatio', 'JerkLimited')
+
+
+def _ramp(delta_v, max_acc, jerk, jerk_ratio):
+    """
+    Vectorized timing of a velocity change of delta_v (>= 0).
+
+    Each move uses either a fixed jerk (jerk > 0, JerkLimited) or a fixed jerk ratio
+    (0 <= jerk_ratio <= 1, Trapezoidal/SCurve/JerkRatio). Returns the peak acceleration,
+    the duration of each jerk segment and the duration of the constant-acceleration segment.
+    """
+    delta_v = np.maximum(delta_v, 0.0)
+    use_jerk = jerk > 0
+
+    # Fixed jerk ratio: jerk time is jerk_ratio of the total ramp time.
+    total = np.divide(delta_v, max_acc * (1.0 - jerk_ratio / 2.0),
+                      out=np.zeros_like(delta_v), where=max_acc > 0)
+    ratio_jerk_time = jerk_ratio * total / 2.0
+    ratio_const_time = total - 2.0 * ratio_jerk_time
+
+    # Fixed jerk: the acceleration limit is only reached for large velocity changes.
+    safe_jerk = np.where(use_jerk, jerk, 1.0)
+    reaches_max = delta_v * safe_jerk >= max_acc * max_acc
+    peak_acc = np.where(reaches_max, max_acc, np.sqrt(delta_v * safe_jerk))
+    jerk_jerk_time = peak_acc / safe_jerk
+    jerk_const_time = np.where(reaches_max,
+                               np.divide(delta_v, max_acc, out=np.zeros_like(delta_v), where=max_acc > 0)
+                               - max_acc / safe_jerk, 0.0)
+
+    peak_acc = np.where(use_jerk, peak_acc, max_acc)
+    jerk_time = np.where(use_jerk, jerk_jerk_time, ratio_jerk_time)
+    const_time = np.where(use_jerk, jerk_const_time, ratio_const_time)
+    return peak_acc, jerk_time, const_time
+
+
+def _ramp_increment(tau, peak_acc, jerk_time, const_time):
+    """Velocity and distance gained (relative to the start velocity) at local time tau of a ramp."""
+    duration = 2.0 * jerk_time + const_time
+    tau = np.clip(tau, 0.0, duration)
+    jerk = np.divide(peak_acc, jerk_time, out=np.zeros_like(peak_acc * jerk_time), where=jerk_time > 0)
+
+    v1 = 0.5 * jerk * jerk_time ** 2
+    s1 = jerk * jerk_time ** 3 / 6.0
+    v2 = v1 + peak_acc * const_time
+    s2 = s1 + v1 * const_time + 0.5 * peak_acc * const_time ** 2
+    dv_total = v2 + v1
+
+    # Segment 1: increasing acceleration
+    t = tau
+    dv_a = 0.5 * jerk * t ** 2
+    ds_a = jerk * t ** 3 / 6.0
+    # Segment 2: constant acceleration
+    t = tau - jerk_time
+    dv_b = v1 + peak_acc * t
+    ds_b = s1 + v1 * t + 0.5 * peak_acc * t ** 2
+    # Segment 3: decreasing acceleration
+    t = tau - jerk_time - const_time
+    dv_c = v2 + peak_acc * t - 0.5 * jerk * t ** 2
+    ds_c = s2 + v2 * t + 0.5 * peak_acc * t ** 2 - jerk * t ** 3 / 6.0
+
+    in_a = tau < jerk_time
+    in_b = ~in_a & (tau < jerk_time + const_time)
+    dv = np.where(in_a, dv_a, np.where(in_b, dv_b, dv_c))
+    ds = np.where(in_a, ds_a, np.where(in_b, ds_b, ds_c))
+    dv = np.where(tau >= duration, dv_total, dv)
+    return dv, ds
+
+
+class ProfileSimulation:
+    """
+    Offline NumPy model of single-axis position profiles, evaluated for many moves at once.
+
+    All arguments are scalars or arrays broadcastable to the number of moves. Units follow
+    the engine: positions in user units, velocities in units/s, accelerations in units/s^2,
+    jerks in units/s^3 and times in milliseconds. Starting and end velocities are taken in
+    the direction of motion.
+
+    The timing outputs mirror Motion.SimulatePos (peak velocity, total, acceleration,
+    cruise and deceleration times). Moves that cannot reach endVelocity within the
+    distance are flagged in feasible.
+    """
+    def __init__(self, start_pos, target, profile_type, velocity, acc, dec,
+                 jerk_acc=0.0, jerk_dec=0.0, jerk_acc_ratio=0.0, jerk_dec_ratio=0.0,
+                 starting_velocity=0.0, end_velocity=0.0):
+        start_pos, target, profile_type, velocity, acc, dec, jerk_acc, jerk_dec, \
+            jerk_acc_ratio, jerk_dec_ratio, starting_velocity, end_velocity = np.broadcast_arrays(
+                *[np.asarray(value, dtype=np.float64).reshape(-1) for value in (
+                    start_pos, target, profile_type, velocity, acc, dec, jerk_acc, jerk_dec,
+                    jerk_acc_ratio, jerk_dec_ratio, starting_velocity, end_velocity)])
+
+        profile_type = profile_type.astype(np.int64)
+        known = np.zeros(profile_type.shape, dtype=bool)
+        for name in SUPPORTED_PROFILE_TYPES:
+            known |= profile_type == getattr(ProfileType, name)
+        if not np.all(known):
+            raise ValueError(f"Only {', '.join(SUPPORTED_PROFILE_TYPES)} profiles can be simulated offline")
+
+        # Map every profile type onto (jerk, jerk ratio) pairs for the acc and dec ramps.
+        is_trapezoidal = profile_type == ProfileType.Trapezoidal
+        is_scurve = profile_type == ProfileType.SCurve
+        is_jerk_limited = profile_type == ProfileType.JerkLimited
+        self.acc_jerk = np.where(is_jerk_limited, jerk_acc, 0.0)
+        self.dec_jerk = np.where(is_jerk_limited, jerk_dec, 0.0)
+        self.acc_ratio = np.where(is_scurve, 1.0, np.where(is_trapezoidal | is_jerk_limited, 0.0, jerk_acc_ratio))
+        self.dec_ratio = np.where(is_scurve, 1.0, np.where(is_trapezoidal | is_jerk_limited, 0.0, jerk_dec_ratio))
+
+        self.start_pos = start_pos
+        self.direction = np.where(target >= start_pos, 1.0, -1.0)
+        self.distance = np.abs(target - start_pos)
+        self.acc = acc
+        self.dec = dec
+        self.starting_velocity = starting_velocity
+        self.end_velocity = end_velocity
+        self.max_velocity = velocity
+
+        self._solve_peak_velocity()
+
+    def _ramps(self, peak_velocity):
+        acc_ramp = _ramp(np.abs(peak_velocity - self.starting_velocity),
+                         np.where(peak_velocity >= self.starting_velocity, self.acc, self.dec),
+                         self.acc_jerk, self.acc_ratio)
+        dec_ramp = _ramp(np.abs(peak_velocity - self.end_velocity), self.dec, self.dec_jerk, self.dec_ratio)
+        acc_distance = 0.5 * (self.starting_velocity + peak_velocity) * (2.0 * acc_ramp[1] + acc_ramp[2])
+        dec_distance = 0.5 * (self.end_velocity + peak_velocity) * (2.0 * dec_ramp[1] + dec_ramp[2])
+        return acc_ramp, dec_ramp, acc_distance + dec_distance
+
+    def _solve_peak_velocity(self):
+        _, _, ramp_distance = self._ramps(self.max_velocity)
+        short = ramp_distance > self.distance
+
+        # Bisection on the peak velocity for moves too short to reach the commanded velocity.
+        low = np.maximum(self.starting_velocity, self.end_velocity)
+        low = np.minimum(low, self.max_velocity)
+        _, _, low_distance = self._ramps(low)
+        self.feasible = ~short | (low_distance <= self.distance * (1.0 + 1e-9))
+
+        peak_velocity = self.max_velocity.copy()
+        if np.any(short):
+            high = self.max_velocity.copy()
+            low_bound = low.copy()
+            for _ in range(BISECTION_ITERATIONS):
+                middle = 0.5 * (low_bound + high)
+                _, _, middle_distance = self._ramps(middle)
+                too_long = middle_distance > self.distance
+                high = np.where(too_long, middle, high)
+                low_bound = np.where(too_long, low_bound, middle)
+            peak_velocity = np.where(short, low_bound, self.max_velocity)
+
+        self.peak_velocity = peak_velocity
+        self.acc_ramp, self.dec_ramp, ramp_distance = self._ramps(peak_velocity)
+        self.acc_time = 2.0 * self.acc_ramp[1] + self.acc_ramp[2]
+        self.dec_time = 2.0 * self.dec_ramp[1] + self.dec_ramp[2]
+        self.cruise_time = np.divide(np.maximum(self.distance - ramp_distance, 0.0), peak_velocity,
+                                     out=np.zeros_like(peak_velocity), where=peak_velocity > 0)
+        self.acc_distance = 0.5 * (self.starting_velocity + peak_velocity) * self.acc_time
+
+    @property
+    def total_time_milliseconds(self):
+        return (self.acc_time + self.cruise_time + self.dec_time) * 1000.0
+
+    @property
+    def acc_time_milliseconds(self):
+        return self.acc_time * 1000.0
+
+    @property
+    def cruise_time_milliseconds(self):
+        return self.cruise_time * 1000.0
+
+    @property
+    def dec_time_milliseconds(self):
+        return self.dec_time * 1000.0
+
+    def pos_at_time(self, time_milliseconds):
+        """
+        Return (position, velocity) at the given times. time_milliseconds is either a 1-D
+        grid shared by all moves (result shape: moves x times) or a (moves x times) array.
+        Times after the end of a move hold the target position and the end velocity.
+        """
+        t = np.asarray(time_milliseconds, dtype=np.float64) / 1000.0
+        if t.ndim <= 1:
+            t = np.broadcast_to(t.reshape(1, -1), (self.distance.size, t.size))
+        column = lambda values: values[:, None]
+
+        acc_sign = column(np.where(self.peak_velocity >= self.starting_velocity, 1.0, -1.0))
+        dec_sign = column(np.where(self.peak_velocity >= self.end_velocity, 1.0, -1.0))
+        acc_ramp = [column(values) for values in self.acc_ramp]
+        dec_ramp = [column(values) for values in self.dec_ramp]
+        v0 = column(self.starting_velocity)
+        vp = column(self.peak_velocity)
+        t1 = column(self.acc_time)
+        t2 = t1 + column(self.cruise_time)
+        total_time = t2 + column(self.dec_time)
+
+        dv, ds = _ramp_increment(t, *acc_ramp)
+        velocity = v0 + acc_sign * dv
+        position = v0 * np.minimum(t, t1) + acc_sign * ds
+
+        cruising = t > t1
+        cruise_elapsed = np.clip(t - t1, 0.0, t2 - t1)
+        position = np.where(cruising, column(self.acc_distance) + vp * cruise_elapsed, position)
+        velocity = np.where(cruising, vp, velocity)
+
+        decelerating = t > t2
+        dec_elapsed = np.clip(t - t2, 0.0, total_time - t2)
+        dv, ds = _ramp_increment(dec_elapsed, *dec_ramp)
+        dec_start = column(self.acc_distance) + vp * (t2 - t1)
+        position = np.where(decelerating, dec_start + vp * dec_elapsed - dec_sign * ds, position)
+        velocity = np.where(decelerating, vp - dec_sign * dv, velocity)
+
+        direction = column(self.direction)
+        position = column(self.start_pos) + direction * np.where(t < 0, 0.0, position)
+        velocity = direction * np.where(t < 0, 0.0, velocity)
+        return position, velocity
+
+    def time_at_pos(self, pos):
+        """
+        Return (move time, remaining time) in milliseconds at which each move first reaches
+        pos (one position per move). Positions outside the move return NaN.
+        """
+        pos = np.broadcast_to(np.asarray(pos, dtype=np.float64).reshape(-1), self.distance.shape)
+        travelled = (pos - self.start_pos) * self.direction
+        total = self.total_time_milliseconds
+        outside = (travelled < 0) | (travelled > self.distance)
+
+        low = np.zeros_like(total)
+        high = total.copy()
+        for _ in range(BISECTION_ITERATIONS):
+            middle = 0.5 * (low + high)
+            position, _ = self.pos_at_time(middle[:, None])
+            reached = (position[:, 0] - self.start_pos) * self.direction >= travelled
+            high = np.where(reached, middle, high)
+            low = np.where(reached, low, middle)
+
+        move_time = np.where(outside, np.nan, high)
+        return move_time, total - move_time
+
+
+def simulation_from_commands(commands, start_positions):
+    """Build a ProfileSimulation from Motion_PosCommand objects and their start positions."""
+    fields = {name: [] for name in ('target', 'type', 'velocity', 'acc', 'dec', 'jerkAcc', 'jerkDec',
+                                    'jerkAccRatio', 'jerkDecRatio', 'startingVelocity', 'endVelocity')}
+    for command in commands:
+        fields['target'].append(command.target)
+        profile = command.profile
+        for name in fields:
+            if name != 'target':
+                fields[name].append(getattr(profile, name))
+
+    return ProfileSimulation(start_positions, fields['target'], fields['type'], fields['velocity'],
+                             fields['acc'], fields['dec'], fields['jerkAcc'], fields['jerkDec'],
+                             fields['jerkAccRatio'], fields['jerkDecRatio'],
+                             fields['startingVelocity'], fields['endVelocity'])
+
+
+def compare_with_engine(motion, commands, start_positions, time_milliseconds, return_type=0, error_queue=None):
+    """
+    Evaluate the commands with the engine (Motion.SimulatePos/SimulatePosAtTime) and with
+    ProfileSimulation, and return the largest absolute differences of total time and position.
+    """
+    simulation = simulation_from_commands(commands, start_positions)
+    offline_pos, _ = simulation.pos_at_time(time_milliseconds)
+    offline_total = simulation.total_time_milliseconds
+
+    engine_total = np.zeros(len(commands))
+    engine_pos = np.zeros_like(offline_pos)
+    calculated_pos = doublep()
+    calculated_vel = doublep()
+    for index, (command, start_pos) in enumerate(zip(commands, np.broadcast_to(start_positions, (len(commands),)))):
+        simulate_command = Motion_SimulatePosCommand()
+        simulate_command.posCommand = command
+        simulate_command.setStartPos = 1
+        simulate_command.startPos = float(start_pos)
+
+        ret, _, total, _, _, _ = motion.SimulatePos(simulate_command)
+        if ret != ErrorCode.PyNone:
+            check_errorcode("SimulatePos during compare_with_engine", ret, error_queue)
+        engine_total[index] = total
+
+        for time_index, time_value in enumerate(np.asarray(time_milliseconds, dtype=np.float64).tolist()):
+            ret = motion.SimulatePosAtTime(simulate_command, return_type, time_value, calculated_pos, calculated_vel)
+            if ret != ErrorCode.PyNone:
+                check_errorcode("SimulatePosAtTime during compare_with_engine", ret, error_queue)
+            engine_pos[index, time_index] = calculated_pos.value()
+
+    return {
+        'max_total_time_error': float(np.max(np.abs(engine_total - offline_total))) if len(commands) else 0.0,
+        'max_position_error': float(np.max(np.abs(engine_pos - offline_pos))) if len(commands) else 0.0,
+    }
+
+
+def profile_struct_key(profile):
+    return tuple(getattr(profile, name) for name in PROFILE_FIELDS)
+
+
+def simulate_pos_command_key(simulate_command):
+    """Return a canonical, hashable key for the contents of a Motion_SimulatePosCommand."""
+    pos_command = simulate_command.posCommand
+    return (pos_command.axis, pos_command.target, profile_struct_key(pos_command.profile),
+            simulate_command.setStartPos, simulate_command.startPos if simulate_command.setStartPos else None)
+
+
+def simulate_linear_intpl_command_key(simulate_command):
+    """Return a canonical, hashable key for the contents of a Motion_SimulateLinearIntplCommand."""
+    command = simulate_command.linearIntplCommand
+    axes = []
+    for index in range(command.axisCount):
+        set_start_pos = simulate_command.GetSetStartPos(index)
+        axes.append((command.GetAxis(index), command.GetTarget(index),
+                     command.GetMaxVelocity(index), command.GetMaxAcc(index), command.GetMaxDec(index),
+                     command.GetMaxJerkAcc(index), command.GetMaxJerkDec(index),
+                     set_start_pos, simulate_command.GetStartPos(index) if set_start_pos else None))
+    return (tuple(axes), profile_struct_key(command.profile))
+
+
+class SimulationCache:
+    """
+    Memoizes engine-side Motion simulation queries (SimulatePos, SimulatePosAtTime,
+    SimulateTimeAtPos, SimulateLinearIntplPos, SimulatePosAtTime_LinearIntpl and
+    SimulateTimeAtDist_LinearIntpl) by the contents of the command structs.
+
+    Entries are evicted least-recently-used beyond max_size and expire after ttl seconds
+    (ttl=None keeps them until evicted). Failed queries are never cached. Return values
+    have the same layout as Motion.SimulatePos/SimulateLinearIntplPos: the error code first.
+    """
+    def __init__(self, motion, max_size=DEFAULT_SIMULATION_CACHE_SIZE, ttl=None):
+        self.motion = motion
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hit_count = 0
+        self.miss_count = 0
+        self.expired_count = 0
+
+    def _cached(self, key, query):
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            if self.ttl is None or monotonic() - stored_at <= self.ttl:
+                self.entries.move_to_end(key)
+                self.hit_count += 1
+                return value
+            del self.entries[key]
+            self.expired_count += 1
+
+        self.miss_count += 1
+        value = query()
+        if value[0] == ErrorCode.PyNone:
+            self.entries[key] = (value, monotonic())
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return value
+
+    def SimulatePos(self, simulate_command):
+        key = ('SimulatePos', simulate_pos_command_key(simulate_command))
+        return self._cached(key, lambda: self.motion.SimulatePos(simulate_command))
+
+    def SimulateLinearIntplPos(self, simulate_command):
+        key = ('SimulateLinearIntplPos', simulate_linear_intpl_command_key(simulate_command))
+        return self._cached(key, lambda: self.motion.SimulateLinearIntplPos(simulate_command))
+
+    def SimulatePosAtTime(self, simulate_command, return_type, time_milliseconds):
+        """Return (ret, calculatedPos, calculatedVel)."""
+        def query():
+            calculated_pos = doublep()
+            calculated_vel = doublep()
+            ret = self.motion.SimulatePosAtTime(simulate_command, return_type, time_milliseconds,
+                                                calculated_pos, calculated_vel)
+            return ret, calculated_pos.value(), calculated_vel.value()
+
+        key = ('SimulatePosAtTime', simulate_pos_command_key(simulate_command), return_type, time_milliseconds)
+        return self._cached(key, query)
+
+    def SimulateTimeAtPos(self, simulate_command, specific_pos):
+        """Return (ret, moveTimeMilliseconds, remainTimeMilliseconds)."""
+        def query():
+            move_time = doublep()
+            remain_time = doublep()
+            ret = self.motion.SimulateTimeAtPos(simulate_command, specific_pos, move_time, remain_time)
+            return ret, move_time.value(), remain_time.value()
+
+        key = ('SimulateTimeAtPos', simulate_pos_command_key(simulate_command), specific_pos)
+        return self._cached(key, query)
+
+    def SimulatePosAtTime_LinearIntpl(self, simulate_command, time_milliseconds):
+        """Return (ret, positions, moveDistance, remainDistance, totalDistance)."""
+        def query():
+            axis_count = simulate_command.linearIntplCommand.axisCount
+            positions = doubleArray(constants.maxAxes)
+            move_distance = doublep()
+            remain_distance = doublep()
+            total_distance = doublep()
+            ret = self.motion.SimulatePosAtTime_LinearIntpl(simulate_command, time_milliseconds, positions,
+                                                            move_distance, remain_distance, total_distance)
+            return (ret, tuple(positions[index] for index in range(axis_count)),
+                    move_distance.value(), remain_distance.value(), total_distance.value())
+
+        key = ('SimulatePosAtTime_LinearIntpl', simulate_linear_intpl_command_key(simulate_command),
+               time_milliseconds)
+        return self._cached(key, query)
+
+    def SimulateTimeAtDist_LinearIntpl(self, simulate_command, specific_distance):
+        """Return (ret, moveTimeMilliseconds, remainTimeMilliseconds, totalTimeMilliseconds)."""
+        def query():
+            move_time = doublep()
+            remain_time = doublep()
+            total_time = doublep()
+            ret = self.motion.SimulateTimeAtDist_LinearIntpl(simulate_command, specific_distance,
+                                                             move_time, remain_time, total_time)
+            return ret, move_time.value(), remain_time.value(), total_time.value()
+
+        key = ('SimulateTimeAtDist_LinearIntpl', simulate_linear_intpl_command_key(simulate_command),
+               specific_distance)
+        return self._cached(key, query)
+
+    def hit_rate(self):
+        total = self.hit_count + self.miss_count
+        return self.hit_count / total if total else 0.0
+
+    def clear(self):
+        self.entries.clear()
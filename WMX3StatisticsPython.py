@@ -0,0 +1,300 @@
+# Import WMX3 API library
+from WMX3ApiPython import *
+from WMX3UtilPython import check_errorcode
+
+# Import Python libraries
+import numpy as np
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic
+
+# Constants
+DEFAULT_STATISTICS_CAPACITY = 4096
+DEFAULT_SAMPLE_INTERVAL = 0.1
+DEFAULT_METRICS_PORT = 9464
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# Column name -> dtype of every sampled value. Counters are kept as integers so the
+# derived rates stay exact, timings are stored as float32 to keep the buffer compact.
+DEVICE_STATISTICS_COLUMNS = {
+    'sysFailedCount': np.uint32,
+    'apiSuccessCount': np.uint32,
+    'apiFailedCount': np.uint32,
+    'curApiTime': np.float32,
+    'avgApiTime': np.float32,
+    'maxApiTime': np.float32,
+    'rtCount': np.uint32,
+    'curRtTime': np.float32,
+    'avgRtTime': np.float32,
+    'maxRtTime': np.float32,
+    'curFuncProcTime': np.float32,
+    'avgFuncProcTime': np.float32,
+    'maxFuncProcTime': np.float32,
+}
+ENGINE_STATUS_COLUMNS = {
+    'cycleTimeMicroseconds': np.float32,
+    'cycleCounter': np.int64,
+}
+ECAT_STATISTICS_COLUMNS = {
+    'overCycle': np.uint32,
+    'packetLoss': np.uint32,
+    'packetTimeout': np.uint32,
+    'txDelay': np.float32,
+    'maxTxDelay': np.float32,
+}
+# Monotonic counts, exported as OpenMetrics counters; every other value is a gauge.
+OPENMETRICS_COUNTERS = ('sysFailedCount', 'apiSuccessCount', 'apiFailedCount', 'rtCount', 'cycleCounter',
+                        'overCycle', 'packetLoss', 'packetTimeout', 'errorCount')
+
+
+class StatisticsRingBuffer:
+    """
+    Fixed-capacity columnar ring buffer. Each column is a preallocated NumPy array,
+    so appending a sample is a handful of scalar stores and never allocates.
+    """
+    def __init__(self, columns, capacity=DEFAULT_STATISTICS_CAPACITY):
+        self.capacity = capacity
+        self.columns = {'timestamp': np.zeros(capacity, dtype=np.float64)}
+        for name, dtype in columns.items():
+            self.columns[name] = np.zeros(capacity, dtype=dtype)
+        self.write_index = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, timestamp, values):
+        with self.lock:
+            index = self.write_index
+            self.columns['timestamp'][index] = timestamp
+            for name, value in values.items():
+                self.columns[name][index] = value
+            self.write_index = (index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self, name):
+        data = self.columns[name]
+        if self.count < self.capacity:
+            return data[:self.count].copy()
+        return np.roll(data, -self.write_index)
+
+    def column(self, name):
+        """Return a copy of the column in chronological order."""
+        with self.lock:
+            return self.ordered(name)
+
+    def columns_snapshot(self, *names):
+        """Return copies of several columns taken under one lock, so their rows line up."""
+        with self.lock:
+            return tuple(self.ordered(name) for name in names)
+
+    def latest(self):
+        """Return the most recent sample as a dict, or None if the buffer is empty."""
+        with self.lock:
+            if self.count == 0:
+                return None
+            index = (self.write_index - 1) % self.capacity
+            return {name: data[index].item() for name, data in self.columns.items()}
+
+    def clear(self):
+        with self.lock:
+            self.write_index = 0
+            self.count = 0
+
+
+class StatisticsCollector:
+    """
+    Samples DeviceStatistics, EngineStatus and (optionally) EcMasterStatisticsInfo
+    from a background thread and keeps them in a StatisticsRingBuffer.
+    """
+    def __init__(self, wmx3_api, ecat=None, interval=DEFAULT_SAMPLE_INTERVAL,
+                 capacity=DEFAULT_STATISTICS_CAPACITY, error_queue=None):
+        self.wmx3_api = wmx3_api
+        self.ecat = ecat
+        self.interval = interval
+        self.error_queue = error_queue
+        self.error_count = 0
+
+        columns = dict(DEVICE_STATISTICS_COLUMNS)
+        columns.update(ENGINE_STATUS_COLUMNS)
+        if ecat is not None:
+            columns.update(ECAT_STATISTICS_COLUMNS)
+        self.buffer = StatisticsRingBuffer(columns, capacity)
+
+        self.stop_event = threading.Event()
+        self.sampler_thread = None
+
+    def sample(self):
+        """Read all statistic sources once and append them to the ring buffer."""
+        timestamp = monotonic()
+        values = {}
+
+        ret, device_statistics = self.wmx3_api.GetStatistic()
+        if ret != ErrorCode.PyNone:
+            check_errorcode("GetStatistic during sample", ret, self.error_queue)
+        for name in DEVICE_STATISTICS_COLUMNS:
+            values[name] = getattr(device_statistics, name)
+
+        ret, engine_status = self.wmx3_api.GetEngineStatus()
+        if ret != ErrorCode.PyNone:
+            check_errorcode("GetEngineStatus during sample", ret, self.error_queue)
+        # Only the first (main) interrupt is reported.
+        interrupt = engine_status.interrupts
+        values['cycleTimeMicroseconds'] = interrupt.cycleTimeMicroseconds
+        values['cycleCounter'] = interrupt.cycleCounter
+
+        if self.ecat is not None:
+            ret, master_info = self.ecat.GetMasterInfo()
+            if ret != ErrorCode.PyNone:
+                check_errorcode("GetMasterInfo during sample", ret, self.error_queue)
+            statistics_info = master_info.statisticsInfo
+            for name in ECAT_STATISTICS_COLUMNS:
+                values[name] = getattr(statistics_info, name)
+
+        self.buffer.append(timestamp, values)
+
+    def sample_task(self):
+        """Worker thread that samples at a fixed interval until stopped."""
+        next_time = monotonic()
+        while not self.stop_event.is_set():
+            try:
+                self.sample()
+            except RuntimeError:
+                # check_errorcode has already reported the error; skip this sample.
+                self.error_count += 1
+
+            next_time += self.interval
+            delay = next_time - monotonic()
+            if delay > 0:
+                self.stop_event.wait(delay)
+            else:
+                # Sampling fell behind; resynchronize instead of bursting.
+                next_time = monotonic()
+
+    def start(self):
+        """Enable device statistics and start the sampler thread."""
+        ret = self.wmx3_api.SetStatistic(1)
+        if ret != ErrorCode.PyNone:
+            check_errorcode("SetStatistic", ret, self.error_queue)
+
+        self.stop_event.clear()
+        self.sampler_thread = threading.Thread(target=self.sample_task, daemon=True)
+        self.sampler_thread.start()
+
+    def stop(self):
+        """Stop the sampler thread. Collected samples stay in the buffer."""
+        self.stop_event.set()
+        if self.sampler_thread and self.sampler_thread.is_alive():
+            self.sampler_thread.join()
+        self.sampler_thread = None
+
+    def api_calls_per_second(self):
+        """Return the API call rate between consecutive samples."""
+        timestamps, success, failed = self.buffer.columns_snapshot('timestamp', 'apiSuccessCount', 'apiFailedCount')
+        calls = success.astype(np.int64) + failed.astype(np.int64)
+        if timestamps.size < 2:
+            return np.zeros((0,))
+        return np.diff(calls) / np.diff(timestamps)
+
+    def cycle_jitter(self):
+        """
+        Return the deviation (in microseconds) of the measured cycle period from the
+        configured cycle time, estimated from cycleCounter progress between samples.
+        """
+        timestamps, cycles, nominal = self.buffer.columns_snapshot('timestamp', 'cycleCounter', 'cycleTimeMicroseconds')
+        if timestamps.size < 2:
+            return np.zeros((0,))
+
+        elapsed_cycles = np.diff(cycles)
+        valid = elapsed_cycles > 0
+        period = np.diff(timestamps)[valid] * 1e6 / elapsed_cycles[valid]
+        return period - nominal[1:][valid]
+
+    def jitter_distribution(self, percentiles=(50, 90, 99, 100)):
+        """Return {percentile: jitter} for the collected samples."""
+        jitter = np.abs(self.cycle_jitter())
+        if jitter.size == 0:
+            return {p: 0.0 for p in percentiles}
+        return dict(zip(percentiles, np.percentile(jitter, percentiles).tolist()))
+
+    def summary(self):
+        """Return the latest sample together with the derived rates."""
+        latest = self.buffer.latest()
+        if latest is None:
+            return {}
+        rates = self.api_calls_per_second()
+        latest['apiCallsPerSecond'] = float(rates[-1]) if rates.size else 0.0
+        latest['jitter'] = self.jitter_distribution()
+        latest['errorCount'] = self.error_count
+        return latest
+
+    def to_openmetrics(self, prefix='wmx3'):
+        """
+        Render the latest sample and derived rates in the OpenMetrics text format.
+        Counters get a _total sample; the cycle jitter percentiles of the buffered
+        samples are one gauge with a percentile label.
+        """
+        summary = self.summary()
+        lines = []
+        if summary:
+            for name, value in summary.items():
+                if name in ('timestamp', 'jitter'):
+                    continue
+                metric = f'{prefix}_{name}'
+                if name in OPENMETRICS_COUNTERS:
+                    lines.append(f'# TYPE {metric} counter')
+                    lines.append(f'{metric}_total {value}')
+                else:
+                    lines.append(f'# TYPE {metric} gauge')
+                    lines.append(f'{metric} {value}')
+
+            metric = f'{prefix}_cycleJitterMicroseconds'
+            lines.append(f'# TYPE {metric} gauge')
+            for percentile, value in summary['jitter'].items():
+                lines.append(f'{metric}{{percentile="{percentile}"}} {value}')
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.collector.to_openmetrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep scrapes out of the console.
+        pass
+
+
+class MetricsExporter:
+    """
+    Serves StatisticsCollector.to_openmetrics() on http://<host>:<port>/metrics.
+    Binds to the loopback interface by default.
+    """
+    def __init__(self, collector, host='127.0.0.1', port=DEFAULT_METRICS_PORT):
+        self.collector = collector
+        self.host = host
+        self.port = port
+        self.server = None
+        self.server_thread = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), _MetricsRequestHandler)
+        self.server.collector = self.collector
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.server_thread:
+            self.server_thread.join()
+            self.server_thread = None
@@ -0,0 +1,282 @@
+# Import WMX3 API library
+import WMX3ApiPython
+from WMX3ApiPython import *
+
+# Import Python libraries
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from time import monotonic_ns
+
+# Constants
+DEFAULT_TRACE_CAPACITY = 65536
+DEFAULT_FLUSH_INTERVAL = 0.5
+TRACE_CATEGORY_API = 'api'
+TRACE_CATEGORY_MOTION = 'motion'
+TRACE_CATEGORY_MEMORY_LOG = 'memory_log'
+
+# Motion phases derived from CoreMotionAxisStatus
+PHASE_IDLE = None
+PHASE_ACC = 'acc'
+PHASE_CRUISE = 'cruise'
+PHASE_DEC = 'dec'
+
+# Thread ids of the per-axis motion tracks
+MOTION_TRACK_TID_BASE = 100000
+PLANNED_TRACK_TID_BASE = 200000
+
+
+def trace_timestamp():
+    """Return the trace clock in microseconds. The clock is shared by all processes."""
+    return monotonic_ns() // 1000
+
+
+def complete_event(name, category, start_us, duration_us, args=None, tid=None):
+    """Build a Chrome Trace Event Format "complete" (ph=X) event."""
+    event = {
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': start_us,
+        'dur': duration_us,
+        'pid': os.getpid(),
+        'tid': tid if tid is not None else threading.get_ident(),
+    }
+    if args:
+        event['args'] = args
+    return event
+
+
+class Tracer:
+    """
+    Collects Chrome Trace Event / Perfetto events in a bounded in-memory buffer.
+    When the buffer is full the oldest events are dropped and counted in dropped_count.
+    """
+    def __init__(self, capacity=DEFAULT_TRACE_CAPACITY):
+        self.events = deque(maxlen=capacity)
+        self.dropped_count = 0
+        self.enabled = True
+
+    def add_event(self, event):
+        if not self.enabled:
+            return
+        if len(self.events) == self.events.maxlen:
+            self.dropped_count += 1
+        self.events.append(event)
+
+    def extend(self, events):
+        for event in events:
+            self.add_event(event)
+
+    def complete(self, name, category, start_us, duration_us, args=None, tid=None):
+        self.add_event(complete_event(name, category, start_us, duration_us, args, tid))
+
+    def instant(self, name, category, args=None, tid=None):
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'i',
+            's': 't',
+            'ts': trace_timestamp(),
+            'pid': os.getpid(),
+            'tid': tid if tid is not None else threading.get_ident(),
+        }
+        if args:
+            event['args'] = args
+        self.add_event(event)
+
+    @contextmanager
+    def span(self, name, category=TRACE_CATEGORY_API, args=None):
+        start = trace_timestamp()
+        try:
+            yield
+        finally:
+            self.complete(name, category, start, trace_timestamp() - start, args)
+
+    def drain(self):
+        """Remove and return all buffered events."""
+        drained = []
+        while True:
+            try:
+                drained.append(self.events.popleft())
+            except IndexError:
+                return drained
+
+    def trace_object(self, obj, name=None):
+        """Return a TracedProxy that records a span for every API call made through obj."""
+        return TracedProxy(obj, self, name)
+
+    def save(self, file_path):
+        """Write all buffered events to file_path as a complete JSON trace."""
+        with open(file_path, 'w') as trace_file:
+            json.dump({'traceEvents': self.drain(), 'displayTimeUnit': 'ms'}, trace_file)
+
+
+class TracedProxy:
+    """
+    Wraps a WMX3 API proxy object (CoreMotion, Motion, Io, Log, ...) and records a
+    span for every API method call. Nested module objects such as
+    CoreMotion.motion are wrapped on first access.
+    """
+    def __init__(self, target, tracer, name=None):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_tracer', tracer)
+        object.__setattr__(self, '_name', name or type(target).__name__)
+        object.__setattr__(self, '_wrapped', {})
+
+    def __getattr__(self, attr):
+        wrapped = self._wrapped.get(attr)
+        if wrapped is not None:
+            return wrapped
+
+        value = getattr(self._target, attr)
+        if callable(value) and attr[:1].isupper():
+            wrapped = self._wrap_method(attr, value)
+        elif type(value).__module__ == WMX3ApiPython.__name__ and hasattr(value, 'IsDeviceValid'):
+            wrapped = TracedProxy(value, self._tracer, f'{self._name}.{attr}')
+        else:
+            return value
+
+        self._wrapped[attr] = wrapped
+        return wrapped
+
+    def __setattr__(self, attr, value):
+        setattr(self._target, attr, value)
+
+    def _wrap_method(self, attr, method):
+        tracer = self._tracer
+        span_name = f'{self._name}.{attr}'
+
+        def traced_method(*args, **kwargs):
+            start = trace_timestamp()
+            result = method(*args, **kwargs)
+            ret = result[0] if isinstance(result, tuple) else result
+            tracer.complete(span_name, TRACE_CATEGORY_API, start, trace_timestamp() - start,
+                            {'ret': ret} if isinstance(ret, int) and ret != ErrorCode.PyNone else None)
+            return result
+
+        return traced_method
+
+
+class MotionPhaseTracker:
+    """
+    Turns a stream of CoreMotionAxisStatus samples into motion phase spans.
+
+    Two tracks are produced per axis: the planned phases reported by the profile
+    (profileAccMilliseconds/profileCruiseMilliseconds/profileDecMilliseconds) when a
+    new motion starts, and the observed phases from accFlag/decFlag transitions.
+    """
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.current_phase = {}
+        self.phase_start = {}
+        self.planned_total = {}
+        self.named_axes = set()
+
+    def name_tracks(self, axis):
+        for tid, track_name in ((MOTION_TRACK_TID_BASE + axis, f'axis {axis}'),
+                                (PLANNED_TRACK_TID_BASE + axis, f'axis {axis} planned')):
+            self.tracer.add_event({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(),
+                                   'tid': tid, 'args': {'name': track_name}})
+        self.named_axes.add(axis)
+
+    @staticmethod
+    def phase_of(axis_status):
+        if axis_status.accFlag:
+            return PHASE_ACC
+        if axis_status.decFlag:
+            return PHASE_DEC
+        if axis_status.opState != OperationState.Idle and not axis_status.cmdDistributionEnd:
+            return PHASE_CRUISE
+        return PHASE_IDLE
+
+    def update(self, axis, axis_status, timestamp_us=None):
+        now = timestamp_us if timestamp_us is not None else trace_timestamp()
+        tid = MOTION_TRACK_TID_BASE + axis
+        if axis not in self.named_axes:
+            self.name_tracks(axis)
+
+        # A new profile was started: emit its planned phases on a separate track.
+        total = axis_status.profileTotalMilliseconds
+        completed = axis_status.profileCompletedMilliseconds
+        if total > 0 and total != self.planned_total.get(axis):
+            self.planned_total[axis] = total
+            start = now - int(completed * 1000)
+            args = {'target': axis_status.profileTargetPos, 'distance': axis_status.profileTotalDistance}
+            for phase, milliseconds in ((PHASE_ACC, axis_status.profileAccMilliseconds),
+                                        (PHASE_CRUISE, axis_status.profileCruiseMilliseconds),
+                                        (PHASE_DEC, axis_status.profileDecMilliseconds)):
+                if milliseconds > 0:
+                    duration = int(milliseconds * 1000)
+                    self.tracer.complete(f'planned {phase}', TRACE_CATEGORY_MOTION, start, duration,
+                                         args, PLANNED_TRACK_TID_BASE + axis)
+                    start += duration
+        elif total == 0:
+            self.planned_total.pop(axis, None)
+
+        phase = self.phase_of(axis_status)
+        previous = self.current_phase.get(axis, PHASE_IDLE)
+        if phase != previous:
+            if previous is not PHASE_IDLE:
+                start = self.phase_start[axis]
+                self.tracer.complete(previous, TRACE_CATEGORY_MOTION, start, now - start, None, tid)
+            self.current_phase[axis] = phase
+            self.phase_start[axis] = now
+
+    def update_status(self, coremotion_status, axes):
+        """Feed CoreMotionStatus for every axis in axes."""
+        now = trace_timestamp()
+        for axis in axes:
+            self.update(axis, coremotion_status.GetAxesStatus(axis), now)
+
+
+class TraceWriter:
+    """
+    Flushes a Tracer to a file from a background thread. Events are streamed in the
+    JSON Array Format, which Chrome and Perfetto load even if the file is not closed.
+    """
+    def __init__(self, tracer, file_path, interval=DEFAULT_FLUSH_INTERVAL):
+        self.tracer = tracer
+        self.file_path = file_path
+        self.interval = interval
+        self.written_count = 0
+        self.stop_event = threading.Event()
+        self.writer_thread = None
+        self.trace_file = None
+
+    def flush(self):
+        events = self.tracer.drain()
+        if not events:
+            return
+        self.trace_file.write(''.join(json.dumps(event) + ',\n' for event in events))
+        self.trace_file.flush()
+        self.written_count += len(events)
+
+    def flush_task(self):
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def start(self):
+        self.trace_file = open(self.file_path, 'w')
+        self.trace_file.write('[\n')
+        self.stop_event.clear()
+        self.writer_thread = threading.Thread(target=self.flush_task, daemon=True)
+        self.writer_thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.writer_thread.join()
+        self.writer_thread = None
+
+        if self.trace_file:
+            # Terminate the array with a metadata event so the file is also valid JSON.
+            self.trace_file.write(json.dumps({
+                'name': 'trace_summary', 'ph': 'M', 'pid': os.getpid(),
+                'args': {'written': self.written_count, 'dropped': self.tracer.dropped_count}
+            }) + '\n]\n')
+            self.trace_file.close()
+            self.trace_file = None
@@ -11,6 +11,8 @@ import multiprocessing
 from multiprocessing import Process, Event
 from time import sleep
 
+from WMX3TracePython import TRACE_CATEGORY_MEMORY_LOG, complete_event, trace_timestamp
+
 # Global functions
 def check_errorcode(func, error_code, error_queue=None):
     if error_code != ErrorCode.PyNone:
@@ -184,9 +186,11 @@ class MemoryLogger:
         return True
 
 class WMX3LogManager:
-    def __init__(self):
+    def __init__(self, tracer=None):
         self.log_data_history = [np.zeros((0,)), np.zeros((0,))]
         self.overflow_flag = 0
+        # Optional WMX3TracePython.Tracer receiving one span per collected log batch
+        self.tracer = tracer
 
         # Initialize multiprocessing manager and shared resources
         self.manager = multiprocessing.Manager()
@@ -207,15 +211,17 @@ class WMX3LogManager:
             'fontweight': 'bold'
         }  
 
-    def update_log_task(self, error_queue=None):
+    def update_log_task(self, error_queue=None, trace_enabled=False):
         """Worker subprocess to collect log data."""
         mem_logger = MemoryLogger(error_queue)
+        trace_events = []
 
         try:
             # Signal that the subprocess has started
             self.start_event.set()
 
             while not self.stop_event.is_set():
+                batch_start = trace_timestamp()
                 updated_logdata = mem_logger.collect_logdata(mem_logger.log_channel)
 
                 if updated_logdata and len(updated_logdata) > 0:
@@ -227,6 +233,11 @@ class WMX3LogManager:
                     #     mem_logger.add_error_queue(f"mem_logstatus: {mem_logstatus.logState}, {mem_logstatus.samplesToCollect}, {mem_logstatus.samplesCollected}, {mem_logstatus.usageRate}")
                     
                     mem_logger.add_log_data(pos_value_array, vel_value_array)
+
+                    if trace_enabled:
+                        trace_events.append(complete_event(
+                            'collect_logdata', TRACE_CATEGORY_MEMORY_LOG, batch_start,
+                            trace_timestamp() - batch_start, {'count': len(updated_logdata)}))
                 
                 # Wait for data to be saved to the log buffer
                 sleep(0.1)
@@ -234,6 +245,7 @@ class WMX3LogManager:
             # Update the shared dictionary with results
             self.log_updater_result['overflow'] = mem_logger.overflow_flag
             self.log_updater_result['history'] = mem_logger.log_data_history
+            self.log_updater_result['trace_events'] = trace_events
 
             print(f'[MemoryLogger Log] Count: {mem_logger.log_data_history[HISTORY_INDEX_POS].size}, Overflow: {mem_logger.overflow_flag}')
 
@@ -250,7 +262,7 @@ class WMX3LogManager:
 
         # Start the worker subprocess
         self.log_update_process = Process(
-            target=self.update_log_task, args=(self.error_queue,)
+            target=self.update_log_task, args=(self.error_queue, self.tracer is not None)
         )
         self.log_update_process.start()
 
@@ -281,6 +293,8 @@ class WMX3LogManager:
         # Get the updated log data
         self.overflow_flag = self.log_updater_result.get('overflow', 0)
         self.log_data_history = self.log_updater_result.get('history', [np.zeros((0,)), np.zeros((0,))])
+        if self.tracer is not None:
+            self.tracer.extend(self.log_updater_result.get('trace_events', []))
 
         # Print the summary of updated logdata
         print(f'[Received Log] Count: {self.log_data_history[HISTORY_INDEX_POS].size}, Overflow: {self.overflow_flag}')
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_wmx3api
+
+fake_wmx3api.install()
+
+
+@pytest.fixture
+def handlers():
+    """Native function name -> handler of the fake API; cleared after each test."""
+    yield fake_wmx3api.handlers
+    fake_wmx3api.handlers.clear()
+
+
+@pytest.fixture
+def wmx3_api():
+    from WMX3ApiPython import WMX3Api
+    return WMX3Api()
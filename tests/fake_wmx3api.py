@@ -0,0 +1,276 @@
+"""
+Hardware-free stand-in for the native _WMX3ApiPython extension.
+
+The generated SWIG proxy WMX3ApiPython.py is imported on top of this module, so
+every class, field, method and constructor the library uses goes through the real
+proxy classes. A name the wrapper does not define fails as it would on a device.
+
+- Constructors of the module classes check the type of their parent (WMX3Api,
+  CoreMotion or AdvancedMotion).
+- Struct fields hold their values; struct members come back as proxies of their
+  declared type, and assigned structs and Set*/__setitem__ values are copied.
+- Proxy instances reject attributes that are not wrapper fields.
+- Device methods (WMX3Api, CoreMotion, EventControl, ...) raise NotImplementedError
+  unless a test registers a handler for them in `handlers`, keyed by the native
+  function name. A handler gets the arguments of the native call, including the
+  output structs the proxy allocates, e.g.
+  handlers['WMX3Api_GetEngineStatus'] = lambda api, status: 0
+"""
+import copy
+import itertools
+import os
+import re
+import sys
+import types
+
+PROXY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'WMX3ApiPython.py')
+
+# Engine limits returned for constants.<name>; other limits default to DEFAULT_CONSTANT.
+CONSTANT_VALUES = {
+    'maxAxes': 128,
+    'maxIoInSize': 8000,
+    'maxIoOutSize': 8000,
+    'maxInterrupts': 4,
+    'maxLogChannel': 16,
+    'maxApiBufferChannel': 16,
+    'maxPsoData': 64,
+    'maxPveloData': 256,
+    'maxEvents': 64,
+    'maxPvtAppendPoints': 256,
+    'maxPathIntplLookaheadAppendPoints': 32,
+    'maxEcamPoints': 256,
+    'maxPitchErrorCompPoints': 256,
+    'max2dPitchErrorCompPoints': 64,
+}
+DEFAULT_CONSTANT = 64
+
+# Module class -> class of the pointer its constructor takes.
+CONSTRUCTOR_PARENTS = {
+    'CoreMotion': 'WMX3Api', 'AdvancedMotion': 'WMX3Api', 'EventControl': 'WMX3Api', 'Ecat': 'WMX3Api',
+    'Io': 'WMX3Api', 'ApiBuffer': 'WMX3Api', 'CyclicBuffer': 'WMX3Api', 'Compensation': 'WMX3Api',
+    'Log': 'WMX3Api', 'UserMemory': 'WMX3Api',
+    'AxisControl': 'CoreMotion', 'Motion': 'CoreMotion', 'Home': 'CoreMotion', 'Velocity': 'CoreMotion',
+    'Torque': 'CoreMotion', 'Sync': 'CoreMotion', 'Config': 'CoreMotion',
+    'AdvMotion': 'AdvancedMotion', 'AdvSync': 'AdvancedMotion', 'AdvVelocity': 'AdvancedMotion',
+}
+DEVICE_CLASSES = set(CONSTRUCTOR_PARENTS) | {'WMX3Api'}
+
+# '<Class>_<field>' -> class of a struct or module member whose type the wrapper does not name.
+# Union members of the '<Class>_Data_<field>' form, event arguments of the
+# '<Class>FunctionArguments_<Field>' form, the ApiBufferCondition arg_<type> members and
+# the EcSlavePdo members of EcSlavePdoInfo are found without an entry.
+FIELD_TYPES = {
+    'EngineStatus_interrupts': 'InterruptData',
+    'EcMasterInfo_statisticsInfo': 'EcMasterStatisticsInfo',
+    'CoreMotion_axisControl': 'AxisControl', 'CoreMotion_motion': 'Motion', 'CoreMotion_home': 'Home',
+    'CoreMotion_velocity': 'Velocity', 'CoreMotion_torque': 'Torque', 'CoreMotion_sync': 'Sync',
+    'CoreMotion_config': 'Config',
+    'AdvancedMotion_advMotion': 'AdvMotion', 'AdvancedMotion_advSync': 'AdvSync',
+    'AdvancedMotion_advVelocity': 'AdvVelocity',
+    'Motion_PosCommand_profile': 'Profile',
+    'Motion_SimulatePosCommand_posCommand': 'Motion_PosCommand',
+    'AdvSync_ECAMData_options': 'AdvSync_ECAMOptions', 'AdvSync_ECAMOptions_source': 'AdvSync_ECAMSourceOptions',
+    'AdvSync_ECAMOptions_clutch': 'AdvSync_ECAMClutchOptions',
+    'MemoryLogDatas_logIOData': 'MemoryLogIOData',
+    'EcSlaveAxisInfo_pdoInfo': 'EcSlavePdoInfo',
+}
+
+handlers = {}
+classes = {}
+
+
+class Native:
+    """The object behind a proxy's `this`: field values and indexed items."""
+    def __init__(self, class_name, args=(), size=None):
+        self.class_name = class_name
+        self.args = args
+        self.size = size
+        self.fields = {}
+        self.items = {}
+
+    def own(self, value=None):
+        return True
+
+    def __repr__(self):
+        return f'fake {self.class_name}'
+
+
+def wrap(cls, native):
+    proxy = cls.__new__(cls)
+    object.__setattr__(proxy, 'this', native)
+    return proxy
+
+
+def stored(value):
+    """Copy a struct the way SWIG copies it into a field or array element."""
+    native = getattr(value, 'this', None)
+    if isinstance(native, Native) and native.class_name not in DEVICE_CLASSES:
+        return (type(value), copy.deepcopy(native))
+    return value
+
+
+def loaded(value):
+    if isinstance(value, tuple) and len(value) == 2 and isinstance(value[1], Native):
+        return wrap(*value)
+    return value
+
+
+def strict_setattr(self, name, value):
+    if name == 'this' or isinstance(getattr(type(self), name, None), property):
+        object.__setattr__(self, name, value)
+    else:
+        raise AttributeError(f"{type(self).__name__} has no field '{name}'")
+
+
+def owner_class(proxy, name):
+    """Return the class in proxy's MRO whose functions name starts with."""
+    for cls in type(proxy).__mro__:
+        if name.startswith(cls.__name__ + '_'):
+            return cls.__name__
+    raise TypeError(f'{name} called on {type(proxy).__name__}')
+
+
+def constant_names():
+    pattern = re.compile(r'^\s+\w+ = _WMX3ApiPython\.(\w+)$', re.M)
+    with open(PROXY_PATH) as proxy_file:
+        return {name for name in pattern.findall(proxy_file.read()) if not name.startswith('delete_')}
+
+
+class FakeNativeModule(types.ModuleType):
+    def __init__(self):
+        super().__init__('_WMX3ApiPython')
+        self.handlers = handlers
+        self.classes = classes
+        self.constants = constant_names()
+        self.enum_values = itertools.count(1)
+
+    def constant(self, name):
+        if name.endswith('_PyNone'):
+            return 0
+        if name.startswith('constants_'):
+            return CONSTANT_VALUES.get(name[len('constants_'):], DEFAULT_CONSTANT)
+        return next(self.enum_values)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if name in self.constants:
+            value = self.constant(name)
+        else:
+            value = self.function(name)
+        setattr(self, name, value)
+        return value
+
+    def function(self, name):
+        if name.endswith('_swigregister'):
+            def register(cls):
+                classes[cls.__name__] = cls
+                cls.__setattr__ = strict_setattr
+            return register
+        if name.endswith('_swiginit'):
+            return lambda proxy, native: object.__setattr__(proxy, 'this', native)
+        if name.startswith('new_'):
+            return self.constructor(name[len('new_'):])
+        if name.startswith('delete_'):
+            return lambda proxy: None
+        if name.endswith('_get') or name.endswith('_set'):
+            return self.field(name[:-4], name.endswith('_set'))
+        if name.endswith('___getitem__') or name.endswith('___setitem__'):
+            return self.array_item(name.endswith('___setitem__'))
+        return self.method(name)
+
+    def constructor(self, class_name):
+        def new(*args):
+            parent = CONSTRUCTOR_PARENTS.get(class_name)
+            if parent is not None and args:
+                if len(args) != 1 or type(args[0]).__name__ != parent:
+                    raise TypeError(f'{class_name}() takes a {parent}, got '
+                                    f'{", ".join(type(arg).__name__ for arg in args)}')
+            size = args[0] if class_name.endswith('Array') and args else None
+            return Native(class_name, args, size)
+        return new
+
+    def field(self, key, setter):
+        def get(proxy):
+            native = proxy.this
+            if key not in native.fields:
+                native.fields[key] = self.default_field(proxy, key)
+            return loaded(native.fields[key])
+
+        def set(proxy, value):
+            proxy.this.fields[key] = stored(value)
+        return set if setter else get
+
+    @staticmethod
+    def default_field(proxy, key):
+        owner = owner_class(proxy, key)
+        field_name = key[len(owner) + 1:]
+        class_name = FIELD_TYPES.get(key)
+        if class_name is None and f'{owner}_Data_{field_name}' in classes:
+            class_name = f'{owner}_Data_{field_name}'
+        arguments_class = f'{owner}FunctionArguments_{field_name[:1].upper()}{field_name[1:]}'
+        if class_name is None and arguments_class in classes:
+            class_name = arguments_class
+        if class_name is None and owner == 'ApiBufferCondition' and field_name.startswith('arg_'):
+            argument_classes = {name.split('_', 1)[1].lower(): name for name in classes
+                                if name.startswith('ApiBufferConditionArguments_')}
+            class_name = argument_classes.get(field_name[len('arg_'):].lower())
+        if class_name is None and owner == 'EcSlavePdoInfo':
+            class_name = 'EcSlavePdo'
+        if class_name is None:
+            return 0
+        cls = classes[class_name]
+        member = cls(proxy) if class_name in CONSTRUCTOR_PARENTS else cls()
+        return member if class_name in DEVICE_CLASSES else (cls, member.this)
+
+    @staticmethod
+    def array_item(setter):
+        def check_index(native, index):
+            if native.size is not None and not 0 <= index < native.size:
+                raise IndexError(f'{native.class_name} index {index} out of range {native.size}')
+
+        def getitem(proxy, index):
+            check_index(proxy.this, index)
+            return loaded(proxy.this.items.get(index, 0))
+
+        def setitem(proxy, index, value):
+            check_index(proxy.this, index)
+            proxy.this.items[index] = stored(value)
+        return setitem if setter else getitem
+
+    @staticmethod
+    def method(name):
+        def call(*args):
+            if name in handlers:
+                return handlers[name](*args)
+            proxy = args[0] if args else None
+            native = getattr(proxy, 'this', None)
+            if isinstance(native, Native) and native.class_name not in DEVICE_CLASSES:
+                member = name[len(owner_class(proxy, name)) + 1:]
+                if member.startswith('Set') and len(args) >= 3:
+                    native.items[(member[3:],) + args[1:-1]] = stored(args[-1])
+                    return None
+                if member.startswith('Get') and len(args) >= 2:
+                    return loaded(native.items.get((member[3:],) + args[1:], 0))
+                if member == 'assign':
+                    native.items['value'] = args[1]
+                    return None
+                if member == 'value':
+                    return native.items.get('value', 0)
+            raise NotImplementedError(f'{name} is not faked; register a handler for it')
+        return call
+
+
+def copy_struct(target, source):
+    """Copy the fields and items of struct source into target, e.g. to fill an output struct."""
+    copied = copy.deepcopy(source.this)
+    target.this.fields.update(copied.fields)
+    target.this.items.update(copied.items)
+
+
+def install():
+    """Register the fake as _WMX3ApiPython. Returns the module."""
+    module = sys.modules.get('_WMX3ApiPython')
+    if not isinstance(module, FakeNativeModule):
+        module = sys.modules['_WMX3ApiPython'] = FakeNativeModule()
+    return module
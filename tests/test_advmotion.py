@@ -0,0 +1,293 @@
+import queue
+import threading
+
+import numpy as np
+import pytest
+
+from WMX3ApiPython import AdvMotion_PathIntplLookaheadSegmentType, ErrorCode, TriggerType
+from WMX3AdvMotionPython import (AdvMotionBufferPool, PathIntplLookaheadFeeder, TrajectoryLoader, check_trajectory,
+                                 circular_segment, linear_segment, lookahead_point, output_bit_segment,
+                                 sleep_segment, split_trajectory, trajectory_columns, trajectory_profile)
+
+
+def test_trajectory_columns_sources(tmp_path):
+    array = np.array([[0.0, 0.0, 0.0], [1.0, 2.0, 100.0]])
+    columns = trajectory_columns('PVT', array)
+    assert [column.tolist() for column in columns] == [[0.0, 1.0], [0.0, 2.0], [0.0, 100.0]]
+
+    structured = np.zeros(2, dtype=[('timeMilliseconds', 'f8'), ('pos', 'f4')])
+    structured['timeMilliseconds'] = [0, 10]
+    structured['pos'] = [1, 2]
+    assert trajectory_columns('PT', structured)[1].tolist() == [0.0, 10.0]
+    assert trajectory_columns('VT', {'velocity': [1, 2], 'timeMilliseconds': [0, 5]})[0].dtype == np.float64
+
+    path = str(tmp_path / 'trajectory.npy')
+    np.save(path, array[:, :2])
+    assert trajectory_columns('AT', path)[0].tolist() == [0.0, 1.0]
+
+    with pytest.raises(ValueError, match='must have columns'):
+        trajectory_columns('PVT', array[:, :2])
+
+
+def test_trajectory_profile_pvt_peak():
+    # A single cubic from rest to rest: v peaks mid-way at 1.5 x the mean velocity.
+    columns = trajectory_columns('PVT', [[0.0, 0.0, 0.0], [10.0, 0.0, 1000.0]])
+    peak_velocity, peak_acc = trajectory_profile('PVT', columns)
+    assert peak_velocity == pytest.approx([15.0])
+    assert peak_acc == pytest.approx([60.0])
+
+
+def test_trajectory_profile_pt_vt_at():
+    pt = trajectory_columns('PT', [[0.0, 0.0], [1.0, 100.0], [3.0, 200.0]])
+    assert [values.tolist() for values in trajectory_profile('PT', pt)] == [[10.0, 20.0], [100.0, 100.0]]
+
+    vt = trajectory_columns('VT', [[0.0, 0.0], [5.0, 500.0]])
+    assert [values.tolist() for values in trajectory_profile('VT', vt)] == [[5.0], [10.0]]
+
+    at = trajectory_columns('AT', [[2.0, 0.0], [2.0, 1000.0], [0.0, 2000.0]])
+    peak_velocity, _ = trajectory_profile('AT', at, start_velocity=1.0)
+    assert peak_velocity.tolist() == [3.0, 4.0]
+
+
+def test_check_trajectory():
+    columns = trajectory_columns('PT', [[0.0, 0.0], [1.0, 100.0], [2.0, 100.0]])
+    with pytest.raises(ValueError, match='point 2 time 100.0 is not after 100.0'):
+        check_trajectory('PT', columns)
+    with pytest.raises(ValueError, match='no points'):
+        check_trajectory('PT', trajectory_columns('PT', np.zeros((0, 2))))
+
+    columns = trajectory_columns('PT', [[0.0, 0.0], [1.0, 100.0], [3.0, 200.0]])
+    check_trajectory('PT', columns, max_velocity=20.0)
+    with pytest.raises(ValueError, match='velocity 20 exceeds limit 15 between points 1 and 2'):
+        check_trajectory('PT', columns, max_velocity=15.0)
+
+
+def test_split_trajectory_chains_segments():
+    columns = trajectory_columns('PT', np.column_stack((np.arange(7.0), np.arange(7.0) * 10)))
+    segments = split_trajectory(columns, 3)
+    assert [segment[0].tolist() for segment in segments] == [[0, 1, 2], [2, 3, 4], [4, 5, 6]]
+    assert [segment[1].tolist() for segment in segments] == [[0, 10, 20], [0, 10, 20], [0, 10, 20]]
+    assert split_trajectory(columns, 7) == [columns]
+    with pytest.raises(ValueError):
+        split_trajectory(columns, 1)
+
+
+def test_trajectory_loader_chains_commands(wmx3_api, handlers):
+    started = []
+
+    def start_pt(adv_motion, command, trigger=None):
+        started.append((command.pointCount, command.GetPoints(0).pos,
+                        None if trigger is None else (trigger.triggerType, trigger.triggerAxis)))
+        return 0
+
+    def buffer_points(adv_motion, axis, points):
+        points.assign(4)
+        return 0
+
+    handlers['AdvMotion_StartPT'] = start_pt
+    handlers['AdvMotion_GetPVTBufferPoints'] = buffer_points
+    loader = TrajectoryLoader(wmx3_api)
+    trajectory = np.column_stack((np.arange(7.0), np.arange(7.0)))
+    commands = loader.build_commands('PT', 2, trajectory)
+    assert [command.pointCount for command in commands] == [4, 4]
+    assert commands[1].GetPoints(3).timeMilliseconds == 3.0
+    assert all(command.axis == 2 for command in commands)
+
+    loader.start('PT', commands, guard=0.0)
+    assert started == [(4, 0.0, None), (4, 3.0, (TriggerType.RemainingTime, 2))]
+
+
+class FakeBuffers:
+    """Engine buffers of the AdvMotion Create*/Free* functions, keyed by (kind, index)."""
+    BYTES_PER_POINT = {'PVT': 40, 'PathIntpl': 100, 'PathIntplLookahead': 200}
+
+    def __init__(self, handlers):
+        self.buffers = {}
+        self.calls = []
+        for kind, bytes_per_point in self.BYTES_PER_POINT.items():
+            handlers[f'AdvMotion_Create{kind}Buffer'] = self.create(kind)
+            handlers[f'AdvMotion_Free{kind}Buffer'] = self.free(kind)
+            handlers[f'AdvMotion_Get{kind}BytesPerPoint'] = self.bytes_per_point(bytes_per_point)
+
+    def create(self, kind):
+        def call(adv_motion, index, points):
+            assert (kind, index) not in self.buffers
+            self.buffers[(kind, index)] = points
+            self.calls.append(('create', kind, index, points))
+            return 0
+        return call
+
+    def free(self, kind):
+        def call(adv_motion, index):
+            del self.buffers[(kind, index)]
+            self.calls.append(('free', kind, index))
+            return 0
+        return call
+
+    @staticmethod
+    def bytes_per_point(value):
+        def call(adv_motion, pointer):
+            pointer.assign(value)
+            return 0
+        return call
+
+
+def test_buffer_pool_reuses_idle_buffers(wmx3_api, handlers):
+    engine = FakeBuffers(handlers)
+    pool = AdvMotionBufferPool(wmx3_api, granularity=100)
+    with pool.buffer('PVT', 0, 150) as points:
+        assert points == 200
+        with pytest.raises(ValueError, match='already in use'):
+            pool.acquire('PVT', 0, 10)
+    assert engine.buffers == {('PVT', 0): 200}
+
+    assert pool.acquire('PVT', 0, 200) == 200
+    pool.release('PVT', 0)
+    # A larger request frees and recreates the buffer.
+    assert pool.acquire('PVT', 0, 201) == 300
+    assert engine.calls[-2:] == [('free', 'PVT', 0), ('create', 'PVT', 0, 300)]
+    assert (pool.hit_count, pool.miss_count) == (1, 2)
+
+    pool.acquire('PathIntpl', 1, 10)
+    report = pool.report()
+    assert report['bytes_per_kind'] == {'PVT': 300 * 40, 'PathIntpl': 100 * 100}
+    assert report['idle'] == 0
+
+    with pytest.raises(ValueError, match='not allocated'):
+        pool.release('Spline', 0)
+    pool.free_all()
+    assert engine.buffers == {}
+
+
+def test_buffer_pool_reclaims_least_recently_used(wmx3_api, handlers):
+    engine = FakeBuffers(handlers)
+    pool = AdvMotionBufferPool(wmx3_api, max_bytes=100 * 200 * 2, granularity=100)
+    for channel in range(2):
+        with pool.buffer('PathIntplLookahead', channel, 100):
+            pass
+    with pool.buffer('PathIntplLookahead', 0, 100):
+        pass
+    with pool.buffer('PathIntplLookahead', 2, 100):
+        pass
+    # Channel 1 was idle longest and made room for channel 2.
+    assert sorted(engine.buffers) == [('PathIntplLookahead', 0), ('PathIntplLookahead', 2)]
+    assert pool.memory_in_use() <= pool.max_bytes
+
+
+def test_buffer_pool_rejects_buffer_over_limit(wmx3_api, handlers):
+    engine = FakeBuffers(handlers)
+    pool = AdvMotionBufferPool(wmx3_api, max_bytes=100 * 200 * 2, granularity=100)
+    pool.acquire('PathIntplLookahead', 0, 100)
+    with pool.buffer('PathIntplLookahead', 1, 100):
+        pass
+    # Freeing idle channel 1 is not enough while channel 0 is in use.
+    with pytest.raises(ValueError, match='does not fit in max_bytes'):
+        pool.acquire('PathIntplLookahead', 2, 200)
+    assert engine.buffers == {('PathIntplLookahead', 0): 100}
+    with pytest.raises(ValueError, match='does not fit in max_bytes'):
+        pool.acquire('PVT', 0, 2000)
+    assert pool.acquire('PathIntplLookahead', 2, 100) == 100
+    assert pool.memory_in_use() == pool.max_bytes
+
+
+def test_lookahead_point_is_fresh():
+    linear = lookahead_point(linear_segment([1.0, 2.0], smooth_radius=0.5, velocity=10.0), [4, 5])
+    assert linear.type == AdvMotion_PathIntplLookaheadSegmentType.Linear
+    assert (linear.linear.GetAxis(1), linear.linear.GetTarget(1)) == (5, 2.0)
+    assert (linear.linear.setSegmentCompositeVel, linear.linear.segmentCompositeVel) == (1, 10.0)
+
+    # Nothing of the linear segment leaks into the next point.
+    circular = lookahead_point(circular_segment([0.0, 0.0], [1.0, 1.0], clockwise=True), [4, 5])
+    assert circular.linear.axisCount == 0
+    assert circular.linear.segmentCompositeVel == 0
+    assert circular.centerAndEndCircular.setSegmentCompositeVel == 0
+    assert circular.centerAndEndCircular.clockwise == 1
+
+    assert lookahead_point(sleep_segment(20), [4]).sleep.milliseconds == 20
+    assert lookahead_point(output_bit_segment(1, 2, 1), [4]).setOutputBit.bitAddress == 2
+    with pytest.raises(ValueError):
+        lookahead_point(('spline',), [4])
+
+
+class FakeLookaheadChannel:
+    """A lookahead buffer of capacity points that executes up to drain points on every status poll."""
+    def __init__(self, handlers, capacity=100, drain=0, fail_after=None):
+        self.capacity = capacity
+        self.drain = drain
+        self.fail_after = fail_after
+        self.queue = []
+        self.executed = []
+        self.command_sizes = []
+        handlers['AdvMotion_AddPathIntplLookaheadCommand'] = self.add_command
+        handlers['AdvMotion_GetPathIntplLookaheadStatus'] = self.get_status
+        handlers['AdvMotion_StartPathIntplLookahead'] = lambda adv_motion, channel: 0
+
+    def add_command(self, adv_motion, channel, command):
+        if self.fail_after is not None and len(self.command_sizes) >= self.fail_after:
+            return ErrorCode.PyNone + 1
+        assert len(self.queue) + command.numPoints <= self.capacity
+        self.command_sizes.append(command.numPoints)
+        for index in range(command.numPoints):
+            point = command.GetPoint(index)
+            self.queue.append(point.linear.GetTarget(0))
+        return 0
+
+    def get_status(self, adv_motion, channel, status):
+        count = min(self.drain, len(self.queue))
+        self.executed.extend(self.queue[:count])
+        del self.queue[:count]
+        status.remainCommandCount = len(self.queue)
+        status.freeBuffer = self.capacity - len(self.queue)
+        status.executedCommandCount = len(self.executed)
+        return 0
+
+
+def test_lookahead_feeder_refill(wmx3_api, handlers):
+    channel = FakeLookaheadChannel(handlers)
+    feeder = PathIntplLookaheadFeeder(wmx3_api, 0, [0, 1], low_watermark=20, high_watermark=80)
+    feeder.segments = iter(linear_segment([float(index), 0.0]) for index in range(200))
+
+    assert feeder.refill()
+    assert channel.command_sizes == [32, 32, 16]
+    channel.queue = channel.queue[70:]
+    assert feeder.refill()
+    assert channel.command_sizes[3:] == [32, 32, 6]
+    assert channel.queue[:2] == [70.0, 71.0]
+
+    # Above the low watermark nothing is sent.
+    assert feeder.refill()
+    assert len(channel.queue) == 80
+
+    channel.queue = []
+    assert not feeder.refill()
+    assert feeder.starvation_count == 1
+    assert feeder.min_remain == 0
+    assert feeder.pushed_count == 200
+    assert channel.queue[-1] == 199.0
+
+
+def test_lookahead_feeder_streams_from_thread(wmx3_api, handlers):
+    channel = FakeLookaheadChannel(handlers, capacity=64, drain=8)
+    feeder = PathIntplLookaheadFeeder(wmx3_api, 0, [0], low_watermark=16, high_watermark=48, interval=0.0005)
+    feeder.start(linear_segment([float(index)]) for index in range(300))
+    # wait() polls the generator while the feeder thread may still be advancing it.
+    assert feeder.wait(timeout=5.0)
+    feeder.stop()
+    assert channel.executed == [float(index) for index in range(300)]
+    assert feeder.metrics()['errors'] == 0
+
+
+def test_lookahead_feeder_wait_returns_on_feed_error(wmx3_api, handlers):
+    channel = FakeLookaheadChannel(handlers, capacity=64, drain=8, fail_after=4)
+    errors = queue.Queue()
+    feeder = PathIntplLookaheadFeeder(wmx3_api, 0, [0], low_watermark=16, high_watermark=48, interval=0.0005,
+                                      error_queue=errors)
+    feeder.start(linear_segment([float(index)]) for index in range(300))
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(feeder.wait()), daemon=True)
+    waiter.start()
+    waiter.join(5.0)
+    assert result == [False]
+    assert feeder.metrics()['errors'] == 1
+    assert 'AddPathIntplLookaheadCommand' in errors.get_nowait()
+    assert len(channel.executed) < 300
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from WMX3ApiPython import AdvSync_ECAMSourceType, AdvSync_ECAMType
+from WMX3AdvSyncPython import (CAM_LAWS, ECAMTableCache, build_cam_table, cam_segment, cam_table_profile,
+                               check_cam_table)
+
+
+@pytest.mark.parametrize('law', sorted(set(CAM_LAWS) - {'dwell'}))
+def test_cam_laws_rise_monotonically(law):
+    u = np.linspace(0.0, 1.0, 1001)
+    s = CAM_LAWS[law](u)
+    assert s[0] == pytest.approx(0.0, abs=1e-12)
+    assert s[-1] == pytest.approx(1.0)
+    assert np.all(np.diff(s) >= -1e-12)
+    if law != 'linear':
+        # Smooth laws start and end at rest.
+        assert np.gradient(s, u)[[0, -1]] == pytest.approx([0.0, 0.0], abs=0.01)
+
+
+def test_cam_segment_validation():
+    assert cam_segment(10, 5, 'cycloidal', 8) == (10.0, 5.0, 'cycloidal', 8)
+    with pytest.raises(ValueError, match='Unknown cam law'):
+        cam_segment(10, 5, 'harmonic')
+    with pytest.raises(ValueError, match='positive'):
+        cam_segment(0, 5)
+
+
+def test_build_cam_table():
+    master, slave = build_cam_table([cam_segment(10, 5, points=4), cam_segment(20, 0, 'dwell', points=2)],
+                                    master_start=100.0, slave_start=1.0)
+    assert master.tolist() == [100.0, 102.5, 105.0, 107.5, 110.0, 120.0, 130.0]
+    assert slave[[0, 2, 4, 5, 6]].tolist() == [1.0, 3.5, 6.0, 6.0, 6.0]
+
+
+def test_cam_table_profile_and_check():
+    master, slave = build_cam_table([cam_segment(10, 10, 'linear', 10)])
+    profile = cam_table_profile(master, slave)
+    assert profile['velocity'] == pytest.approx(1.0)
+    assert profile['acc'] == pytest.approx(0.0)
+    assert check_cam_table(master, slave, max_velocity=1.0 + 1e-9) == profile
+
+    master, slave = build_cam_table([cam_segment(10, 10, 'linear', 5), cam_segment(10, 0, 'dwell', 5)])
+    with pytest.raises(ValueError, match='slope_jump 1 exceeds'):
+        check_cam_table(master, slave, max_slope_jump=0.5)
+    with pytest.raises(ValueError, match='not increasing'):
+        check_cam_table(np.array([0.0, 1.0, 1.0]), np.zeros(3))
+    with pytest.raises(ValueError, match='2 to 256 points'):
+        check_cam_table(np.arange(257.0), np.zeros(257))
+
+
+def test_ecam_table_cache(wmx3_api, handlers):
+    started = []
+    handlers['AdvSync_StartECAM'] = lambda adv_sync, channel, data: started.append(
+        (channel, data.numPoints, data.GetSlavePos(data.numPoints - 1), data.options.type)) or 0
+    cache = ECAMTableCache(wmx3_api, max_tables=2)
+    recipe = [cam_segment(90, 10, points=16), cam_segment(270, -10, 'cycloidal', points=32)]
+
+    data = cache.start(0, 0, 1, recipe, cam_type=AdvSync_ECAMType.Periodic,
+                       source_type=AdvSync_ECAMSourceType.MasterCommandPos)
+    assert started == [(0, 49, 0.0, AdvSync_ECAMType.Periodic)]
+    assert data.options.source.type == AdvSync_ECAMSourceType.MasterCommandPos
+    assert (data.masterAxis, data.slaveAxis, data.GetMasterPos(16)) == (0, 1, 90.0)
+
+    assert cache.compile(0, 1, recipe, cam_type=AdvSync_ECAMType.Periodic,
+                         source_type=AdvSync_ECAMSourceType.MasterCommandPos) is data
+    assert cache.compile(0, 2, recipe) is not data
+    cache.compile(0, 3, recipe)
+    # The Periodic table was the least recently used of three and has been dropped.
+    assert len(cache.tables) == 2
+    assert (cache.hit_count, cache.miss_count) == (1, 3)
+    assert cache.hit_rate() == 0.25
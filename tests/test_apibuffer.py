@@ -0,0 +1,195 @@
+import pytest
+
+from WMX3ApiPython import ApiBufferConditionType, CoreMotion, ErrorCode
+from WMX3ApiBufferPython import ApiBufferProgramCache, BufferCondition, MotionSequence, parse_script
+
+
+class FakeApiBuffer:
+    """Records the ApiBuffer and Motion calls made while a channel is recording."""
+    def __init__(self, handlers, free_size=1024):
+        self.free_size = free_size
+        self.recording = None
+        self.recorded = {}
+        self.calls = []
+        self.fail = set()
+        for name in ('CreateApiBuffer', 'FreeApiBuffer', 'Clear', 'StartRecordBufferChannel',
+                     'EndRecordBufferChannel', 'Sleep', 'Wait', 'FlowIf', 'FlowElse', 'FlowEndIf',
+                     'Rewind', 'Execute'):
+            handlers['ApiBuffer_' + name] = self.handler(name)
+        handlers['ApiBuffer_GetStatus'] = self.get_status
+        handlers['Motion_StartPos'] = self.handler('StartPos')
+
+    def handler(self, name):
+        def call(proxy, *args):
+            self.calls.append((name,) + args)
+            if name in self.fail:
+                return ErrorCode.PyNone + 1
+            if name == 'StartRecordBufferChannel':
+                self.recording = args[0]
+                self.recorded[args[0]] = []
+            elif name == 'EndRecordBufferChannel':
+                self.recording = None
+            elif self.recording is not None:
+                self.recorded[self.recording].append(name)
+            return 0
+        return call
+
+    def get_status(self, proxy, channel, status):
+        status.freeSize = self.free_size
+        status.blockCount = len(self.recorded.get(channel, ()))
+        return 0
+
+    def names(self):
+        return [call[0] for call in self.calls]
+
+
+@pytest.fixture
+def api_buffer(handlers):
+    return FakeApiBuffer(handlers)
+
+
+@pytest.fixture
+def program_cache(wmx3_api, api_buffer):
+    return ApiBufferProgramCache(wmx3_api, CoreMotion(wmx3_api), channels=[0, 1])
+
+
+def simple_sequence(target=10.0):
+    return MotionSequence().start_pos(0, target, velocity=100.0).wait(0).sleep(5)
+
+
+def test_buffer_condition_is_hashable_and_builds():
+    condition = BufferCondition('AxisIdle', axes=[0, 2])
+    assert condition == BufferCondition('AxisIdle', axes=(0, 2))
+    assert len({condition, BufferCondition('AxisIdle', axes=[0, 2])}) == 1
+
+    built = condition.build()
+    assert built.bufferConditionType == ApiBufferConditionType.AxisIdle
+    assert built.arg_axisIdle.axisCount == 2
+    assert built.arg_axisIdle.GetAxis(1) == 2
+    assert BufferCondition('IOInput', byteAddress=1, bitAddress=3).build().arg_ioInput.bitAddress == 3
+
+    with pytest.raises(ValueError):
+        BufferCondition('Unknown')
+
+
+def test_sequence_validate():
+    condition = BufferCondition('AlwaysTrue')
+    MotionSequence().flow_if(condition).flow_else_if(condition).flow_else().flow_end_if().validate()
+    with pytest.raises(ValueError, match='without matching'):
+        MotionSequence().flow_else().validate()
+    with pytest.raises(ValueError, match='without matching'):
+        MotionSequence().flow_if(condition).flow_else().flow_else_if(condition).validate()
+    with pytest.raises(ValueError, match='inside a flow_if'):
+        MotionSequence().flow_if(condition).validate()
+    assert simple_sequence().sequence_hash() == simple_sequence().sequence_hash()
+    assert simple_sequence().sequence_hash() != simple_sequence(20.0).sequence_hash()
+
+
+def test_compile_records_once(program_cache, api_buffer):
+    channel = program_cache.compile(simple_sequence())
+    assert api_buffer.recorded[channel] == ['StartPos', 'Wait', 'Sleep']
+    assert program_cache.compile(simple_sequence()) == channel
+    assert api_buffer.names().count('StartRecordBufferChannel') == 1
+    assert (program_cache.compile_count, program_cache.hit_count) == (1, 1)
+
+    program_cache.run(simple_sequence())
+    assert api_buffer.names()[-2:] == ['Rewind', 'Execute']
+
+
+def test_compile_evicts_least_recently_run(program_cache, api_buffer):
+    first = program_cache.compile(simple_sequence(1.0))
+    second = program_cache.compile(simple_sequence(2.0))
+    program_cache.compile(simple_sequence(1.0))
+    assert program_cache.compile(simple_sequence(3.0)) == second
+    assert ('FreeApiBuffer', second) in api_buffer.calls
+    assert program_cache.compile(simple_sequence(1.0)) == first
+
+
+def test_compile_checks_free_size(program_cache, api_buffer):
+    with pytest.raises(ValueError, match='bytes free'):
+        program_cache.compile(simple_sequence(), min_free_size=4096)
+    assert 'StartRecordBufferChannel' not in api_buffer.names()
+    assert program_cache.free_channels == [1, 0]
+    assert not program_cache.programs
+
+
+def test_compile_reports_replay_error(program_cache, api_buffer):
+    api_buffer.fail = {'StartPos', 'EndRecordBufferChannel'}
+    with pytest.raises(RuntimeError, match='StartPos during recording'):
+        program_cache.compile(simple_sequence())
+    # The recording is ended and the channel freed; the End error does not hide the replay error.
+    assert api_buffer.names()[-2:] == ['EndRecordBufferChannel', 'FreeApiBuffer']
+    assert sorted(program_cache.free_channels) == [0, 1]
+
+    api_buffer.fail = set()
+    with pytest.raises(ValueError, match='requires an Io'):
+        program_cache.compile(MotionSequence().set_output_bit(0, 0, 1))
+
+
+def test_parse_script_statements():
+    sequence = parse_script('''
+start_pos(0, 10 * scale, velocity=100, type='Trapezoidal')
+linear_mov([0, 1], [1, -2])
+wait([0, 1])
+set_out_bit(2, 3, 1)
+wait_until(axis(0).remaining_distance <= 0.5)
+sleep(10)
+''', scale=2)
+    assert [step[0] for step in sequence.steps] == [
+        'start_pos', 'start_linear_intpl_mov', 'wait_axes', 'set_output_bit', 'wait_condition', 'sleep']
+    assert sequence.steps[0][2] == 20
+    assert sequence.steps[1][2] == (1, -2)
+    assert sequence.steps[4][1] == BufferCondition('RemainingDistance', axis=0, distance=0.5)
+
+
+def test_parse_script_elif_chain():
+    sequence = parse_script('''
+if io[0].bit(1):
+    sleep(1)
+elif not out[1].bit(2):
+    sleep(2)
+else:
+    pass
+''')
+    assert [step[0] for step in sequence.steps] == [
+        'flow_if', 'sleep', 'flow_else_if', 'sleep', 'flow_else', 'flow_end_if']
+    assert sequence.steps[2][1] == BufferCondition('IOOutput', byteAddress=1, bitAddress=2, invert=1)
+
+
+def test_parse_script_and_or():
+    sequence = parse_script('''
+if axis(0).idle and event(3):
+    sleep(1)
+else:
+    sleep(2)
+''')
+    ops = [step[0] if step[0] != 'sleep' else step[1] for step in sequence.steps]
+    assert ops == ['flow_if', 'flow_if', 1, 'flow_else', 2, 'flow_end_if', 'flow_else', 2, 'flow_end_if']
+
+    sequence = parse_script('''
+if axis(1).in_pos(2) or False:
+    sleep(1)
+''')
+    ops = [step[0] if step[0] != 'sleep' else step[1] for step in sequence.steps]
+    assert ops == ['flow_if', 1, 'flow_else', 'flow_if', 1, 'flow_end_if', 'flow_end_if']
+    assert sequence.steps[0][1] == BufferCondition('InPos', axis=1, channel=2)
+
+
+@pytest.mark.parametrize('source, message', [
+    ('x = 1', 'unsupported statement'),
+    ('start_pos(0, y)', "unknown name 'y'"),
+    ('wait_until(axis(0).completed_time <= 5)', 'unsupported comparison'),
+    ('wait_until(not axis(0).idle)', "'not' is only supported"),
+    ('wait_until(io[0].bit(1) and io[0].bit(2))', 'single condition'),
+    ('start_pos(0, 1, type="Unknown")', 'line 1'),
+])
+def test_parse_script_errors(source, message):
+    with pytest.raises(ValueError, match=message):
+        parse_script(source)
+
+
+def test_compile_script_report(program_cache, api_buffer):
+    report = program_cache.compile_script('start_pos(0, 1)\nwait(0)', min_free_size=512)
+    assert report['step_count'] == 2
+    assert report['block_count'] == 2
+    assert report['free_size'] == 1024
@@ -0,0 +1,181 @@
+import numpy as np
+import pytest
+
+from fake_wmx3api import copy_struct
+from WMX3ApiPython import MemoryLogAxisData, MemoryLogDatas
+from WMX3CompensationPython import (CompensationModel, CompensationTableGenerator, MemoryLogCapture, PitchErrorBinner,
+                                    PitchErrorTable, PitchErrorTable2D, iterate_capture_file, table_geometry)
+
+
+def test_pitch_table_evaluate():
+    table = PitchErrorTable([0.0, 1.0, 3.0], origin_position=10.0, origin_index=1, interval=2.0, edge_dropoff=4.0)
+    assert table.positions().tolist() == [8.0, 10.0, 12.0]
+    values = table.evaluate([8.0, 9.0, 11.0, 12.0, 14.0, 16.0, 20.0, 4.0])
+    assert values.tolist() == pytest.approx([0.0, 0.5, 2.0, 3.0, 1.5, 0.0, 0.0, 0.0])
+
+
+def test_pitch_table_direction_and_no_dropoff():
+    table = PitchErrorTable([1.0, 2.0], origin_position=0.0, interval=1.0, direction=1)
+    assert table.positions().tolist() == [0.0, -1.0]
+    assert table.evaluate([-0.5, 0.0, 0.1, -1.1]).tolist() == pytest.approx([1.5, 1.0, 0.0, 0.0])
+    assert PitchErrorTable([5.0]).evaluate([0.0, 1.0]).tolist() == [0.0, 0.0]
+
+
+def test_pitch_table_data_round_trip():
+    table = PitchErrorTable([0.0, 0.5, -0.5], origin_position=3.0, origin_index=2, interval=0.5, direction=1,
+                            edge_dropoff=1.0)
+    data = table.to_data()
+    assert data.enable == 1
+    copy = PitchErrorTable.from_data(data)
+    assert copy.values.tolist() == table.values.tolist()
+    assert (copy.origin_position, copy.origin_index, copy.interval, copy.direction, copy.edge_dropoff) == (
+        3.0, 2, 0.5, 1, 1.0)
+    with pytest.raises(ValueError, match='2 to 256 points'):
+        PitchErrorTable(np.zeros(257)).to_data()
+
+
+def test_pitch_table_2d():
+    values = np.array([[0.0, 1.0], [2.0, 3.0], [4.0, 5.0]])
+    table = PitchErrorTable2D(values, 2, (0, 1), intervals=(1.0, 10.0), edge_dropoffs=(1.0, 0.0))
+    assert table.evaluate([0.0, 1.5, 2.0, 2.5, 3.0], 5.0).tolist() == pytest.approx([0.5, 3.5, 4.5, 2.25, 0.0])
+    assert table.evaluate(0.0, [10.0, 10.5]).tolist() == [1.0, 0.0]
+
+    copy = PitchErrorTable2D.from_data(table.to_data())
+    assert copy.values.tolist() == values.tolist()
+    assert (copy.axis, copy.reference_axes, copy.intervals) == (2, (0, 1), (1.0, 10.0))
+
+
+@pytest.fixture
+def engine_tables(handlers):
+    tables = {0: PitchErrorTable([0.0, 0.1, 0.3], interval=10.0, edge_dropoff=5.0)}
+    tables_2d = {1: PitchErrorTable2D([[0.0, 0.2], [0.4, 0.6]], 1, (0, 1), intervals=(20.0, 20.0))}
+
+    def get_table(compensation, index, data):
+        if index in tables:
+            copy_struct(data, tables[index].to_data())
+        return 0
+
+    def get_table_2d(compensation, channel, data):
+        copy_struct(data, tables_2d[channel].to_data())
+        return 0
+
+    def at_position(compensation, axis, pos, result):
+        result.assign(float(tables[axis].evaluate(pos)))
+        return 0
+
+    def at_position_2d(compensation, channel, pos1, pos2, result):
+        result.assign(float(tables_2d[channel].evaluate(pos1, pos2)))
+        return 0
+
+    handlers['Compensation_GetPitchErrorCompensation'] = get_table
+    handlers['Compensation_Get2DPitchErrorCompensation'] = get_table_2d
+    handlers['Compensation_GetPitchErrorCompensationAtPosition'] = at_position
+    handlers['Compensation_Get2DPitchErrorCompensationAtPosition'] = at_position_2d
+    return tables, tables_2d
+
+
+def test_compensation_model(wmx3_api, engine_tables):
+    model = CompensationModel(wmx3_api)
+    model.load(axes=[0, 1], channels=[1])
+    # Axis 1 has no enabled table.
+    assert list(model.tables) == [0]
+    path = np.array([[5.0, 0.0], [20.0, 20.0], [22.5, 10.0]])
+    compensated = model.predict(path, [0, 1])
+    assert compensated[:, 0] - path[:, 0] == pytest.approx([0.05, 0.3, 0.15])
+    assert compensated[:, 1] - path[:, 1] == pytest.approx([0.1, 0.6, 0.0])
+
+    assert model.verify(axis=0) == 0.0
+    assert model.verify(channel=1, samples=16) == 0.0
+
+
+def test_table_geometry():
+    assert table_geometry(0.0, 10.0, 11) == (0.0, 1.0, 11)
+    assert table_geometry(0.0, 10.0, 256, interval=3.0) == (0.0, 3.0, 5)
+    with pytest.raises(ValueError, match='needs 101 points'):
+        table_geometry(0.0, 10.0, 64, interval=0.1)
+    with pytest.raises(ValueError):
+        table_geometry(1.0, 1.0, 64)
+
+
+def test_iterate_capture_file(tmp_path):
+    path = str(tmp_path / 'capture.npy')
+    np.save(path, np.arange(10.0).reshape(5, 2))
+    assert [chunk.shape for chunk in iterate_capture_file(path, chunk_rows=2)] == [(2, 2), (2, 2), (1, 2)]
+
+
+def test_binner_statistics():
+    binner = PitchErrorBinner(0.0, 1.0, 3)
+    binner.update([0.1, -0.1, 1.0, 1.2, 5.0], [1.0, 3.0, -1.0, 1.0, 9.0])
+    statistics = binner.statistics()
+    assert statistics['count'].tolist() == [2, 2, 0]
+    assert statistics['mean'][:2].tolist() == [2.0, 0.0]
+    assert statistics['std'][:2].tolist() == pytest.approx([1.0, 1.0])
+    assert (statistics['min'][0], statistics['max'][1]) == (1.0, 1.0)
+    assert binner.outside_count == 1
+
+
+def test_binner_fit_is_not_biased_by_sample_placement():
+    # Samples only on one side of each point: a plain mean would be off by half a slope.
+    binner = PitchErrorBinner(0.0, 1.0, 5)
+    positions = np.concatenate([index + np.linspace(0.0, 0.4, 5) for index in range(5)])
+    binner.update(positions, 0.5 * positions + 1.0)
+    assert binner.compensation_values().tolist() == pytest.approx([-1.0, -1.5, -2.0, -2.5, -3.0])
+
+    with pytest.raises(ValueError, match='enough samples'):
+        binner.compensation_values(min_samples=100)
+
+
+def test_binner_fills_gaps():
+    binner = PitchErrorBinner(0.0, 1.0, 4)
+    binner.update([0.0, 3.0], [2.0, 8.0])
+    assert binner.compensation_values().tolist() == pytest.approx([-2.0, -4.0, -6.0, -8.0])
+
+
+def test_build_table_recovers_error():
+    rng = np.random.default_rng(1)
+    command = rng.uniform(0.0, 100.0, 20000)
+    reference = command + 0.01 * np.sin(command / 10.0)
+    chunks = [(command[start:start + 5000], reference[start:start + 5000]) for start in range(0, 20000, 5000)]
+    table = CompensationTableGenerator.build_table(chunks, 0.0, 100.0, interval=5.0)
+    assert table.values.size == 21
+    assert table.values == pytest.approx(-0.01 * np.sin(table.positions() / 10.0), abs=5e-4)
+    assert table.statistics['count'].sum() == 20000
+
+    positions = rng.uniform(0.0, 10.0, (5000, 2))
+    error = 0.1 * positions[:, 0] - 0.2 * positions[:, 1]
+    table_2d = CompensationTableGenerator.build_table_2d([(positions, np.zeros(5000), error)], 2, (0, 1),
+                                                         (0.0, 0.0), (10.0, 10.0), intervals=(2.0, 5.0))
+    assert table_2d.values.shape == (6, 3)
+    assert table_2d.evaluate(4.0, 5.0) == pytest.approx(-0.1 * 4.0 + 0.2 * 5.0)
+
+
+def test_generator_push(wmx3_api, handlers):
+    calls = []
+    handlers['Compensation_SetPitchErrorCompensation'] = lambda compensation, axis, data: calls.append(
+        ('set', axis, data.pitchCount)) or 0
+    handlers['Compensation_EnablePitchErrorCompensation'] = lambda compensation, axis: calls.append(
+        ('enable', axis)) or 0
+    CompensationTableGenerator(wmx3_api).push(3, PitchErrorTable([0.0, 1.0, 2.0]))
+    assert calls == [('set', 3, 3), ('enable', 3)]
+
+
+def test_memory_log_capture_decodes_reference(wmx3_api, handlers):
+    def get_memory_log_data(log, channel, data):
+        data.count = 3
+        for index in range(3):
+            sample = MemoryLogDatas()
+            axis_data = MemoryLogAxisData()
+            axis_data.commandPos = 10.0 * index
+            sample.SetLogAxisData(4, axis_data)
+            for byte, value in enumerate(np.array([-index], dtype='<i2').view(np.uint8).tolist()):
+                sample.logIOData.SetInput(byte, value)
+            data.SetLogData(index, sample)
+        return 0
+
+    handlers['Log_GetMemoryLogData'] = get_memory_log_data
+    capture = MemoryLogCapture(wmx3_api, 0, [4], reference_address=100, reference_dtype='<i2',
+                               reference_scale=0.5)
+    commands, reference = capture.collect()
+    assert commands[:, 0].tolist() == [0.0, 10.0, 20.0]
+    assert reference.tolist() == [0.0, -0.5, -1.0]
+    assert capture.overflow_count == 0
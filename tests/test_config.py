@@ -0,0 +1,179 @@
+import numpy as np
+import pytest
+
+import WMX3ApiPython
+from WMX3ConfigPython import (AXIS_PARAM_FIELDS, SECTIONS, SYSTEM_PARAM_SECTIONS, ConfigParamStore, ParamSnapshot,
+                              restore_snapshot, set_struct_fields, values_to_record)
+from WMX3EventControlPython import flatten_struct
+
+
+def setter_name(field):
+    return 'Set' + field[0].upper() + field[1:]
+
+
+class FakeConfig:
+    """Engine Config parameters: axis -> section -> {field: value}; unset fields read as 0."""
+    def __init__(self, handlers):
+        self.params = {}
+        self.calls = []
+        handlers['Config_GetParam_Axis'] = self.get_param
+        handlers['Config_GetAxisParam_Axis'] = self.get_axis_param
+        handlers['Config_SetAxisParam_Axis'] = self.set_axis_param
+        for section, (_, setter) in SYSTEM_PARAM_SECTIONS.items():
+            handlers['Config_' + setter] = self.set_section(section)
+
+    def section(self, axis, section):
+        return self.params.setdefault(axis, {}).setdefault(section, {})
+
+    def get_param(self, config, axis, system_param):
+        self.calls.append(('get', axis))
+        for section, (getter, _) in SYSTEM_PARAM_SECTIONS.items():
+            data = getattr(WMX3ApiPython, 'Config_' + getter[len('Get'):])()
+            set_struct_fields(data, self.section(axis, section))
+            getattr(system_param, 'Set' + getter[len('Get'):])(axis, data)
+        return 0
+
+    def get_axis_param(self, config, axis, axis_param):
+        for field, value in self.section(axis, 'axis').items():
+            getattr(axis_param, setter_name(field))(axis, value)
+        return 0
+
+    def set_axis_param(self, config, axis, axis_param, error):
+        self.calls.append(('set', axis, 'axis'))
+        values = self.section(axis, 'axis')
+        for field in AXIS_PARAM_FIELDS:
+            values[field] = getattr(axis_param, 'G' + setter_name(field)[1:])(axis)
+        return 0
+
+    def set_section(self, section):
+        def call(config, axis, data, error):
+            self.calls.append(('set', axis, section))
+            self.section(axis, section).update(flatten_struct(data))
+            return 0
+        return call
+
+
+@pytest.fixture
+def engine(handlers):
+    engine = FakeConfig(handlers)
+    for axis in range(3):
+        engine.section(axis, 'feedback')['inPosWidth'] = 0.5 * (axis + 1)
+        engine.section(axis, 'home')['homeType'] = axis
+        engine.section(axis, 'axis')['gearRatioNumerator'] = 1000.0
+    return engine
+
+
+def test_set_struct_fields_and_records():
+    data = WMX3ApiPython.Config_HomeParam()
+    set_struct_fields(data, {'homeType': 3, 'homingVelocitySlow': 2.5})
+    assert (data.homeType, data.homingVelocitySlow) == (3, 2.5)
+    record = values_to_record({'axis': 1, 'flag': True, 'velocity': 2.5, 'name': 'x'})
+    assert record.dtype.names == ('axis', 'flag', 'velocity', 'name')
+    assert record.dtype['flag'] == np.bool_ and record.dtype['name'] == object
+
+
+def test_store_reads_and_caches(wmx3_api, engine):
+    store = ConfigParamStore(wmx3_api, range(3))
+    values = store.read()
+    assert values[1]['feedback']['inPosWidth'] == 1.0
+    assert values[2]['axis']['gearRatioNumerator'] == 1000.0
+    assert set(values[0]) == set(SYSTEM_PARAM_SECTIONS) | {'axis'}
+    store.read([0, 1])
+    assert store.metrics()['axis_reads'] == 3
+    assert store.metrics()['cache_hits'] == 2
+
+    records = store.records('home')
+    assert records['axis'].tolist() == [0, 1, 2]
+    assert records['homeType'].tolist() == [0, 1, 2]
+
+
+def test_store_applies_only_changed_sections(wmx3_api, engine):
+    store = ConfigParamStore(wmx3_api, range(3), max_workers=1)
+    recipe = {
+        0: {'feedback': {'inPosWidth': 0.5}, 'home': {'homeType': 4}},
+        1: {'axis': {'gearRatioNumerator': 2000.0}},
+    }
+    assert store.apply(recipe, dry_run=True) == {0: {'home': {'homeType': (0, 4)}},
+                                                  1: {'axis': {'gearRatioNumerator': (1000.0, 2000.0)}}}
+    assert not [call for call in engine.calls if call[0] == 'set']
+
+    store.apply(recipe)
+    assert [call for call in engine.calls if call[0] == 'set'] == [('set', 0, 'home'), ('set', 1, 'axis')]
+    assert engine.params[0]['home']['homeType'] == 4
+    assert engine.params[1]['axis']['gearRatioNumerator'] == 2000.0
+    assert store.apply(recipe) == {}
+    assert store.metrics()['section_writes'] == 2
+    # Dry runs count their skipped sections too: 1 + 1 + 3
+    assert store.metrics()['sections_skipped'] == 5
+
+    with pytest.raises(ValueError, match='Unknown parameter section'):
+        store.diff({0: {'servo': {}}})
+    with pytest.raises(ValueError, match='Unknown home parameter'):
+        store.diff({0: {'home': {'homeSpeed': 1}}})
+
+
+def test_store_invalidates_axis_on_write_error(wmx3_api, engine, handlers):
+    handlers['Config_SetHomeParam'] = lambda config, axis, data, error: WMX3ApiPython.ErrorCode.PyNone + 1
+    store = ConfigParamStore(wmx3_api, range(2), max_workers=1)
+    store.read()
+    with pytest.raises(RuntimeError):
+        store.apply({1: {'home': {'homeType': 5}}})
+    assert 1 not in store.values and 0 in store.values
+    assert store.read()[1]['home']['homeType'] == 1
+    assert store.metrics()['axis_reads'] == 3
+
+
+def snapshot_values():
+    values = {axis: {section: {} for section in SECTIONS} for axis in (2, 0, 1)}
+    for axis, sections in values.items():
+        sections['home'].update(homeType=axis, enabled=axis > 0)
+        sections['feedback']['inPosWidth'] = 0.5 * axis
+    return values
+
+
+def test_snapshot_columns_hash_and_round_trip(tmp_path):
+    snapshot = ParamSnapshot.from_values(snapshot_values())
+    assert snapshot.axes.tolist() == [0, 1, 2]
+    assert list(snapshot.columns) == ['feedback:inPosWidth', 'home:enabled', 'home:homeType']
+    assert snapshot.columns['home:enabled'].dtype == np.bool_
+
+    path = tmp_path / 'params.npz'
+    snapshot.save(path)
+    loaded = ParamSnapshot.load(path)
+    assert loaded.content_hash() == snapshot.content_hash()
+    assert loaded.diff(snapshot) == []
+
+    changed = ParamSnapshot.from_values(snapshot_values())
+    changed.columns['feedback:inPosWidth'] = changed.columns['feedback:inPosWidth'].astype(np.float32)
+    assert changed.content_hash() != snapshot.content_hash()
+    assert snapshot.to_recipe([1]) == {1: {'feedback': {'inPosWidth': 0.5}, 'home': {'enabled': True, 'homeType': 1}}}
+
+
+def test_snapshot_diff():
+    a = ParamSnapshot([0, 1, 2], {'feedback:inPosWidth': np.array([np.nan, np.nan, 2.0]),
+                                  'home:homeType': np.array([0, 1, 2])})
+    b = ParamSnapshot([1, 2, 3], {'feedback:inPosWidth': np.array([np.nan, 3.0, 0.0]),
+                                  'limit:lsType': np.array([4, 5, 6])})
+    assert a.diff(b) == [
+        (2, 'feedback', 'inPosWidth', 2.0, 3.0),
+        (1, 'home', 'homeType', 1, None), (2, 'home', 'homeType', 2, None),
+        (1, 'limit', 'lsType', None, 4), (2, 'limit', 'lsType', None, 5),
+    ]
+    nan = ParamSnapshot([0], {'feedback:inPosWidth': np.array([np.nan])})
+    assert nan.diff(ParamSnapshot([0], {'feedback:inPosWidth': np.array([np.nan])})) == []
+
+
+def test_restore_snapshot(wmx3_api, engine):
+    store = ConfigParamStore(wmx3_api, range(3), max_workers=1)
+    snapshot = ParamSnapshot.from_store(store)
+    engine.params[1]['home']['homeType'] = 7
+    engine.params[2]['feedback']['inPosWidth'] = 9.0
+
+    changes = restore_snapshot(store, snapshot, dry_run=True)
+    assert changes == [(2, 'feedback', 'inPosWidth', 9.0, 1.5), (1, 'home', 'homeType', 7, 1)]
+    assert engine.params[1]['home']['homeType'] == 7
+
+    restore_snapshot(store, snapshot)
+    assert engine.params[1]['home']['homeType'] == 1
+    assert engine.params[2]['feedback']['inPosWidth'] == 1.5
+    assert ParamSnapshot.from_store(store).content_hash() == snapshot.content_hash()
@@ -0,0 +1,185 @@
+import queue
+
+import numpy as np
+import pytest
+
+from WMX3ApiPython import CyclicBufferCommandType, CyclicBufferSingleAxisStatus, ErrorCode
+from WMX3ApiPython import CyclicBuffer
+from WMX3CyclicBufferPython import (CyclicBufferCommandBuilder, CyclicBufferFeeder, add_commands, iterate_chunks,
+                                    merge_constant_runs)
+
+
+class FakeCyclicBuffer:
+    """
+    A CyclicBuffer of capacity commands per axis. Every GetStatus_AxisSel call first
+    executes up to drain queued commands.
+    """
+    def __init__(self, handlers, capacity=8, drain=0):
+        self.capacity = capacity
+        self.drain = drain
+        self.queue = []
+        self.executed = []
+        self.calls = []
+        self.fail = False
+        for name in ('OpenCyclicBuffer_AxisSel', 'Execute_AxisSel', 'Abort_AxisSel', 'CloseCyclicBuffer_AxisSel'):
+            handlers['CyclicBuffer_' + name] = self.handler(name)
+        handlers['CyclicBuffer_GetStatus_AxisSel'] = self.get_status
+        handlers['CyclicBuffer_AddCommand_AxisSel'] = self.add_command
+
+    def handler(self, name):
+        def call(cyclic_buffer, axis_sel, *args):
+            self.calls.append(name)
+            if name == 'Abort_AxisSel':
+                self.queue.clear()
+            return 0
+        return call
+
+    def axes(self, axis_sel):
+        return [axis_sel.GetAxis(index) for index in range(axis_sel.axisCount)]
+
+    def get_status(self, cyclic_buffer, axis_sel, status):
+        self.consume(self.drain)
+        for axis in self.axes(axis_sel):
+            axis_status = CyclicBufferSingleAxisStatus()
+            axis_status.remainCount = len(self.queue)
+            axis_status.availableCount = self.capacity - len(self.queue)
+            status.SetStatus(axis, axis_status)
+        return 0
+
+    def add_command(self, cyclic_buffer, axis_sel, command):
+        if self.fail or len(self.queue) >= self.capacity:
+            return ErrorCode.PyNone + 1
+        commands = [command.GetCmd(axis) for axis in self.axes(axis_sel)]
+        self.queue.append((tuple(cmd.command for cmd in commands), commands[0].intervalCycles))
+        return 0
+
+    def consume(self, count):
+        count = min(count, len(self.queue))
+        self.executed.extend(self.queue[:count])
+        del self.queue[:count]
+
+
+@pytest.fixture
+def cyclic_buffer(handlers):
+    return FakeCyclicBuffer(handlers)
+
+
+def test_iterate_chunks():
+    chunks = list(iterate_chunks(np.arange(6), 2))
+    assert len(chunks) == 1 and chunks[0].shape == (3, 2)
+    chunks = list(iterate_chunks([(1, 2), [[3, 4], [5, 6]]], 2))
+    assert [chunk.shape for chunk in chunks] == [(1, 2), (2, 2)]
+
+
+def test_feeder_refill(wmx3_api, cyclic_buffer):
+    feeder = CyclicBufferFeeder(wmx3_api, [0, 3], buffer_cycles=8, low_watermark=4)
+    feeder.chunks = iterate_chunks(np.arange(40, dtype=float).reshape(20, 2), 2)
+
+    assert feeder.refill()
+    assert len(cyclic_buffer.queue) == 8
+    assert cyclic_buffer.queue[0] == ((0.0, 1.0), 1)
+
+    # Above the low watermark nothing is sent.
+    cyclic_buffer.consume(3)
+    feeder.refill()
+    assert len(cyclic_buffer.queue) == 5
+    assert feeder.min_margin_milliseconds == 5.0
+
+    cyclic_buffer.consume(5)
+    assert feeder.refill()
+    assert feeder.underrun_count == 1
+    cyclic_buffer.consume(8)
+    assert not feeder.refill()
+    assert [command[0][0] for command in cyclic_buffer.executed + cyclic_buffer.queue] == list(range(0, 40, 2))
+    assert feeder.metrics()['pushed'] == 20
+    assert feeder.metrics()['refills'] == 3
+
+
+def test_feeder_streams_from_thread(wmx3_api, handlers):
+    cyclic_buffer = FakeCyclicBuffer(handlers, capacity=16, drain=4)
+    feeder = CyclicBufferFeeder(wmx3_api, [1], buffer_cycles=16, low_watermark=8, interval=0.0005)
+    feeder.start(iter(np.arange(100.0).reshape(-1, 10, 1)))
+    assert feeder.wait(timeout=5.0)
+    feeder.stop()
+    assert [command[0][0] for command in cyclic_buffer.executed] == list(range(100))
+    assert cyclic_buffer.calls[0] == 'OpenCyclicBuffer_AxisSel'
+    assert cyclic_buffer.calls[-1] == 'CloseCyclicBuffer_AxisSel'
+    assert feeder.error_count == 0
+
+
+def test_feeder_reports_add_errors(wmx3_api, cyclic_buffer):
+    errors = queue.Queue()
+    feeder = CyclicBufferFeeder(wmx3_api, [0], buffer_cycles=8, low_watermark=4, error_queue=errors)
+    feeder.chunks = iterate_chunks(np.arange(10.0), 1)
+    cyclic_buffer.fail = True
+    feeder.feed_task()
+    assert feeder.error_count == 1
+    assert 'AddCommand_AxisSel' in errors.get_nowait()
+
+
+def test_feeder_relative_merge(wmx3_api, cyclic_buffer):
+    feeder = CyclicBufferFeeder(wmx3_api, [0], buffer_cycles=8, low_watermark=4,
+                                command_type=CyclicBufferCommandType.RelativePos, merge_runs=True)
+    feeder.chunks = iterate_chunks(np.ones(6), 1)
+    feeder.refill()
+    assert cyclic_buffer.queue == [((6.0,), 6)]
+
+
+def test_merge_constant_runs_absolute():
+    points = np.array([[0.0, 0.0], [1.0, 1.0], [1.0, 1.0], [1.0, 1.0], [1.0, 1.0], [2.0, 1.0]])
+    merged, intervals = merge_constant_runs(points)
+    # The first repeat keeps its row; the following holds extend it.
+    assert merged.tolist() == [[0.0, 0.0], [1.0, 1.0], [1.0, 1.0], [2.0, 1.0]]
+    assert intervals.tolist() == [1, 1, 3, 1]
+    assert intervals.sum() == points.shape[0]
+
+
+def test_merge_constant_runs_relative():
+    points = np.array([1.0, 1.0, 2.0, 3.0, 3.0]).reshape(-1, 1)
+    merged, intervals = merge_constant_runs(points, [1, 1, 2, 1, 1], relative=True)
+    # 2.0 over two cycles moves at the same rate as the 1.0 rows before it.
+    assert merged.ravel().tolist() == [4.0, 6.0]
+    assert intervals.tolist() == [4, 2]
+
+
+@pytest.mark.parametrize('points, shape', [(np.zeros((0, 3)), (0, 3)), (np.zeros(0), (0, 0)), ([], (0, 0))])
+def test_merge_constant_runs_empty(points, shape):
+    merged, intervals = merge_constant_runs(points)
+    assert merged.shape == shape
+    assert intervals.shape == (0,)
+
+
+def test_merge_constant_runs_single_point():
+    merged, intervals = merge_constant_runs([[1.0, 2.0]], 5)
+    assert merged.tolist() == [[1.0, 2.0]]
+    assert intervals.tolist() == [5]
+
+
+def test_command_builder_reuses_commands():
+    builder = CyclicBufferCommandBuilder([2, 5])
+    commands = builder.build([[1.0, 2.0], [1.0, 2.0], [1.0, 2.0], [3.0, 4.0]])
+    assert len(commands) == 3
+    assert [command.GetCmd(5).command for command in commands] == [2.0, 2.0, 4.0]
+    assert [command.GetCmd(2).intervalCycles for command in commands] == [1, 2, 1]
+    assert builder.reduction_ratio() == 0.25
+
+    again = builder.build([[5.0, 6.0]])
+    assert again[0] is commands[0]
+    assert len(builder.command_pool) == 3
+
+
+def test_add_commands_batches_by_available_count(wmx3_api, handlers):
+    cyclic_buffer = FakeCyclicBuffer(handlers, capacity=4, drain=3)
+    points = np.repeat(np.arange(4.0), 3).reshape(-1, 1)
+    sent = add_commands(CyclicBuffer(wmx3_api), [0], points, poll_interval=0.0)
+    commands = cyclic_buffer.executed + cyclic_buffer.queue
+    assert sent == len(commands) == 8
+    assert [command[0][0] for command in commands] == [0.0, 0.0, 1.0, 1.0, 2.0, 2.0, 3.0, 3.0]
+    assert [command[1] for command in commands] == [1, 2] * 4
+
+    cyclic_buffer.queue.clear()
+    cyclic_buffer.executed.clear()
+    cyclic_buffer.drain = 0
+    sent = add_commands(CyclicBuffer(wmx3_api), [0], np.arange(10.0), merge_runs=False, timeout=0.01,
+                        poll_interval=0.001)
+    assert sent == 4
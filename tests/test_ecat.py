@@ -0,0 +1,313 @@
+import queue
+import threading
+
+import numpy as np
+import pytest
+
+import WMX3ApiPython
+from WMX3EcatPython import (SDO_ABORT_TIMEOUT, EcatTopologyCache, PdoImage, SdoBatch, decode_sdo, device_key, encode_sdo,
+                            pdo_layout, sdo_read, sdo_write, topology_hash)
+
+ERROR = WMX3ApiPython.ErrorCode.PyNone + 1
+
+
+class FakeSdoSlaves:
+    """Object dictionaries of slaves: (slave, index, subindex) -> bytes."""
+    def __init__(self, handlers, objects=None):
+        self.objects = dict(objects or {})
+        self.busy = {}
+        self.aborts = {}
+        self.calls = []
+        self.lock = threading.Lock()
+        handlers['Ecat_SdoUpload_WaitTime'] = self.upload
+        handlers['Ecat_SdoDownload_WaitTime'] = self.download
+
+    def attempt(self, key, error_code):
+        """Return the error of one transfer: mailbox busy, an SDO abort, or None."""
+        with self.lock:
+            self.calls.append(key)
+            if self.busy.get(key):
+                self.busy[key] -= 1
+                return WMX3ApiPython.EcErrorCode.SlaveMailboxInUse
+            if key not in self.objects:
+                error_code.assign(0x06020000)
+                return ERROR
+            if self.aborts.get(key):
+                self.aborts[key] -= 1
+                error_code.assign(SDO_ABORT_TIMEOUT)
+                return ERROR
+        return None
+
+    def upload(self, ecat, slave, index, subindex, size, buffer, actual_size, error_code, wait_time):
+        key = (slave, index, subindex)
+        ret = self.attempt(key, error_code)
+        if ret is not None:
+            return ret
+        data = self.objects[key][:size]
+        for position, byte in enumerate(data):
+            buffer[position] = byte
+        actual_size.assign(len(data))
+        return 0
+
+    def download(self, ecat, slave, index, subindex, size, data, error_code, wait_time):
+        key = (slave, index, subindex)
+        ret = self.attempt(key, error_code)
+        if ret is not None:
+            return ret
+        self.objects[key] = bytes(data[position] for position in range(size))
+        return 0
+
+
+@pytest.mark.parametrize('sdo_type, value', [
+    ('int8', -5), ('uint16', 0xBEEF), ('int32', -100000), ('uint64', 2 ** 40), ('float32', 1.5),
+    ('float64', -0.25), ('bytes', b'\x01\x02\x03'),
+])
+def test_sdo_round_trip(sdo_type, value):
+    assert decode_sdo(sdo_type, encode_sdo(sdo_type, value)) == value
+
+
+def test_sdo_encoding_is_little_endian():
+    assert encode_sdo('uint32', 0x6064) == b'\x64\x60\x00\x00'
+    assert decode_sdo('int16', [0xFF, 0xFF]) == -1
+    assert decode_sdo('uint8', [0x12, 0x34]) == 0x12
+
+
+def test_sdo_batch_reads_and_writes(wmx3_api, handlers):
+    slaves = FakeSdoSlaves(handlers, {(0, 0x6060, 0): b'\x08', (1, 0x607A, 0): b'\x00\x00\x00\x00',
+                                      (1, 0x1008, 0): b'drive'})
+    batch = SdoBatch(wmx3_api, max_workers=2, retry_delay=0)
+    results = batch.run([
+        sdo_read(0, 0x6060, 0, 'int8'),
+        sdo_write(1, 0x607A, 0, 'int32', -1000),
+        sdo_read(1, 0x607A, 0, 'int32'),
+        sdo_read(1, 0x1008, 0, 'bytes'),
+    ])
+    assert results == [(8, None, None), (-1000, None, None), (-1000, None, None), (b'drive', None, None)]
+    # The operations of one slave run in order
+    assert [key for key in slaves.calls if key[0] == 1] == [(1, 0x607A, 0), (1, 0x607A, 0), (1, 0x1008, 0)]
+
+    metrics = batch.metrics()
+    assert metrics[0]['operations'] == 1 and metrics[1]['operations'] == 3
+    assert metrics[1]['failures'] == metrics[1]['retries'] == 0
+
+    with pytest.raises(ValueError, match='Unknown SDO type'):
+        batch.run([sdo_read(0, 0x6060, 0, 'int24')])
+
+
+def test_sdo_batch_retries_busy_mailbox_and_timeout_aborts(wmx3_api, handlers):
+    slaves = FakeSdoSlaves(handlers, {(0, 0x6041, 0): b'\x37\x02', (1, 0x6041, 0): b'\x50\x02'})
+    slaves.busy[(0, 0x6041, 0)] = 2
+    slaves.aborts[(1, 0x6041, 0)] = 3
+    batch = SdoBatch(wmx3_api, retries=2, retry_delay=0)
+    results = batch.run([sdo_read(0, 0x6041, 0, 'uint16'), sdo_read(1, 0x6041, 0, 'uint16')])
+    assert results[0] == (0x237, None, None)
+    assert results[1] == (None, SDO_ABORT_TIMEOUT, ERROR)
+    metrics = batch.metrics()
+    assert (metrics[0]['retries'], metrics[0]['failures']) == (2, 0)
+    assert (metrics[1]['retries'], metrics[1]['failures']) == (2, 1)
+
+
+def test_sdo_batch_skips_rest_of_failed_slave(wmx3_api, handlers):
+    FakeSdoSlaves(handlers, {(0, 0x6060, 0): b'\x08', (1, 0x6060, 0): b'\x08'})
+    errors = queue.Queue()
+    batch = SdoBatch(wmx3_api, retries=0, error_queue=errors)
+    operations = [sdo_read(0, 0x1000, 0, 'uint32'), sdo_read(0, 0x6060, 0, 'int8'), sdo_read(1, 0x6060, 0, 'int8')]
+
+    results = batch.run(operations)
+    assert results == [(None, 0x06020000, ERROR), (None, None, 'skipped'), (8, None, None)]
+    assert 'SDO 0x1000:0 on slave 0' in errors.get_nowait()
+    assert batch.metrics()[0]['skipped'] == 1
+
+    assert batch.run(operations, stop_on_error=False)[1] == (8, None, None)
+
+
+class FakeNetwork:
+    """EtherCAT master with a list of slave dicts: identity fields plus 'axes' of {'axis', 'pdo'}."""
+    def __init__(self, handlers, slaves):
+        self.slaves = slaves
+        self.scans = 0
+        handlers['Ecat_ScanNetwork'] = self.scan
+        handlers['Ecat_GetMasterInfo'] = self.get_master_info
+
+    def scan(self, ecat):
+        self.scans += 1
+        return 0
+
+    def get_master_info(self, ecat, info):
+        info.numOfSlaves = len(self.slaves)
+        for index, slave in enumerate(self.slaves):
+            slave_info = WMX3ApiPython.EcSlaveInfo()
+            for name, value in slave.items():
+                if name != 'axes':
+                    setattr(slave_info, name, value)
+            slave_info.numOfAxes = len(slave['axes'])
+            for axis_number, axis in enumerate(slave['axes']):
+                axis_info = WMX3ApiPython.EcSlaveAxisInfo()
+                axis_info.axisIndex = axis['axis']
+                for name, (size, offset) in axis['pdo'].items():
+                    entry = getattr(axis_info.pdoInfo, name)
+                    entry.enable, entry.size, entry.offset = 1, size, offset
+                slave_info.SetAxisInfo(axis_number, axis_info)
+            info.SetSlaves(index, slave_info)
+        return 0
+
+
+def drive(slave_id, serial, input_addr, output_addr):
+    return {'id': slave_id, 'position': slave_id, 'vendorId': 0x66F, 'productCode': 0x5100, 'revisionNo': 1,
+            'serialNo': serial, 'inputAddr': input_addr, 'inputSize': 10, 'outputAddr': output_addr,
+            'outputSize': 8, 'axes': [{'axis': slave_id,
+                                       'pdo': {'statusWord': (2, 0), 'positionActualValue': (4, 3),
+                                               'controlWord': (2, 0), 'targetPosition': (4, 2)}}]}
+
+
+def drive_dictionary(slave_id):
+    """SDO objects of a drive: RxPDO 0x1600 (6040, 607A), TxPDO 0x1A00 (6041, 8 bits padding, 6064)."""
+    objects = {
+        (0x1C12, 0, 'uint8', 1), (0x1C12, 1, 'uint16', 0x1600), (0x1600, 0, 'uint8', 2),
+        (0x1600, 1, 'uint32', 0x60400010), (0x1600, 2, 'uint32', 0x607A0020),
+        (0x1C13, 0, 'uint8', 1), (0x1C13, 1, 'uint16', 0x1A00), (0x1A00, 0, 'uint8', 3),
+        (0x1A00, 1, 'uint32', 0x60410010), (0x1A00, 2, 'uint32', 0x00000008), (0x1A00, 3, 'uint32', 0x60640020),
+        (0x6072, 0, 'uint16', 3000), (0x1008, 0, 'bytes', b'drive'),
+    }
+    return {(slave_id, index, subindex): encode_sdo(sdo_type, value) for index, subindex, sdo_type, value in objects}
+
+
+def test_pdo_layout_skips_padding():
+    mapping = [(0x6041, 0, 16), (0, 0, 4), (0x60FD, 1, 1), (0x60FD, 2, 3), (0x6064, 0, 32)]
+    assert pdo_layout(mapping, 100) == [(0x6041, 0, 100, 0, 16), (0x60FD, 1, 102, 4, 1), (0x60FD, 2, 102, 5, 3),
+                                        (0x6064, 0, 103, 0, 32)]
+
+
+def test_topology_hash_and_device_key():
+    a = {'id': 0, 'vendorId': 0x66F, 'productCode': 0x5100, 'revisionNo': 1}
+    assert topology_hash([a]) == topology_hash([dict(reversed(list(a.items())))])
+    assert topology_hash([a]) != topology_hash([dict(a, id=1)])
+    assert device_key(a) == '0000066F:00005100:00000001'
+
+
+def test_topology_cache_scans_and_indexes(wmx3_api, handlers, tmp_path):
+    network = FakeNetwork(handlers, [drive(0, 11, 0, 0), drive(1, 12, 10, 8)])
+    sdo = FakeSdoSlaves(handlers, {**drive_dictionary(0), **drive_dictionary(1)})
+    path = str(tmp_path / 'topology.json')
+    cache = EcatTopologyCache(wmx3_api, path, SdoBatch(wmx3_api, retry_delay=0),
+                              objects=[(0x6072, 0, 'uint16'), (0x1008, 0, 'bytes')])
+    assert cache.scan()
+    # The dictionary is read once per device type, from its first slave
+    assert {key[0] for key in sdo.calls} == {0}
+    assert cache.dictionary(1) == {'objects': {'6072:0': 3000},
+                                   'output': [[0x6040, 0, 16], [0x607A, 0, 32]],
+                                   'input': [[0x6041, 0, 16], [0, 0, 8], [0x6064, 0, 32]]}
+
+    assert cache.slave(1)['serialNo'] == 12
+    assert cache.axis(1) == (1, 0)
+    assert cache.pdo_entry(1, 'positionActualValue')['address'] == 13
+    assert cache.pdo_entry(1, 0x6064)['address'] == 13
+    assert cache.at_address('output', 10)['name'] == 'targetPosition'
+    # EcSlavePdoInfo entries take precedence over the PDO mapping at the same address
+    assert cache.at_address('input', 13)['name'] == 'positionActualValue'
+    assert cache.at_address('input', 20) is None
+
+    sdo.calls.clear()
+    assert not cache.scan()
+    assert network.scans == 2 and not sdo.calls
+
+    cached = EcatTopologyCache(wmx3_api, path)
+    assert cached.load()
+    assert cached.pdo_entry(0, 0x6041)['bits'] == 16
+    assert not cached.scan(scan_network=False)
+
+    network.slaves[1]['serialNo'] = 13
+    assert cached.scan()
+    assert cached.slave(1)['serialNo'] == 13
+    assert cached.dictionary(1) is None
+    assert not EcatTopologyCache(wmx3_api, str(tmp_path / 'missing.json')).load()
+
+
+class FakeProcessImage:
+    """Io input and output bytes; GetInBytes returns them as signed chars, like the engine."""
+    def __init__(self, handlers, size=64):
+        self.images = {'input': bytearray(size), 'output': bytearray(size)}
+        self.reads = []
+        self.fail = False
+        handlers['Io_GetInBytes'] = self.reader('input')
+        handlers['Io_GetOutBytes'] = self.reader('output')
+
+    def reader(self, image):
+        def read(io, addr, size, data):
+            self.reads.append((image, addr, size))
+            if self.fail:
+                return ERROR
+            for position, byte in enumerate(self.images[image][addr:addr + size]):
+                data[position] = byte - 256 if byte > 127 else byte
+            return 0
+        return read
+
+    def put(self, image, address, dtype, value):
+        data = np.array([value], dtype=dtype).tobytes()
+        self.images[image][address:address + len(data)] = data
+
+
+@pytest.fixture
+def topology(wmx3_api, handlers, tmp_path):
+    FakeNetwork(handlers, [drive(0, 11, 0, 0), drive(1, 12, 10, 8)])
+    FakeSdoSlaves(handlers, drive_dictionary(0))
+    topology = EcatTopologyCache(wmx3_api, str(tmp_path / 'topology.json'), SdoBatch(wmx3_api, retry_delay=0))
+    topology.scan()
+    return topology
+
+
+def test_pdo_image_refresh_and_values(wmx3_api, handlers, topology):
+    process = FakeProcessImage(handlers)
+    image = PdoImage(wmx3_api, topology)
+    assert image.spans == {'input': (0, 20), 'output': (0, 16)}
+    assert image.views[(1, 'positionActualValue')].dtype == np.dtype('<i4')
+
+    process.put('input', 13, '<i4', -123456)
+    process.put('input', 10, '<u2', 0x8637)
+    process.put('input', 3, '<i4', 7)
+    process.put('output', 10, '<i4', 5000)
+    image.refresh()
+    assert process.reads == [('input', 0, 20), ('output', 0, 16)]
+    assert image.value(1, 'positionActualValue') == -123456
+    assert image.value(1, 'statusWord') == 0x8637
+    assert image.value(1, 0x6064) == -123456
+    assert image.value(0, 0x6064) == 7
+    assert image.value(1, 'targetPosition') == 5000
+
+    process.put('input', 13, '<i4', 42)
+    image.refresh(outputs=False)
+    assert process.reads[-1] == ('input', 0, 20) and image.refresh_count == 2
+    assert image.value(1, 'positionActualValue') == 42
+
+    slaves, values = image.column('positionActualValue')
+    assert slaves.tolist() == [0, 1] and values.tolist() == [7, 42]
+    assert image.column(0x6041, slaves=[1])[1].tolist() == [0x8637]
+    assert image.column('digitalInput')[0].size == 0
+
+
+def test_pdo_image_bit_entries_and_types(wmx3_api, handlers, topology):
+    process = FakeProcessImage(handlers)
+    for slave_id, address in ((0, 2), (1, 12)):
+        topology.by_object[(slave_id, 0x60FD, 1)] = {'slave': slave_id, 'index': 0x60FD, 'subindex': 1,
+                                                     'image': 'input', 'address': address, 'bit': 4, 'bits': 3}
+    image = PdoImage(wmx3_api, topology, slaves=[1], types={(1, 'statusWord'): '<i2'})
+    assert image.spans == {'input': (10, 10), 'output': (8, 8)}
+    assert (1, 0x60FD, 1) not in image.views and (0, 0x60FD, 1) not in image.entries
+
+    process.put('input', 10, '<u2', 0xFFFF)
+    process.put('input', 12, '<u1', 0b01010000)
+    image.refresh()
+    assert image.value(1, 'statusWord') == -1
+    assert image.value(1, 0x60FD, 1) == 0b101
+    assert image.column(0x60FD, 1)[1].tolist() == [0b101]
+
+
+def test_pdo_image_read_error(wmx3_api, handlers, topology):
+    process = FakeProcessImage(handlers)
+    process.fail = True
+    errors = queue.Queue()
+    image = PdoImage(wmx3_api, topology, error_queue=errors)
+    with pytest.raises(RuntimeError):
+        image.refresh()
+    assert 'GetInBytes' in errors.get_nowait()
+    assert image.refresh_count == 0
@@ -0,0 +1,410 @@
+import queue
+
+import numpy as np
+import pytest
+
+from WMX3ApiPython import (CoreMotionAxisStatus, CoreMotionEventInput, CoreMotionEventInputType,
+                           EventControl_ComparisonType, IoEventOutput, IoEventOutputType, constants)
+from WMX3EventControlPython import (HARDWARE_PROBE, SOFTWARE_PROBE, EventTable, PlannedVelocityOverride, PSOJob,
+                                    TouchProbeCapture, check_pso_positions,
+                                    curvature_velocity, event_spec, flatten_struct, limit_velocity_changes,
+                                    process_map_velocity, pso_min_spacing, resample_velocity_profile,
+                                    struct_fingerprint)
+
+
+class FakePSO:
+    """
+    Fake PSO channel: the loaded data are replaced by each SetPSOMultipleData call
+    and activeDataIndex counts the points of the last upload fired so far.
+    """
+    def __init__(self, handlers):
+        self.data = []
+        self.uploads = []
+        self.fired_position = -np.inf
+        self.position = 0.0
+        handlers['EventControl_SetPSOConfig'] = lambda control, *args: 0
+        handlers['EventControl_SetPSOMultipleData'] = self.set_data
+        handlers['EventControl_GetPSOStatus'] = self.get_status
+        handlers['EventControl_StartPSO'] = lambda control, channel: 0
+        handlers['EventControl_StopPSO'] = lambda control, channel: 0
+        handlers['CoreMotion_GetStatus'] = self.get_motion_status
+
+    def set_data(self, control, channel, count, data):
+        self.data = [data[index] for index in range(count)]
+        self.uploads.append(self.data)
+        return 0
+
+    def get_status(self, control, channel, status):
+        status.activeDataIndex = sum(1 for value in self.data if value <= self.fired_position)
+        return 0
+
+    def get_motion_status(self, core_motion, status):
+        axis_status = CoreMotionAxisStatus()
+        axis_status.posCmd = self.position
+        status.SetAxesStatus(0, axis_status)
+        return 0
+
+    def move_to(self, position):
+        """Move the source, firing every loaded point at or below position."""
+        self.position = self.fired_position = position
+
+
+def test_pso_min_spacing():
+    assert pso_min_spacing(-500.0, 1.0) == 0.5
+
+
+def test_check_pso_positions():
+    assert check_pso_positions([0.0, 1.0, 3.0]) == 1.0
+    assert check_pso_positions([3.0, 1.0], direction=-1) == 2.0
+    with pytest.raises(ValueError, match='not finite'):
+        check_pso_positions([0.0, np.nan])
+    with pytest.raises(ValueError, match='direction of travel'):
+        check_pso_positions([0.0, 2.0, 1.0])
+    with pytest.raises(ValueError, match='closer than'):
+        check_pso_positions([0.0, 0.1, 1.0], min_spacing=0.5)
+
+
+def test_pso_job_constructs(wmx3_api):
+    job = PSOJob(wmx3_api, 0)
+    assert job.window_points == constants.maxPsoData
+
+
+def test_pso_refill_tracks_window_relative_index(wmx3_api, handlers):
+    pso = FakePSO(handlers)
+    job = PSOJob(wmx3_api, 0, window_points=4, refill_fraction=0.5)
+    job.configure(axis=0)
+    job.positions = np.arange(10, dtype=np.float64)
+    job.ordered = job.positions
+    job.load_window(0)
+    assert pso.uploads[-1] == [0.0, 1.0, 2.0, 3.0]
+
+    # Half the window fired: reload from the next unfired position.
+    pso.move_to(1.5)
+    assert job.refill()
+    assert job.last_margin_points == 2
+    assert pso.uploads[-1] == [2.0, 3.0, 4.0, 5.0]
+    assert (job.window_start, job.fired_count, job.missed_count) == (2, 2, 0)
+
+    # One point into the new window: the index counts from that upload.
+    pso.move_to(2.5)
+    assert job.refill()
+    assert (job.fired_count, job.last_margin_points, job.load_count) == (3, 3, 2)
+
+    # The source passed position 5 before the reload: it is skipped and counted as missed.
+    pso.move_to(3.5)
+    pso.position = 5.5
+    assert job.refill()
+    assert pso.uploads[-1] == [6.0, 7.0, 8.0, 9.0]
+    assert (job.window_start, job.fired_count, job.missed_count) == (6, 4, 2)
+    assert job.min_margin_points == 2
+
+    # The last window is not reloaded and does not lower the margin of pending data.
+    pso.move_to(8.5)
+    assert job.refill()
+    assert job.load_count == 3
+    assert job.last_margin_points == 1
+    assert job.min_margin_points == 2
+
+    pso.move_to(9.0)
+    assert not job.refill()
+    metrics = job.metrics()
+    assert (metrics['positions'], metrics['fired'], metrics['missed']) == (10, 8, 2)
+
+
+def test_pso_job_runs_to_completion(wmx3_api, handlers):
+    pso = FakePSO(handlers)
+    job = PSOJob(wmx3_api, 0, window_points=8, interval=0.001)
+    job.configure(axis=0)
+    job.start(np.linspace(0.0, 31.0, 32))
+    assert pso.uploads[0] == [float(value) for value in range(8)]
+    for position in np.arange(0.0, 32.0, 0.5):
+        pso.move_to(position)
+        job.stop_event.wait(0.002)
+    assert job.wait(2.0)
+    job.stop()
+    metrics = job.metrics()
+    assert metrics['fired'] + metrics['missed'] == 32
+    assert metrics['loads'] >= 4
+
+
+def test_curvature_velocity():
+    angles = np.linspace(0.0, np.pi / 2, 10)
+    arc = np.column_stack((2.0 * np.cos(angles), 2.0 * np.sin(angles)))
+    path = np.concatenate((arc, arc[-1] + [[-1.0, 0.0], [-2.0, 0.0]]))
+    pos, velocity = curvature_velocity(path, 10.0, 8.0)
+    assert pos[-1] == pytest.approx(np.pi + 2.0, rel=1e-2)
+    # v = sqrt(a * r) on the arc, the maximum on straight stretches and the end points.
+    assert velocity[1:9] == pytest.approx(np.full(8, 4.0), rel=1e-9)
+    assert velocity[[0, 10, 11]].tolist() == [10.0, 10.0, 10.0]
+    assert curvature_velocity(path, 10.0, 8.0, source_column=1)[0].tolist() == path[:, 1].tolist()
+
+
+def test_process_map_velocity():
+    velocity = process_map_velocity([0.0, 5.0, 20.0], [0.0, 10.0], [100.0, 50.0], max_velocity=80.0)
+    assert velocity.tolist() == [80.0, 75.0, 50.0]
+
+
+def test_limit_velocity_changes():
+    pos = np.arange(6.0)
+    velocity = limit_velocity_changes(pos, [0.0, 10.0, 10.0, 10.0, 10.0, 0.0], max_acc=2.0)
+    assert velocity.tolist() == pytest.approx([0.0, 2.0, np.sqrt(8.0), np.sqrt(8.0), 2.0, 0.0])
+    squared_steps = np.abs(np.diff(velocity ** 2))
+    assert np.all(squared_steps <= 2.0 * 2.0 + 1e-9)
+
+
+def test_resample_velocity_profile():
+    pos, velocity = resample_velocity_profile(np.arange(6.0), [5.0, 5.0, 3.0, 3.0, 3.0, 4.0], 4)
+    assert (pos.tolist(), velocity.tolist()) == ([0.0, 2.0, 5.0], [5.0, 3.0, 4.0])
+
+    pos, velocity = resample_velocity_profile(np.arange(100.0), np.arange(100.0) % 7, 10)
+    assert pos.size <= 10 and pos[0] == 0.0
+    # Each kept point holds the lowest velocity of the points it replaces.
+    assert velocity.tolist() == [0.0] * pos.size
+
+
+def test_planned_velocity_override(wmx3_api, handlers):
+    uploads = []
+
+    def set_data(control, channel, count, data_array):
+        uploads.append([(data_array[index].pos, data_array[index].velocity) for index in range(count)])
+        return 0
+
+    def get_status(control, channel, status):
+        status.active = 1
+        status.activeDataIndex = 1
+        return 0
+
+    handlers['EventControl_SetPlannedVelOverrideConfig'] = lambda control, channel, comparison, source, axis: 0
+    handlers['EventControl_SetPlannedVelOverrideMultipleData'] = set_data
+    handlers['EventControl_StartPlannedVelOverride'] = lambda control, channel: 0
+    handlers['EventControl_GetPlannedVelOverrideStatus'] = get_status
+    override = PlannedVelocityOverride(wmx3_api, 0, max_tables=1)
+    assert override.max_points == constants.maxPveloData
+    override.configure(1, comparison_type=EventControl_ComparisonType.NegativeDirection)
+
+    def build(length):
+        return -np.arange(length), np.repeat([5.0, 3.0], length // 2)
+
+    table = override.compile('part-a', build, 4)
+    assert override.compile('part-a', build, 4) is table
+    override.start(table)
+    assert uploads == [[(0.0, 5.0), (-2.0, 3.0)]]
+    status = override.status()
+    assert (status['pos'], status['progress']) == (-2.0, 0.5)
+
+    with pytest.raises(ValueError, match='direction of travel'):
+        override.compile('part-b', lambda: ([0.0, 1.0], [1.0, 2.0]))
+    with pytest.raises(ValueError, match='negative'):
+        override.compile('part-c', lambda: ([0.0, -1.0], [1.0, -2.0]))
+    assert (override.hit_count, override.miss_count) == (1, 3)
+
+
+class FakeEventEngine:
+    """Engine event table: id -> {'enabled', 'inputFunction'} as read back by GetEvent."""
+    def __init__(self, handlers):
+        self.events = {}
+        self.calls = []
+        handlers['EventControl_GetAllEventID'] = self.get_all_event_id
+        handlers['EventControl_GetEvent'] = self.get_event
+        handlers['EventControl_SetEvent_ID'] = self.set_event
+        handlers['EventControl_EnableEvent'] = self.enable_event
+        handlers['EventControl_RemoveEvent'] = self.remove_event
+
+    def get_all_event_id(self, control, all_event_id):
+        all_event_id.count = len(self.events)
+        for index, event_id in enumerate(sorted(self.events)):
+            all_event_id.SetId(index, event_id)
+        return 0
+
+    def get_event(self, control, event_id, event):
+        for name, value in self.events[event_id].items():
+            setattr(event, name, value)
+        return 0
+
+    def set_event(self, control, id_pointer, event_input, event_output, event_id):
+        self.calls.append(('set', event_id))
+        self.events[event_id] = {'enabled': 1, 'inputFunction': int(event_input.greaterPos.pos)}
+        id_pointer.assign(event_id)
+        return 0
+
+    def enable_event(self, control, event_id, enable):
+        self.calls.append(('enable', event_id, enable))
+        self.events[event_id]['enabled'] = enable
+        return 0
+
+    def remove_event(self, control, event_id):
+        self.calls.append(('remove', event_id))
+        del self.events[event_id]
+        return 0
+
+
+def greater_pos_event(pos, enabled=True, event_id=None):
+    event_input = CoreMotionEventInput()
+    event_input.inputFunction = CoreMotionEventInputType.GreaterPos
+    event_input.greaterPos.axis = 0
+    event_input.greaterPos.pos = pos
+    event_output = IoEventOutput()
+    event_output.type = IoEventOutputType.SetIOOutBit
+    event_output.setIOOutBit.byteAddress = 1
+    return event_spec(event_input, event_output, enabled, event_id=event_id)
+
+
+def test_flatten_struct_and_fingerprint():
+    event_input = greater_pos_event(5.0)[0]
+    values = flatten_struct(event_input)
+    assert values['greaterPos.pos'] == 5.0
+    assert values['greaterPos.axis'] == 0
+    assert struct_fingerprint(event_input) == struct_fingerprint(greater_pos_event(5.0)[0])
+    assert struct_fingerprint(event_input) != struct_fingerprint(greater_pos_event(6.0)[0])
+    assert struct_fingerprint(event_input, exclude=('greaterPos.pos',)) == struct_fingerprint(
+        greater_pos_event(6.0)[0], exclude=('greaterPos.pos',))
+
+
+def test_event_table_reconciles(wmx3_api, handlers):
+    engine = FakeEventEngine(handlers)
+    engine.events[0] = {'enabled': 1, 'inputFunction': 7}
+    table = EventTable(wmx3_api, id_range=range(4), max_age=0.0)
+
+    desired = {'a': greater_pos_event(10.0), 'b': greater_pos_event(20.0, event_id=3)}
+    assert table.apply(desired) == [('set', 'a', 1), ('set', 'b', 3)]
+    # Nothing changed: no calls.
+    assert table.apply(desired) == []
+
+    desired['a'] = greater_pos_event(10.0, enabled=False)
+    desired['b'] = greater_pos_event(25.0, event_id=3)
+    assert table.apply(desired) == [('disable', 'a', 1), ('set', 'b', 3)]
+
+    # An engine copy changed behind the table's back is rewritten.
+    engine.events[1]['inputFunction'] = 99
+    del desired['b']
+    assert table.apply(desired) == [('set', 'a', 1), ('remove', 'b', 3)]
+    assert engine.events[1] == {'enabled': 0, 'inputFunction': 10}
+    # Events the table did not create are left alone.
+    assert sorted(engine.events) == [0, 1]
+
+    restored = EventTable(wmx3_api, id_range=range(4))
+    restored.load_state(table.state())
+    assert restored.plan(desired) == []
+
+
+def test_event_table_id_conflicts(wmx3_api, handlers):
+    FakeEventEngine(handlers)
+    table = EventTable(wmx3_api, id_range=range(1))
+    with pytest.raises(ValueError, match='No free event ID'):
+        table.plan({'a': greater_pos_event(1.0), 'b': greater_pos_event(2.0)})
+    table.apply({'a': greater_pos_event(1.0)})
+    with pytest.raises(ValueError, match='both use ID 0'):
+        table.plan({'a': greater_pos_event(1.0), 'b': greater_pos_event(2.0, event_id=0)})
+    assert table.metrics()['cached_reads'] > 0
+
+
+def test_event_table_hands_pinned_id_to_new_name(wmx3_api, handlers):
+    engine = FakeEventEngine(handlers)
+    table = EventTable(wmx3_api, id_range=range(4), max_age=0.0)
+    table.apply({'old': greater_pos_event(1.0, event_id=2)})
+    # 'old' goes away and 'new' takes over its pinned ID: the ID is rewritten, not removed.
+    assert table.apply({'new': greater_pos_event(5.0, event_id=2)}) == [('set', 'new', 2)]
+    assert engine.events == {2: {'enabled': 1, 'inputFunction': 5}}
+    assert table.ids == {'new': 2}
+    assert table.apply({'new': greater_pos_event(5.0, event_id=2)}) == []
+
+
+class FakeTouchProbes:
+    """Software probes as {channel: [latched, value]} and hardware probes as {channel: [positions]}."""
+    def __init__(self, handlers):
+        self.software = {}
+        self.hardware = {}
+        self.cycle_counter = 1000
+        self.enables = []
+        handlers['WMX3Api_GetEngineStatus'] = self.get_engine_status
+        handlers['EventControl_GetSoftwareTouchProbeCounterValue'] = self.get_counter_value
+        handlers['EventControl_GetHardwareTouchProbeStatus'] = self.get_hardware_status
+        handlers['EventControl_EnableSoftwareTouchProbe'] = self.enable('software')
+        handlers['EventControl_EnableHardwareTouchProbe'] = self.enable('hardware')
+
+    def get_engine_status(self, api, status):
+        status.interrupts.cycleCounter = self.cycle_counter
+        return 0
+
+    def get_counter_value(self, control, channel, latched, value):
+        latched.assign(self.software[channel][0])
+        value.assign(self.software[channel][1])
+        return 0
+
+    def get_hardware_status(self, control, channel, status):
+        positions = self.hardware[channel]
+        status.axis = 5
+        status.latched = 1 if positions else 0
+        status.latchedValueCount = len(positions)
+        for index, position in enumerate(positions):
+            status.SetLatchedPos(index, position)
+        return 0
+
+    def enable(self, kind):
+        def call(control, index, enable):
+            self.enables.append((kind, index, enable))
+            if kind == 'software' and not enable:
+                self.software[index][0] = 0
+            if kind == 'hardware' and not enable:
+                for positions in self.hardware.values():
+                    positions.clear()
+            return 0
+        return call
+
+
+def test_touch_probe_software_latches(wmx3_api, handlers):
+    probes = FakeTouchProbes(handlers)
+    probes.software[2] = [0, 0.0]
+    capture = TouchProbeCapture(wmx3_api, auto_rearm=False)
+    capture.add_software_probe(2, axis=1)
+    assert capture.poll() == 0
+
+    probes.software[2] = [1, 12.5]
+    assert capture.poll() == 1
+    assert capture.poll() == 0
+    # Still latched, but the counter value changed: a new latch.
+    probes.software[2][1] = 13.0
+    probes.cycle_counter = 2000
+    assert capture.poll() == 1
+    records = capture.batch()
+    assert records['position'].tolist() == [12.5, 13.0]
+    assert records['cycle_counter'].tolist() == [1000, 2000]
+    assert set(records['kind'].tolist()) == {SOFTWARE_PROBE}
+    assert records['axis'].tolist() == [1, 1]
+
+
+def test_touch_probe_hardware_latches_and_rearm(wmx3_api, handlers):
+    probes = FakeTouchProbes(handlers)
+    probes.hardware[0] = [1.0, 2.0]
+    capture = TouchProbeCapture(wmx3_api, queue_size=2)
+    capture.add_hardware_probe(0)
+    assert capture.poll() == 2
+    assert probes.enables == [('hardware', 5, 0), ('hardware', 5, 1)]
+
+    probes.hardware[0] = [3.0]
+    capture.poll()
+    metrics = capture.metrics()
+    assert (metrics['latches'], metrics['dropped'], metrics['rearms']) == (2, 1, 2)
+    assert [record[2:] for record in capture.stream(timeout=0.0)] == [
+        (HARDWARE_PROBE, 0, 5, 1.0), (HARDWARE_PROBE, 0, 5, 2.0)]
+
+
+def test_touch_probe_reports_crash(wmx3_api, handlers):
+    probes = FakeTouchProbes(handlers)
+    probes.software[0] = [1, 1.0]
+
+    def broken(control, channel, latched, value):
+        raise ZeroDivisionError('counter')
+
+    handlers['EventControl_GetSoftwareTouchProbeCounterValue'] = broken
+    errors = queue.Queue()
+    capture = TouchProbeCapture(wmx3_api, interval=0.001, error_queue=errors)
+    capture.add_software_probe(0, axis=0)
+    capture.start()
+    capture.capture_thread.join(2.0)
+    metrics = capture.metrics()
+    assert not metrics['running']
+    assert metrics['errors'] == 1
+    assert 'ZeroDivisionError' in metrics['last_error']
+    assert errors.get_nowait() == metrics['last_error']
+    capture.stop()
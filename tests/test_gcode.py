@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from WMX3GcodePython import (GcodeImporter, arc_fit, circumcircle, find_arcs, parse_gcode_line,
+                             segment_distances, simplify_polyline)
+
+
+def arc_points(count, radius=10.0, sweep=np.pi, z=0.0):
+    angles = np.linspace(0.0, sweep, count)
+    return np.column_stack((radius * np.cos(angles), radius * np.sin(angles), np.full(count, z)))
+
+
+def test_parse_gcode_line():
+    assert parse_gcode_line('g1 x1.5 Y-.5 (comment X9) F100 ; Z3') == [
+        ('G', 1.0), ('X', 1.5), ('Y', -0.5), ('F', 100.0)]
+    assert parse_gcode_line('; only a comment') == []
+
+
+def test_simplify_polyline_within_tolerance():
+    rng = np.random.default_rng(0)
+    points = np.column_stack((np.linspace(0.0, 10.0, 200), rng.normal(0.0, 0.01, 200), np.zeros(200)))
+    points[100, 1] = 1.0
+    kept = simplify_polyline(points, 0.05)
+    assert kept[0] == 0 and kept[-1] == 199
+    assert 100 in kept
+    assert len(kept) < 20
+    for first, last in zip(kept[:-1], kept[1:]):
+        assert segment_distances(points[first:last + 1], points[first], points[last]).max() <= 0.05
+
+
+def test_circumcircle():
+    center, radius, normal = circumcircle(np.array([1.0, 0, 0]), np.array([0, 1.0, 0]), np.array([-1.0, 0, 0]))
+    assert center == pytest.approx([0, 0, 0])
+    assert radius == pytest.approx(1.0)
+    assert normal == pytest.approx([0, 0, 1])
+    assert circumcircle(np.zeros(3), np.ones(3), 2 * np.ones(3)) is None
+
+
+def test_arc_fit():
+    center, normal, sweep = arc_fit(arc_points(20), 1e-6)
+    assert center == pytest.approx([0, 0, 0], abs=1e-9)
+    assert sweep == pytest.approx(np.pi)
+    assert arc_fit(arc_points(20)[::-1], 1e-6)[1] == pytest.approx([0, 0, -1])
+
+    # A full turn, a wobbly arc and a nearly straight arc are rejected.
+    assert arc_fit(arc_points(40, sweep=2 * np.pi), 1e-6) is None
+    wobbly = arc_points(20)
+    wobbly[5] *= 1.01
+    assert arc_fit(wobbly, 1e-3) is None
+    assert arc_fit(arc_points(5, radius=1000.0, sweep=1e-4), 1e-3) is None
+
+
+def test_find_arcs():
+    line = np.column_stack((np.linspace(-10.0, 10.0, 10), np.full(10, -10.0), np.zeros(10)))
+    points = np.concatenate((line, arc_points(30, radius=10.0, sweep=np.pi / 2)[:, [1, 0, 2]] + [10.0, -10.0, 0.0]))
+    arcs = find_arcs(points, 1e-6)
+    assert len(arcs) == 1
+    first, last, center, _ = arcs[0]
+    assert (first, last) == (10, 39)
+    assert center == pytest.approx([10.0, -10.0, 0.0], abs=1e-6)
+
+    # With min_points=3 any corner is an arc; the real arc is still found whole.
+    arcs = find_arcs(points, 1e-6, 3)
+    assert arcs[-1][:2] == (10, 39)
+    assert all(last <= 10 for _, last, _, _ in arcs[:-1])
+
+
+def test_find_arcs_limits():
+    assert find_arcs(arc_points(3), 1e-6, 3)[0][:2] == (0, 2)
+    assert find_arcs(arc_points(4), 1e-6) == []
+    with pytest.raises(ValueError):
+        find_arcs(arc_points(10), 1e-6, 2)
+
+
+@pytest.mark.parametrize('line', ['G4 P250', 'P250 G4', 'G04 P250 (dwell)'])
+def test_parse_dwell(line):
+    moves = list(GcodeImporter().parse([line]))
+    assert moves == [('dwell', 250.0)]
+
+
+def test_parse_modes():
+    importer = GcodeImporter(axis_letters='XY', rapid_velocity=500.0)
+    moves = list(importer.parse(['G0 X1 Y1', 'G1 X2 F600', 'G91 X1 Y-1', 'G90 G2 X4 Y0 I0 J-1', '', 'F60']))
+    assert [move[0] for move in moves] == ['rapid', 'line', 'line', 'arc']
+    assert moves[0][2] == 500.0
+    assert moves[1][1].tolist() == [2.0, 1.0, 0.0]
+    assert moves[1][2] == 10.0
+    assert moves[2][1].tolist() == [3.0, 0.0, 0.0]
+    _, end, center, clockwise, velocity = moves[3]
+    assert (end.tolist(), center.tolist(), clockwise, velocity) == ([4.0, 0.0, 0.0], [3.0, -1.0, 0.0], True, 10.0)
+    assert importer.line_count == 6
+    assert importer.input_count == 4
+
+
+@pytest.mark.parametrize('line, message', [('G2 X1 Y1 R1', 'only I/J'), ('G3 X1 Z1 I1', 'helical')])
+def test_parse_unsupported_arcs(line, message):
+    with pytest.raises(ValueError, match=message):
+        list(GcodeImporter().parse([line]))
+
+
+def test_segments_merge_lines_and_fit_arcs():
+    points = arc_points(60, radius=10.0, sweep=np.pi)
+    lines = ['G1 F600']
+    lines += [f'X{x:.6f} Y{y:.6f}' for x, y, _ in points[1:]]
+    lines += [f'X-10 Y{y:.1f}' for y in np.linspace(0.0, -10.0, 21)[1:]]
+    lines += ['G4 P100', 'G0 X0 Y0']
+    importer = GcodeImporter(start_position=(10.0, 0.0, 0.0), tolerance=1e-4)
+    segments = list(importer.segments(lines))
+    assert [segment[0] for segment in segments] == ['circular', 'linear', 'sleep', 'linear']
+    _, center, end, clockwise, velocity = segments[0]
+    assert center == pytest.approx((0.0, 0.0), abs=1e-6)
+    assert end == pytest.approx((-10.0, 0.0), abs=1e-6)
+    assert (clockwise, velocity) == (0, 10.0)
+    assert segments[1][1] == pytest.approx((-10.0, -10.0, 0.0))
+    assert importer.reduction_ratio() > 0.9
+
+
+def test_segments_without_arc_fitting():
+    lines = ['G1 F60 X1', 'X2', 'X3 Y0.00001', 'X3 Y1']
+    segments = list(GcodeImporter(fit_arcs=False, tolerance=0.001).segments(lines))
+    assert [segment[1] for segment in segments] == [(3.0, 0.00001, 0.0), (3.0, 1.0, 0.0)]
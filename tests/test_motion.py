@@ -0,0 +1,50 @@
+import pytest
+
+from WMX3ApiPython import ProfileType
+from WMX3MotionPython import MotionCommandCache, make_profile, profile_fields, profile_key
+
+
+def test_profile_key_round_trip():
+    key = profile_key({'velocity': 100.0, 'acc': 1000.0, 'dec': 500.0})
+    assert key[0] == ProfileType.Trapezoidal
+    assert profile_fields(key)['dec'] == 500.0
+    assert profile_key(profile_fields(key)) == key
+    profile = make_profile(key)
+    assert (profile.type, profile.velocity, profile.acc, profile.dec) == (ProfileType.Trapezoidal, 100.0,
+                                                                         1000.0, 500.0)
+    with pytest.raises(ValueError, match='Unknown Profile fields'):
+        profile_key({'speed': 1.0})
+
+
+def test_pos_command_template_is_reused():
+    cache = MotionCommandCache()
+    first = cache.pos_command(0, 10.0, velocity=100.0, acc=1000.0, dec=1000.0)
+    second = cache.pos_command(1, 20.0, velocity=100.0, acc=1000.0, dec=1000.0)
+    assert second is first
+    assert (second.axis, second.target, second.profile.velocity) == (1, 20.0, 100.0)
+    assert cache.miss_count == 2 and cache.hit_count == 1
+
+
+def test_build_pos_commands_broadcasts_and_shares_profiles():
+    cache = MotionCommandCache()
+    commands = cache.build_pos_commands([0, 1, 2, 3], [1.0, 2.0, 3.0, 4.0], velocities=[10.0, 20.0, 10.0, 20.0],
+                                        acc=100.0, dec=100.0)
+    assert [command.axis for command in commands] == [0, 1, 2, 3]
+    assert [command.target for command in commands] == [1.0, 2.0, 3.0, 4.0]
+    assert [command.profile.velocity for command in commands] == [10.0, 20.0, 10.0, 20.0]
+    assert all(command.profile.acc == 100.0 for command in commands)
+    assert len(cache.profiles) == 2
+
+    again = cache.build_pos_commands(5, [7.0, 8.0], velocity=10.0)
+    assert again[0] is commands[0]
+    assert [command.axis for command in again] == [5, 5]
+
+
+def test_build_linear_intpl_commands():
+    cache = MotionCommandCache()
+    commands = cache.build_linear_intpl_commands([2, 3], [[1.0, 2.0], [3.0, 4.0]], velocity=50.0, reuse=False)
+    assert len(commands) == 2
+    assert commands[1].axisCount == 2
+    assert [commands[1].GetAxis(index) for index in range(2)] == [2, 3]
+    assert [commands[1].GetTarget(index) for index in range(2)] == [3.0, 4.0]
+    assert commands[0].profile.velocity == 50.0
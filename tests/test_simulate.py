@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+
+import WMX3SimulatePython
+from WMX3ApiPython import CoreMotion, ErrorCode, Motion_SimulatePosCommand, ProfileType
+from WMX3MotionPython import MotionCommandCache
+from WMX3SimulatePython import ProfileSimulation, SimulationCache, compare_with_engine, simulation_from_commands
+
+
+def test_trapezoidal_timing():
+    simulation = ProfileSimulation(0.0, [100.0, -4.0], ProfileType.Trapezoidal, 10.0, 10.0, 10.0)
+    assert simulation.total_time_milliseconds == pytest.approx([11000.0, 2000.0 * np.sqrt(0.4)])
+    assert simulation.peak_velocity == pytest.approx([10.0, np.sqrt(40.0)])
+    assert simulation.cruise_time_milliseconds == pytest.approx([9000.0, 0.0])
+    assert simulation.feasible.all()
+
+    position, velocity = simulation.pos_at_time([0.0, 1000.0, 6000.0, 20000.0])
+    assert position[0] == pytest.approx([0.0, 5.0, 55.0, 100.0])
+    assert velocity[0] == pytest.approx([0.0, 10.0, 10.0, 0.0])
+    assert position[1, -1] == pytest.approx(-4.0)
+    assert velocity[1, 1] < 0
+
+
+def test_scurve_timing():
+    simulation = ProfileSimulation(0.0, 100.0, ProfileType.SCurve, 10.0, 10.0, 10.0)
+    assert simulation.acc_time_milliseconds == pytest.approx([2000.0])
+    assert simulation.total_time_milliseconds == pytest.approx([12000.0])
+
+
+@pytest.mark.parametrize('profile_type, options', [
+    (ProfileType.Trapezoidal, {}),
+    (ProfileType.SCurve, {}),
+    (ProfileType.JerkRatio, {'jerk_acc_ratio': 0.5, 'jerk_dec_ratio': 0.25}),
+    (ProfileType.JerkLimited, {'jerk_acc': 40.0, 'jerk_dec': 20.0}),
+])
+def test_profile_is_continuous(profile_type, options):
+    simulation = ProfileSimulation(0.0, [50.0, 3.0], profile_type, 10.0, 10.0, 8.0, **options)
+    times = np.linspace(0.0, simulation.total_time_milliseconds.max(), 4001)
+    position, velocity = simulation.pos_at_time(times)
+    assert position[:, -1] == pytest.approx([50.0, 3.0])
+    assert np.all(np.diff(position, axis=1) >= -1e-9)
+    assert velocity.max() <= 10.0 + 1e-9
+    # The velocity is the derivative of the position.
+    numeric = np.gradient(position, times / 1000.0, axis=1)
+    assert np.abs(numeric - velocity)[:, 1:-1].max() < 0.05
+
+
+def test_time_at_pos_inverts_pos_at_time():
+    simulation = ProfileSimulation([0.0, 10.0], [100.0, 0.0], ProfileType.SCurve, 10.0, 10.0, 10.0)
+    move_time, remain_time = simulation.time_at_pos([40.0, 5.0])
+    position, _ = simulation.pos_at_time(move_time[:, None])
+    assert position[:, 0] == pytest.approx([40.0, 5.0], abs=1e-6)
+    assert move_time + remain_time == pytest.approx(simulation.total_time_milliseconds)
+    assert np.isnan(simulation.time_at_pos([200.0, 5.0])[0][0])
+
+
+def test_unsupported_profile_type():
+    with pytest.raises(ValueError, match='can be simulated offline'):
+        ProfileSimulation(0.0, 1.0, ProfileType.ParabolicVelocity, 1.0, 1.0, 1.0)
+
+
+def test_compare_with_engine(wmx3_api, handlers):
+    commands = MotionCommandCache().build_pos_commands(0, [10.0, 20.0], velocity=10.0, acc=10.0, dec=10.0,
+                                                       reuse=False)
+
+    def simulate(command):
+        pos_command = command.posCommand
+        return simulation_from_commands([pos_command], command.startPos)
+
+    def simulate_pos(motion, command, peak, total, acc, cruise, dec):
+        total.assign(float(simulate(command).total_time_milliseconds[0]))
+        return 0
+
+    def simulate_pos_at_time(motion, command, return_type, time, position, velocity):
+        values = simulate(command).pos_at_time([time])
+        position.assign(float(values[0][0, 0]))
+        velocity.assign(float(values[1][0, 0]))
+        return 0
+
+    handlers['Motion_SimulatePos'] = simulate_pos
+    handlers['Motion_SimulatePosAtTime'] = simulate_pos_at_time
+    errors = compare_with_engine(CoreMotion(wmx3_api).motion, commands, 0.0, [0.0, 500.0, 1500.0])
+    assert errors == {'max_total_time_error': 0.0, 'max_position_error': 0.0}
+
+
+def simulate_pos_command(target):
+    command = Motion_SimulatePosCommand()
+    command.posCommand.axis = 0
+    command.posCommand.target = target
+    command.posCommand.profile.type = ProfileType.Trapezoidal
+    command.posCommand.profile.velocity = 10.0
+    return command
+
+
+@pytest.fixture
+def engine(wmx3_api, handlers):
+    calls = []
+
+    def simulate_pos(motion, command, peak, total, acc, cruise, dec):
+        calls.append(command.posCommand.target)
+        if command.posCommand.target < 0:
+            return ErrorCode.PyNone + 1
+        total.assign(command.posCommand.target * 100.0)
+        return 0
+
+    handlers['Motion_SimulatePos'] = simulate_pos
+    return CoreMotion(wmx3_api).motion, calls
+
+
+def test_simulation_cache_hits_on_equal_contents(engine):
+    motion, calls = engine
+    cache = SimulationCache(motion, max_size=2)
+    assert cache.SimulatePos(simulate_pos_command(10.0))[2] == 1000.0
+    # A separate struct with the same contents is a hit.
+    assert cache.SimulatePos(simulate_pos_command(10.0))[2] == 1000.0
+    assert calls == [10.0]
+
+    cache.SimulatePos(simulate_pos_command(20.0))
+    cache.SimulatePos(simulate_pos_command(10.0))
+    cache.SimulatePos(simulate_pos_command(30.0))
+    # 20 was least recently used and has been evicted.
+    cache.SimulatePos(simulate_pos_command(20.0))
+    assert calls == [10.0, 20.0, 30.0, 20.0]
+    assert (cache.hit_count, cache.miss_count) == (2, 4)
+
+
+def test_simulation_cache_start_pos_is_part_of_key(engine):
+    motion, calls = engine
+    cache = SimulationCache(motion)
+    command = simulate_pos_command(10.0)
+    command.startPos = 5.0
+    cache.SimulatePos(command)
+    cache.SimulatePos(simulate_pos_command(10.0))
+    command.setStartPos = 1
+    cache.SimulatePos(command)
+    assert len(calls) == 2
+
+
+def test_simulation_cache_does_not_keep_failures(engine):
+    motion, calls = engine
+    cache = SimulationCache(motion)
+    assert cache.SimulatePos(simulate_pos_command(-1.0))[0] != ErrorCode.PyNone
+    cache.SimulatePos(simulate_pos_command(-1.0))
+    assert len(calls) == 2
+    assert not cache.entries
+
+
+def test_simulation_cache_ttl(engine, monkeypatch):
+    motion, calls = engine
+    now = [100.0]
+    monkeypatch.setattr(WMX3SimulatePython, 'monotonic', lambda: now[0])
+    cache = SimulationCache(motion, ttl=1.0)
+    cache.SimulatePos(simulate_pos_command(10.0))
+    now[0] += 0.5
+    cache.SimulatePos(simulate_pos_command(10.0))
+    now[0] += 1.0
+    cache.SimulatePos(simulate_pos_command(10.0))
+    assert len(calls) == 2
+    assert cache.expired_count == 1
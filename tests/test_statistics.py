@@ -0,0 +1,111 @@
+import re
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from WMX3ApiPython import Ecat
+from WMX3StatisticsPython import (DEVICE_STATISTICS_COLUMNS, OPENMETRICS_COUNTERS, StatisticsCollector,
+                                  StatisticsRingBuffer)
+
+
+@pytest.fixture
+def engine(handlers):
+    """Fake engine advancing 1000 cycles and 10 API calls per sample."""
+    state = {'samples': 0}
+
+    def get_statistic(api, statistics):
+        state['samples'] += 1
+        statistics.apiSuccessCount = 10 * state['samples']
+        return 0
+
+    def get_engine_status(api, status):
+        status.interrupts.cycleTimeMicroseconds = 1000.0
+        status.interrupts.cycleCounter = 1000 * state['samples']
+        return 0
+
+    def get_master_info(ecat, info):
+        info.statisticsInfo.packetLoss = 3
+        return 0
+
+    handlers['WMX3Api_GetStatistic'] = get_statistic
+    handlers['WMX3Api_GetEngineStatus'] = get_engine_status
+    handlers['Ecat_GetMasterInfo'] = get_master_info
+    return state
+
+
+def test_ring_buffer_wraps_in_order():
+    buffer = StatisticsRingBuffer({'value': np.int32}, capacity=4)
+    assert buffer.latest() is None
+    for index in range(6):
+        buffer.append(float(index), {'value': index * 10})
+    assert buffer.column('timestamp').tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert buffer.column('value').tolist() == [20, 30, 40, 50]
+    assert buffer.latest() == {'timestamp': 5.0, 'value': 50}
+    timestamps, values = buffer.columns_snapshot('timestamp', 'value')
+    assert timestamps.tolist() == [2.0, 3.0, 4.0, 5.0] and values.tolist() == [20, 30, 40, 50]
+
+
+def test_rates_while_sampling(wmx3_api):
+    collector = StatisticsCollector(wmx3_api, capacity=16)
+
+    def append():
+        # Uneven steps: rows shifted against each other give other rates.
+        for index in range(1, 10000):
+            collector.buffer.append(float(index * index), {'apiSuccessCount': 10 * index * index,
+                                                           'cycleCounter': 1000 * index * index,
+                                                           'cycleTimeMicroseconds': 1000.0})
+
+    writer = threading.Thread(target=append, daemon=True)
+    switch_interval = sys.getswitchinterval()
+    # Switch threads often so appends land between the column reads.
+    sys.setswitchinterval(1e-6)
+    writer.start()
+    try:
+        while writer.is_alive():
+            assert np.all(collector.api_calls_per_second() == 10.0)
+            assert np.all(collector.cycle_jitter() == 0.0)
+    finally:
+        writer.join()
+        sys.setswitchinterval(switch_interval)
+
+
+def test_sample_reads_every_source(wmx3_api, engine):
+    collector = StatisticsCollector(wmx3_api, Ecat(wmx3_api), capacity=8)
+    for _ in range(3):
+        collector.sample()
+    assert collector.buffer.count == 3
+    assert collector.buffer.column('cycleCounter').tolist() == [1000, 2000, 3000]
+    assert collector.buffer.column('packetLoss').tolist() == [3, 3, 3]
+    assert set(DEVICE_STATISTICS_COLUMNS) <= set(collector.buffer.columns)
+
+
+def test_rates_and_jitter(wmx3_api):
+    collector = StatisticsCollector(wmx3_api, capacity=8)
+    for index, period in enumerate([0.0, 1.0, 2.002, 3.001]):
+        collector.buffer.append(period, {'apiSuccessCount': 100 * index, 'cycleCounter': 1000 * index,
+                                         'cycleTimeMicroseconds': 1000.0})
+    assert collector.api_calls_per_second() == pytest.approx([100.0, 100 / 1.002, 100 / 0.999])
+    assert collector.cycle_jitter() == pytest.approx([0.0, 2.0, -1.0])
+    assert collector.jitter_distribution((50, 100)) == pytest.approx({50: 1.0, 100: 2.0})
+
+
+def test_openmetrics_types(wmx3_api, engine):
+    collector = StatisticsCollector(wmx3_api, capacity=8)
+    collector.sample()
+    collector.sample()
+    text = collector.to_openmetrics()
+
+    assert text.endswith('# EOF\n')
+    types = dict(re.findall(r'^# TYPE (\S+) (\S+)$', text, re.M))
+    samples = [line.split(' ')[0] for line in text.splitlines() if not line.startswith('#')]
+    for name in ('apiSuccessCount', 'apiFailedCount', 'sysFailedCount', 'rtCount', 'errorCount'):
+        assert name in OPENMETRICS_COUNTERS
+        assert types[f'wmx3_{name}'] == 'counter'
+        assert f'wmx3_{name}_total' in samples
+    assert types['wmx3_avgApiTime'] == 'gauge'
+    assert 'wmx3_avgApiTime' in samples
+    assert types['wmx3_cycleJitterMicroseconds'] == 'gauge'
+    assert 'wmx3_cycleJitterMicroseconds{percentile="99"}' in samples
+    assert 'quantile' not in text
@@ -0,0 +1,73 @@
+import json
+
+from WMX3ApiPython import CoreMotion, CoreMotionAxisStatus, OperationState
+from WMX3TracePython import (MOTION_TRACK_TID_BASE, PLANNED_TRACK_TID_BASE, MotionPhaseTracker, Tracer,
+                             TraceWriter)
+
+
+def test_tracer_drops_oldest_events():
+    tracer = Tracer(capacity=2)
+    for index in range(3):
+        tracer.complete(f'event {index}', 'api', index, 1)
+    assert tracer.dropped_count == 1
+    assert [event['name'] for event in tracer.drain()] == ['event 1', 'event 2']
+    assert not tracer.events
+
+
+def test_traced_proxy_records_nested_module_calls(wmx3_api, handlers):
+    handlers['Motion_Wait'] = lambda motion, axis: 0
+    handlers['Motion_Stop'] = lambda motion, axis: 0x1234
+    tracer = Tracer()
+    core_motion = tracer.trace_object(CoreMotion(wmx3_api))
+    assert core_motion.motion.Wait(0) == 0
+    assert core_motion.motion.Stop(1) == 0x1234
+
+    wait, stop = tracer.drain()
+    assert wait['name'] == 'CoreMotion.motion.Wait' and 'args' not in wait
+    assert stop['name'] == 'CoreMotion.motion.Stop' and stop['args'] == {'ret': 0x1234}
+
+
+def axis_status(acc=False, dec=False, op_state=None, total=0.0, acc_ms=0.0, cruise_ms=0.0, dec_ms=0.0):
+    status = CoreMotionAxisStatus()
+    status.accFlag = int(acc)
+    status.decFlag = int(dec)
+    status.opState = op_state if op_state is not None else OperationState.Idle
+    status.cmdDistributionEnd = 0
+    status.profileTotalMilliseconds = total
+    status.profileCompletedMilliseconds = 0.0
+    status.profileAccMilliseconds = acc_ms
+    status.profileCruiseMilliseconds = cruise_ms
+    status.profileDecMilliseconds = dec_ms
+    return status
+
+
+def test_motion_phase_tracker_spans():
+    tracer = Tracer()
+    tracker = MotionPhaseTracker(tracer)
+    tracker.update(0, axis_status(acc=True, op_state=OperationState.Pos, total=30.0, acc_ms=10.0,
+                                  cruise_ms=10.0, dec_ms=10.0), 1000)
+    tracker.update(0, axis_status(op_state=OperationState.Pos, total=30.0), 11000)
+    tracker.update(0, axis_status(dec=True, op_state=OperationState.Pos, total=30.0), 21000)
+    tracker.update(0, axis_status(), 31000)
+
+    events = [event for event in tracer.drain() if event['ph'] == 'X']
+    planned = [(event['name'], event['ts'], event['dur']) for event in events
+               if event['tid'] == PLANNED_TRACK_TID_BASE]
+    observed = [(event['name'], event['ts'], event['dur']) for event in events
+                if event['tid'] == MOTION_TRACK_TID_BASE]
+    assert planned == [('planned acc', 1000, 10000), ('planned cruise', 11000, 10000),
+                       ('planned dec', 21000, 10000)]
+    assert observed == [('acc', 1000, 10000), ('cruise', 11000, 10000), ('dec', 21000, 10000)]
+
+
+def test_trace_writer_output_is_json(tmp_path):
+    tracer = Tracer()
+    writer = TraceWriter(tracer, tmp_path / 'trace.json', interval=0.01)
+    writer.start()
+    tracer.complete('first', 'api', 0, 5)
+    tracer.instant('marker', 'api')
+    writer.stop()
+
+    events = json.loads((tmp_path / 'trace.json').read_text())
+    assert [event['name'] for event in events] == ['first', 'marker', 'trace_summary']
+    assert events[-1]['args'] == {'written': 2, 'dropped': 0}